@@ -0,0 +1,378 @@
+"""Offline micro-benchmarks of the scraper, messenger and API hot paths.
+
+Runs on plain CPython, without Workers: `pyodide`/`js` are replaced by the
+stubs in `benchmarks/stubs` (`pyfetch` serves the recorded pages in
+`benchmarks/fixtures`) and D1 by an in-memory SQLite database.
+
+Usage::
+
+    python benchmarks/run.py                  # run and compare with baselines
+    python benchmarks/run.py feed messenger   # only stages starting with these
+    python benchmarks/run.py --save           # store results as new baselines
+    python benchmarks/run.py --check          # exit 1 on regressions
+
+Latencies are per operation; throughput counts items (pages, messages,
+values, requests) per second.
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import sys
+import tracemalloc
+from collections.abc import Callable
+from datetime import UTC, datetime, timedelta, timezone
+from pathlib import Path
+from statistics import quantiles
+from time import perf_counter_ns
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+FIXTURES_DIR = BENCHMARKS_DIR / "fixtures"
+BASELINES_FILE = BENCHMARKS_DIR / "baselines.json"
+sys.path[:0] = [
+    str(BENCHMARKS_DIR / "stubs"),
+    str(BENCHMARKS_DIR.parent / "src"),
+]
+
+from pydantic import TypeAdapter
+from pyodide.http import ROUTES
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session, load_only
+from sqlalchemy.pool import StaticPool
+
+from app.logger import LoggerConfig
+
+# Before importing the app, its loggers take the level when created
+LoggerConfig.set_level("WARNING")
+
+from app.database_models import DateTimeString, EpochDateTime, News
+from app.database_setup import DatabaseSetup
+from app.fastapi_app.database import db_session
+from app.fastapi_app.main import (
+    LATEST_COLUMNS,
+    LATEST_SERIALIZER,
+    app,
+)
+from app.fastapi_app.page_store import PageStore
+from app.fastapi_app.schemas import NewsShortResponse
+from app.fastapi_app.serializers import json_response
+from app.main_apps.messenger.delivery import plan_delivery
+from app.main_apps.messenger.message_formatter import (
+    build_message,
+    build_message_header,
+)
+from app.main_apps.messenger.telegram import chunk_message
+from app.main_apps.scraper.feed import HistoricFeed
+from app.main_apps.scraper.news import NewsReader
+
+FEED_PAGE = (FIXTURES_DIR / "feed_page.html").read_text(encoding="utf-8")
+NEWS_PAGE = (FIXTURES_DIR / "news_page.html").read_text(encoding="utf-8")
+NEWS_URL = "https://www.frsn.utn.edu.ar/?p=123"
+ROUTES[NEWS_URL] = (200, NEWS_PAGE.encode("utf-8"))
+
+# Rows of the benchmark database, enough for several listing pages
+DB_ROWS = 120
+# Values converted per DateTimeString operation
+DATETIME_VALUES = 1000
+# Items per page of the API serialization stages
+SERIALIZE_ITEMS = 50
+
+loop = asyncio.new_event_loop()
+
+
+class Stage:
+    def __init__(self, name: str, run: Callable[[], object], items: int = 1) -> None:
+        self.name = name
+        self.run = run
+        self.items = items
+
+
+def measure(stage: Stage, min_time: float, min_runs: int) -> dict[str, float]:
+    for _ in range(3):
+        stage.run()  # Warm up caches (compiled queries, templates, ...)
+    timings: list[int] = []
+    total = 0
+    while total < min_time * 1e9 or len(timings) < min_runs:
+        start = perf_counter_ns()
+        stage.run()
+        elapsed = perf_counter_ns() - start
+        timings.append(elapsed)
+        total += elapsed
+    tracemalloc.start()
+    stage.run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    percentiles = quantiles(timings, n=100, method="inclusive")
+    return {
+        "items_per_sec": round(stage.items * len(timings) / (total / 1e9), 1),
+        "p50_ms": round(percentiles[49] / 1e6, 4),
+        "p99_ms": round(percentiles[98] / 1e6, 4),
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+def setup_database() -> Session:
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    DatabaseSetup().setup(engine)
+    title, content, origin_created_at = NewsReader().parse_news(NEWS_PAGE)
+    session = Session(engine)
+    session.add_all(
+        News(
+            url=f"https://www.frsn.utn.edu.ar/?p={1000 + i}",
+            title=f"{title} {i}",
+            content=content,
+            summary=News.build_summary(content),
+            photo_id=f"utn-frsn-news-photo-{i}" if i % 3 else None,
+            response_elapsed_seconds=0.5,
+            parse_elapsed_seconds=0.01,
+            origin_created_at=origin_created_at - timedelta(days=i),
+        )
+        for i in range(DB_ROWS)
+    )
+    session.commit()
+    return session
+
+
+async def asgi_get(path: str, query: str = "") -> bytes:
+    """GET `path` from the FastAPI app, without a server."""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": query.encode(),
+        "headers": [(b"host", b"localhost")],
+        "client": ("127.0.0.1", 0),
+        "server": ("localhost", 80),
+    }
+    messages: list[dict] = []
+
+    async def receive() -> dict:
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: dict) -> None:
+        messages.append(message)
+
+    await app(scope, receive, send)
+    if messages[0]["status"] != 200:
+        raise RuntimeError(f"GET {path}?{query} -> {messages[0]['status']}")
+    return b"".join(message.get("body", b"") for message in messages[1:])
+
+
+def check_parsers() -> None:
+    """Both news page extractors must give the same output."""
+    bs4_output = NewsReader.extract_bs4(NEWS_PAGE)
+    stream_output = NewsReader.extract_stream(NEWS_PAGE)
+    if bs4_output != stream_output:
+        raise AssertionError("NewsPageParser output differs from BeautifulSoup")
+    if not loop.run_until_complete(HistoricFeed().get_data(FEED_PAGE)):
+        raise AssertionError("No news found in the feed page fixture")
+
+
+def build_stages() -> list[Stage]:
+    session = setup_database()
+    db_session.set(session)
+    news = session.get(News, 1)
+    long_news = News(
+        url=news.url,
+        title=news.title,
+        # Several Telegram messages worth of text
+        content="\n\n".join([news.content] * 12),
+        origin_created_at=news.origin_created_at,
+        inserted_at=news.inserted_at,
+    )
+    datetime_type = DateTimeString()
+    datetimes = [
+        datetime(2024, 1, 1, tzinfo=timezone(timedelta(hours=-3)))
+        + timedelta(minutes=i)
+        for i in range(DATETIME_VALUES)
+    ]
+    datetime_strings = [value.isoformat() for value in datetimes]
+    epoch_type = EpochDateTime()
+    epochs = [epoch_type.process_bind_param(v, None) for v in datetimes]
+
+    def read_news(parser: str) -> Callable[[], object]:
+        def run() -> object:
+            NewsReader.PARSER = parser
+            return loop.run_until_complete(NewsReader().read_news(NEWS_URL))
+
+        return run
+
+    def get(path: str, query: str = "") -> Callable[[], object]:
+        return lambda: loop.run_until_complete(asgi_get(path, query))
+
+    latest_adapter = TypeAdapter(list[NewsShortResponse])
+
+    def serialize_pydantic() -> object:
+        # Previous path: ORM objects, dicts validated by the `response_model`
+        news_items = session.execute(
+            select(News).options(load_only(*LATEST_COLUMNS)).limit(SERIALIZE_ITEMS)
+        ).scalars()
+        content = [
+            {
+                **item.__dict__,
+                "photo_url": item.photo_url,
+                "content": item.summary or "...",
+            }
+            for item in news_items
+        ]
+        return latest_adapter.dump_json(latest_adapter.validate_python(content))
+
+    def serialize_rows() -> object:
+        rows = session.execute(select(*LATEST_COLUMNS).limit(SERIALIZE_ITEMS)).all()
+        return json_response(LATEST_SERIALIZER.to_dicts(rows)).body
+
+    if serialize_pydantic() != serialize_rows():
+        raise AssertionError("Row serializer output differs from pydantic")
+
+    page_store = PageStore(session)
+
+    def get_stored(key: str) -> Callable[[], object]:
+        # What `Default.fetch` does for a stored page, without FastAPI
+        loop.run_until_complete(page_store.render(key, "http://localhost"))
+
+        def run() -> object:
+            page = page_store.get(key, "http://localhost")
+            return PageStore.headers(page), page.body
+
+        return run
+
+    return [
+        Stage(
+            "feed.get_data",
+            lambda: loop.run_until_complete(HistoricFeed().get_data(FEED_PAGE)),
+        ),
+        Stage("news.read_news.bs4", read_news("bs4")),
+        Stage("news.read_news.stream", read_news("stream")),
+        Stage("messenger.build_message", lambda: build_message(long_news)),
+        Stage(
+            "messenger.chunk_message",
+            lambda: list(chunk_message(build_message(long_news))),
+        ),
+        Stage(
+            "messenger.plan_delivery",
+            lambda: plan_delivery(
+                build_message(long_news),
+                build_message_header(long_news),
+                news.photo_url,
+            ),
+        ),
+        Stage(
+            "models.datetime_bind",
+            lambda: [datetime_type.process_bind_param(v, None) for v in datetimes],
+            items=DATETIME_VALUES,
+        ),
+        Stage(
+            "models.datetime_result",
+            lambda: [
+                datetime_type.process_result_value(v, None) for v in datetime_strings
+            ],
+            items=DATETIME_VALUES,
+        ),
+        Stage(
+            "models.epoch_bind",
+            lambda: [epoch_type.process_bind_param(v, None) for v in datetimes],
+            items=DATETIME_VALUES,
+        ),
+        Stage(
+            "models.epoch_result",
+            lambda: [epoch_type.process_result_value(v, None) for v in epochs],
+            items=DATETIME_VALUES,
+        ),
+        Stage("serialize.latest.pydantic", serialize_pydantic, items=SERIALIZE_ITEMS),
+        Stage("serialize.latest.rows", serialize_rows, items=SERIALIZE_ITEMS),
+        Stage("api.latest", get("/api/news/latest")),
+        Stage("api.latest.offset", get("/api/news/latest", "page=3")),
+        Stage("api.news_item", get("/api/news/1")),
+        Stage("api.search.fts", get("/api/search", "text=inscripciones")),
+        Stage("api.search.dates", get("/api/search", "origin_date_from=2023-01-01")),
+        Stage("page.news_detail", get("/news/1")),
+        Stage("page.home", get("/")),
+        Stage("page.search", get("/search", "text=inscripciones")),
+        Stage("page.stored.news_detail", get_stored("/news/1")),
+        Stage("page.stored.latest", get_stored("/api/news/latest")),
+    ]
+
+
+def compare(result: dict, baseline: dict | None, tolerance: float) -> str:
+    """Changes against the baseline, flagging slower or bigger results."""
+    if not baseline:
+        return "new"
+    notes = []
+    for key in ("p50_ms", "peak_kib"):
+        if not baseline.get(key):
+            continue
+        change = result[key] / baseline[key] - 1
+        flag = " REGRESSION" if change > tolerance else ""
+        notes.append(f"{key} {change:+.0%}{flag}")
+    return ", ".join(notes)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("stages", nargs="*", help="Stage name prefixes to run")
+    parser.add_argument("--min-time", type=float, default=1.0, help="Seconds")
+    parser.add_argument("--min-runs", type=int, default=20)
+    parser.add_argument("--save", action="store_true", help="Store baselines")
+    parser.add_argument("--check", action="store_true", help="Fail on regressions")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="Allowed slowdown or memory growth over the baseline (0.25 = 25%%)",
+    )
+    args = parser.parse_args()
+
+    check_parsers()
+    baselines = (
+        json.loads(BASELINES_FILE.read_text()) if BASELINES_FILE.exists() else {}
+    )
+    stages = [
+        stage
+        for stage in build_stages()
+        if not args.stages or stage.name.startswith(tuple(args.stages))
+    ]
+    results: dict[str, dict] = {}
+    regressions = 0
+    print(
+        f"{'stage':<26} {'items/s':>12} {'p50 ms':>10} {'p99 ms':>10} "
+        f"{'peak KiB':>10}  vs baseline"
+    )
+    for stage in stages:
+        result = measure(stage, args.min_time, args.min_runs)
+        results[stage.name] = result
+        changes = compare(
+            result,
+            baselines.get("stages", {}).get(stage.name),
+            args.tolerance,
+        )
+        regressions += changes.count("REGRESSION")
+        print(
+            f"{stage.name:<26} {result['items_per_sec']:>12,.1f} "
+            f"{result['p50_ms']:>10.3f} {result['p99_ms']:>10.3f} "
+            f"{result['peak_kib']:>10,.1f}  {changes}"
+        )
+
+    if args.save:
+        baselines = {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "saved_at": datetime.now(UTC).isoformat(timespec="seconds"),
+            "stages": {**baselines.get("stages", {}), **results},
+        }
+        BASELINES_FILE.write_text(json.dumps(baselines, indent=2) + "\n")
+        print(f"Baselines saved to {BASELINES_FILE}")
+    return 1 if args.check and regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
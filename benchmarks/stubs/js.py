@@ -0,0 +1,14 @@
+class AbortSignal:
+    aborted = False
+
+
+class AbortController:
+    @classmethod
+    def new(cls) -> "AbortController":
+        return cls()
+
+    def __init__(self) -> None:
+        self.signal = AbortSignal()
+
+    def abort(self) -> None:
+        self.signal.aborted = True
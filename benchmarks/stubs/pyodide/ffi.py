@@ -0,0 +1,2 @@
+def to_js(value, **kwargs):
+    return value
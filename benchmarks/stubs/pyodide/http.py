@@ -0,0 +1,26 @@
+import json
+
+# URL -> (status, body) served by `pyfetch`, filled by the benchmarks
+ROUTES: dict[str, tuple[int, bytes]] = {}
+
+
+class FetchResponse:
+    def __init__(self, url: str, status: int, body: bytes) -> None:
+        self.url = url
+        self.status = status
+        self.ok = 200 <= status < 300
+        self._body = body
+
+    async def bytes(self) -> bytes:
+        return self._body
+
+    async def text(self) -> str:
+        return self._body.decode("utf-8")
+
+    async def json(self):
+        return json.loads(self._body)
+
+
+async def pyfetch(url: str, **kwargs) -> FetchResponse:
+    status, body = ROUTES.get(url, (404, b""))
+    return FetchResponse(url, status, body)
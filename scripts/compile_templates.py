@@ -0,0 +1,17 @@
+"""Precompile the webpage Jinja templates before deploying.
+
+Usage::
+
+    python scripts/compile_templates.py
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from app.fastapi_app.templating import COMPILED_DIR, compile_templates
+
+if __name__ == "__main__":
+    compile_templates()
+    print(f"Templates compiled to {COMPILED_DIR}")
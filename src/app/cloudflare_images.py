@@ -1,6 +1,9 @@
 # import os
+import json
+
 from pyodide.ffi import to_js
-from pyodide.http import pyfetch
+
+from .fetcher import fetch
 from .logger import LogWrapper
 
 
@@ -8,6 +11,9 @@ class CloudflareConfig:
     ACCOUNT_ID: str = ""
     IMAGES_ACCOUNT_HASH: str = ""
     IMAGES_API_TOKEN: str = ""
+    # Let Cloudflare Images fetch photos from their origin URL, instead of
+    # passing their content through the worker
+    IMAGES_URL_INGEST: bool = True
     # LOCAL_STORE: bool = True  # For testing without uploading to Cloudflare
 
     @classmethod
@@ -16,6 +22,7 @@ class CloudflareConfig:
         account_id: str,
         images_account_hash: str,
         images_api_token: str,
+        images_url_ingest: bool = True,
     ):
         """Cloudflare credentials & identifiers configuration setup
 
@@ -25,10 +32,13 @@ class CloudflareConfig:
         :type images_account_hash: str
         :param images_api_token: Images API token
         :type images_api_token: str
+        :param images_url_ingest: Upload photos by URL, defaults to True
+        :type images_url_ingest: bool, optional
         """
         cls.ACCOUNT_ID = account_id
         cls.IMAGES_ACCOUNT_HASH = images_account_hash
         cls.IMAGES_API_TOKEN = images_api_token
+        cls.IMAGES_URL_INGEST = images_url_ingest
 
 
 class CloudflareImages(LogWrapper):
@@ -66,22 +76,57 @@ class CloudflareImages(LogWrapper):
         form_data = FormData.new()
         form_data.append("file", blob, image_filename)
         form_data.append("requireSignedURLs", "false")  # We want public URLs
-        response = await pyfetch(
+        return await self.send(form_data)
+
+    async def upload_from_url(
+        self,
+        image_url: str,
+        image_filename: str,
+    ) -> str | None:
+        """Make Cloudflare Images fetch an image from its origin URL.
+
+        The image content never goes through the worker. Returns the image
+        identifier.
+
+        :param image_url: Origin URL of the image
+        :type image_url: str
+        :param image_filename: Filename, kept in the image metadata
+        :type image_filename: str
+        :return: Image ID
+        :rtype: str | None
+        """
+        from js import FormData
+
+        form_data = FormData.new()
+        form_data.append("url", image_url)
+        form_data.append("metadata", json.dumps({"filename": image_filename}))
+        form_data.append("requireSignedURLs", "false")  # We want public URLs
+        return await self.send(form_data)
+
+    async def send(self, form_data) -> str | None:
+        """Post an upload form to the Cloudflare Images API.
+
+        :param form_data: JS FormData with the image (`file` or `url`)
+        :type form_data: JsProxy
+        :return: Image ID
+        :rtype: str | None
+        """
+        async with fetch(
             f"https://api.cloudflare.com/client/v4/accounts/{CloudflareConfig.ACCOUNT_ID}/images/v1",
             method="POST",
             headers={
                 "Authorization": f"Bearer {CloudflareConfig.IMAGES_API_TOKEN}",
             },
             body=form_data,
-        )
-        if response.status != 200:
-            self.logger.error(
-                f"Cloudflare Images upload failed with status {response.status}",
-            )
-            content = await response.text()
-            self.logger.error(f"Response content: {content}")
-            return None
-        data = await response.json()
+        ) as response:
+            if response.status != 200:
+                self.logger.error(
+                    f"Cloudflare Images upload failed with status {response.status}",
+                )
+                content = await response.text()
+                self.logger.error(f"Response content: {content}")
+                return None
+            data = await response.json()
         if not data.get("success"):
             self.logger.error(
                 f"Cloudflare Images upload failed: {data.get('errors')}",
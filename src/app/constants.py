@@ -1,2 +1,8 @@
+from datetime import timedelta, timezone
+
 TELEGRAM_CHANNEL_PROD = "@utnfrsnnews"
 TELEGRAM_CHANNEL_DEBUG = "@utnfrsnnewsdebug"
+
+# Timezone of the faculty (Argentina, no DST), used to show dates and to read
+# the dates of search filters
+NEWS_TIMEZONE = timezone(timedelta(hours=-3))
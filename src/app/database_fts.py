@@ -0,0 +1,153 @@
+import re
+from html import escape
+
+from sqlalchemy import Engine, column, func, literal_column, table, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import SQLAlchemyError
+
+from .logger import LogWrapper
+
+# External content FTS5 table mirroring news.title/news.content. The index
+# only stores tokens, the text itself is always read back from `news`.
+FTS_TABLE = "news_fts"
+
+FTS_DDL = {
+    FTS_TABLE: (
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+        "title, content, content='news', content_rowid='id', "
+        "tokenize='unicode61 remove_diacritics 2')"
+    ),
+    f"{FTS_TABLE}_ai": (
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON news BEGIN "
+        f"INSERT INTO {FTS_TABLE}(rowid, title, content) "
+        "VALUES (new.id, new.title, new.content); "
+        "END"
+    ),
+    f"{FTS_TABLE}_ad": (
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON news BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, content) "
+        "VALUES ('delete', old.id, old.title, old.content); "
+        "END"
+    ),
+    f"{FTS_TABLE}_au": (
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au "
+        "AFTER UPDATE OF title, content ON news BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, content) "
+        "VALUES ('delete', old.id, old.title, old.content); "
+        f"INSERT INTO {FTS_TABLE}(rowid, title, content) "
+        "VALUES (new.id, new.title, new.content); "
+        "END"
+    ),
+}
+
+# bm25 weights: a hit in the title is worth more than one in the content
+BM25_TITLE_WEIGHT = 10.0
+BM25_CONTENT_WEIGHT = 1.0
+
+# Snippet markers. Control chars can't show up in scraped text, so they are
+# swapped for <mark> tags only after the snippet has been HTML escaped.
+_SNIPPET_OPEN = "\x02"
+_SNIPPET_CLOSE = "\x03"
+SNIPPET_TOKENS = 16
+
+news_fts = table(FTS_TABLE, column("rowid"), column("title"), column("content"))
+
+
+class NewsFTS(LogWrapper):
+    AVAILABLE: bool = False
+
+    def setup(self, engine: Engine) -> bool:
+        """Create the FTS5 index and its sync triggers if they don't exist.
+
+        When the index table is created for the first time it is backfilled
+        with the rows already stored in `news`.
+
+        :param engine: Database engine
+        :type engine: Engine
+        :return: Whether full-text search is available
+        :rtype: bool
+        """
+        try:
+            with engine.begin() as connection:
+                existing = set(
+                    connection.execute(
+                        text(
+                            "SELECT name FROM sqlite_master "
+                            f"WHERE name LIKE '{FTS_TABLE}%'"
+                        )
+                    )
+                    .scalars()
+                    .all()
+                )
+                for name, ddl in FTS_DDL.items():
+                    if name not in existing:
+                        connection.execute(text(ddl))
+                if FTS_TABLE not in existing:
+                    self.backfill(connection)
+        except SQLAlchemyError as e:
+            self.logger.warning(f"Full-text search unavailable: {e}")
+            NewsFTS.AVAILABLE = False
+            return False
+        NewsFTS.AVAILABLE = True
+        return True
+
+    def backfill(self, connection: Connection) -> None:
+        """Rebuild the whole index from the `news` table.
+
+        :param connection: Database connection
+        :type connection: Connection
+        """
+        self.logger.info(f"Backfilling {FTS_TABLE} from news")
+        connection.execute(
+            text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+        )
+
+    @staticmethod
+    def match_query(search_text: str) -> str | None:
+        """Build a safe FTS5 MATCH expression from free user input.
+
+        Every word is quoted (so FTS5 operators typed by the user are taken
+        literally) and prefix matched, and all words must be present.
+
+        :param search_text: User input
+        :type search_text: str
+        :return: MATCH expression, or None if the input has no words
+        :rtype: str | None
+        """
+        words = re.findall(r"\w+", search_text)
+        if not words:
+            return None
+        return " ".join(f'"{word}"*' for word in words)
+
+    @staticmethod
+    def matches(match_query: str):
+        return literal_column(FTS_TABLE).op("MATCH")(match_query)
+
+    @staticmethod
+    def rank():
+        return func.bm25(
+            literal_column(FTS_TABLE),
+            BM25_TITLE_WEIGHT,
+            BM25_CONTENT_WEIGHT,
+        )
+
+    @staticmethod
+    def snippet():
+        return func.snippet(
+            literal_column(FTS_TABLE),
+            -1,
+            _SNIPPET_OPEN,
+            _SNIPPET_CLOSE,
+            "…",
+            SNIPPET_TOKENS,
+        )
+
+    @staticmethod
+    def snippet_to_html(snippet: str | None) -> str | None:
+        if snippet is None:
+            return None
+        return (
+            escape(snippet)
+            .replace(_SNIPPET_OPEN, "<mark>")
+            .replace(_SNIPPET_CLOSE, "</mark>")
+        )
@@ -0,0 +1,254 @@
+from collections.abc import Callable
+
+from sqlalchemy import Engine, Table, insert, select, text
+from sqlalchemy.engine import Connection
+
+from .database_fts import FTS_DDL, FTS_TABLE
+from .database_models import (
+    CompletedJob,
+    News,
+    RenderedPage,
+    SchemaMigration,
+    SeenUrl,
+    TelegramDelivery,
+)
+from .logger import LogWrapper
+
+# `news` columns stored as `EpochDateTime` since migration 4
+NEWS_EPOCH_COLUMNS = ("origin_created_at", "indexed_at", "inserted_at")
+
+
+class DatabaseMigrations(LogWrapper):
+    """Versioned schema changes, each applied once per database.
+
+    Applied versions are stored in `schema_migrations`. Tables created from
+    scratch by `create_all` already have the latest schema, so every
+    migration must also be a no-op on them.
+    """
+
+    def migrations(self) -> list[tuple[int, str, Callable[[Connection], None]]]:
+        # Append only: never renumber or edit an applied migration
+        return [
+            (1, "news_summary", self.add_news_summary),
+            (2, "seen_url_backfill", self.backfill_seen_urls),
+            (3, "news_date_indexes", self.add_news_date_indexes),
+            (4, "news_epoch_datetimes", self.convert_news_datetimes),
+            (5, "rendered_page", self.add_rendered_page),
+            (6, "completed_job", self.add_completed_job),
+            (7, "log_epoch_datetimes", self.convert_log_datetimes),
+            (8, "rendered_page_keys", self.rebuild_rendered_page),
+        ]
+
+    @property
+    def latest_version(self) -> int:
+        return self.migrations()[-1][0]
+
+    def apply(self, engine: Engine) -> int:
+        """Apply the migrations missing in the database, in order.
+
+        Each one runs in its own transaction together with its
+        `schema_migrations` row.
+
+        :param engine: Database engine
+        :type engine: Engine
+        :return: Number of migrations applied
+        :rtype: int
+        """
+        with engine.connect() as connection:
+            applied = set(
+                connection.execute(select(SchemaMigration.version)).scalars().all()
+            )
+        pending = [m for m in self.migrations() if m[0] not in applied]
+        for version, name, migrate in pending:
+            self.logger.info(f"Applying migration {version} ({name})")
+            with engine.begin() as connection:
+                migrate(connection)
+                connection.execute(
+                    insert(SchemaMigration).values(version=version, name=name)
+                )
+        return len(pending)
+
+    def add_news_summary(self, connection: Connection) -> None:
+        """Add `news.summary` to databases created before it existed.
+
+        :param connection: Database connection
+        :type connection: Connection
+        """
+        columns = (
+            connection.execute(text("SELECT name FROM pragma_table_info('news')"))
+            .scalars()
+            .all()
+        )
+        if "summary" in columns:
+            return
+        self.logger.info("Adding news.summary column")
+        connection.execute(text("ALTER TABLE news ADD COLUMN summary VARCHAR(103)"))
+        self.backfill_news_summary(connection)
+
+    def backfill_news_summary(self, connection: Connection) -> None:
+        """Fill `news.summary` for rows inserted without it.
+
+        Same as `News.build_summary`, done in SQL to avoid reading every
+        `content` back into the worker (`substr` counts characters).
+
+        :param connection: Database connection
+        :type connection: Connection
+        """
+        self.logger.info("Backfilling news.summary")
+        connection.execute(
+            text(
+                "UPDATE news SET summary = "
+                "substr(replace(substr(content, 1, 150), char(10), ''), 1, 100) "
+                "|| '...' WHERE summary IS NULL"
+            )
+        )
+
+    def backfill_seen_urls(self, connection: Connection) -> None:
+        """Fill `seen_url` from `news` if it's empty but news exist.
+
+        :param connection: Database connection
+        :type connection: Connection
+        """
+        if connection.execute(select(SeenUrl.url_hash).limit(1)).first():
+            return
+        urls = connection.execute(select(News.url)).scalars().all()
+        if not urls:
+            return
+        self.logger.info(f"Backfilling seen_url with {len(urls)} URLs")
+        SeenUrl.insert_urls(connection, urls)
+
+    def add_news_date_indexes(self, connection: Connection) -> None:
+        """Create the `news` date indexes declared in `News.__table_args__`.
+
+        :param connection: Database connection
+        :type connection: Connection
+        """
+        for index in News.__table__.indexes:
+            if index.name in ("ix_news_origin_created_at_id", "ix_news_inserted_at_id"):
+                index.create(connection, checkfirst=True)
+
+    def convert_news_datetimes(self, connection: Connection) -> None:
+        """Store the `news` datetimes as integer epoch seconds (UTC).
+
+        IDs are kept by the rebuild (see `rebuild_with_epoch_columns`), so
+        the full-text index stays valid; only its triggers are created again.
+
+        :param connection: Database connection
+        :type connection: Connection
+        """
+        if not self.rebuild_with_epoch_columns(
+            connection, News.__table__, NEWS_EPOCH_COLUMNS
+        ):
+            return
+        has_fts = connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE name = :name"),
+            {"name": FTS_TABLE},
+        ).first()
+        if has_fts:
+            for name, ddl in FTS_DDL.items():
+                if name != FTS_TABLE:
+                    connection.execute(text(ddl))
+
+    def convert_log_datetimes(self, connection: Connection) -> None:
+        """Store `telegram_delivery.delivered_at` and
+        `schema_migrations.applied_at` as integer epoch seconds (UTC), like
+        the other timestamps.
+
+        :param connection: Database connection
+        :type connection: Connection
+        """
+        self.rebuild_with_epoch_columns(
+            connection, TelegramDelivery.__table__, ("delivered_at",)
+        )
+        self.rebuild_with_epoch_columns(
+            connection, SchemaMigration.__table__, ("applied_at",)
+        )
+
+    def rebuild_with_epoch_columns(
+        self, connection: Connection, table: Table, epoch_columns: tuple[str, ...]
+    ) -> bool:
+        """Convert ISO string columns of a table to integer epoch seconds.
+
+        SQLite can't change a column type, so the table is rebuilt: renamed,
+        created again from its model and refilled converting the ISO strings
+        in SQL (`strftime('%s')` applies their offset, naive values are UTC).
+        Triggers on the old table are dropped along with it.
+
+        :param connection: Database connection
+        :type connection: Connection
+        :param table: Table as declared by its model
+        :type table: Table
+        :param epoch_columns: Columns to convert
+        :type epoch_columns: tuple[str, ...]
+        :return: Whether the table was rebuilt (False if already converted)
+        :rtype: bool
+        """
+        column_types = {
+            name: column_type
+            for name, column_type in connection.execute(
+                text(f"SELECT name, type FROM pragma_table_info('{table.name}')")
+            )
+        }
+        if column_types.get(epoch_columns[0]) == "INTEGER":
+            return False
+        self.logger.info(f"Converting {table.name} datetimes to epoch seconds")
+        old_name = f"{table.name}_iso"
+        connection.execute(text(f"ALTER TABLE {table.name} RENAME TO {old_name}"))
+        # Index names are global, free them for the new table
+        for index in table.indexes:
+            connection.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+        table.create(connection)
+        columns = [column.name for column in table.columns]
+        values = [
+            f"CAST(strftime('%s', {name}) AS INTEGER)"
+            if name in epoch_columns
+            else name
+            for name in columns
+        ]
+        connection.execute(
+            text(
+                f"INSERT INTO {table.name} ({', '.join(columns)}) "
+                f"SELECT {', '.join(values)} FROM {old_name}"
+            )
+        )
+        connection.execute(text(f"DROP TABLE {old_name}"))
+        return True
+
+    def add_rendered_page(self, connection: Connection) -> None:
+        """Create `rendered_page`, the store of pre-rendered responses.
+
+        :param connection: Database connection
+        :type connection: Connection
+        """
+        RenderedPage.__table__.create(connection, checkfirst=True)
+
+    def add_completed_job(self, connection: Connection) -> None:
+        """Create `completed_job`, the record of one-shot jobs already run.
+
+        :param connection: Database connection
+        :type connection: Connection
+        """
+        CompletedJob.__table__.create(connection, checkfirst=True)
+
+    def rebuild_rendered_page(self, connection: Connection) -> None:
+        """Add `base_url` (to the key) and `listing_version` to
+        `rendered_page`.
+
+        The stored pages are dropped along with the old table, they are
+        rendered again on their next request.
+
+        :param connection: Database connection
+        :type connection: Connection
+        """
+        columns = (
+            connection.execute(
+                text("SELECT name FROM pragma_table_info('rendered_page')")
+            )
+            .scalars()
+            .all()
+        )
+        if "base_url" in columns:
+            return
+        self.logger.info("Rebuilding rendered_page")
+        RenderedPage.__table__.drop(connection, checkfirst=True)
+        RenderedPage.__table__.create(connection)
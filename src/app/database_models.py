@@ -1,11 +1,13 @@
 from __future__ import annotations
 
-from datetime import datetime, UTC
+from datetime import UTC, datetime
+from hashlib import blake2b
 from typing import Any
 
-from sqlalchemy import Integer, Float, String, Text
+from sqlalchemy import Float, Index, Integer, String, Text, insert, select
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import DeclarativeBase, Mapped, Session, mapped_column
 from sqlalchemy.types import TypeDecorator
-from sqlalchemy.orm import Mapped, mapped_column, DeclarativeBase
 
 from .cloudflare_images import CloudflareImages
 
@@ -31,6 +33,44 @@ class DateTimeString(TypeDecorator[datetime]):
         return datetime.fromisoformat(value)
 
 
+class EpochDateTime(TypeDecorator[datetime]):
+    """Datetime stored as integer seconds since the Unix epoch (UTC).
+
+    Integers sort and compare in the database regardless of the offset of
+    each value, and read back as UTC datetimes. Naive datetimes are taken
+    as UTC. ISO strings are accepted when binding (e.g. old cursors).
+    """
+
+    impl = Integer
+    cache_ok = True
+
+    def process_bind_param(
+        self, value: int | str | datetime | None | Any, dialect: Any
+    ) -> int | None:
+        if value is None:
+            return None
+        if isinstance(value, int):
+            return value
+        if isinstance(value, str):
+            value = datetime.fromisoformat(value)
+        if isinstance(value, datetime):
+            if value.tzinfo is None:
+                value = value.replace(tzinfo=UTC)
+            return int(value.timestamp())
+        raise ValueError(f"Cannot convert {type(value)} to epoch seconds")
+
+    def process_result_value(self, value: int | None, dialect: Any) -> datetime | None:
+        if value is None:
+            return None
+        return datetime.fromtimestamp(value, UTC)
+
+
+def hash_key(data: bytes) -> int:
+    """64-bit hash stored as a (signed) SQLite integer key."""
+    digest = blake2b(data, digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
 class Base(DeclarativeBase):
     pass
 
@@ -42,24 +82,221 @@ class News(Base):
     url: Mapped[str] = mapped_column(String(511), unique=True, index=True)
     title: Mapped[str] = mapped_column(String(511))
     content: Mapped[str] = mapped_column(Text)
+    # Short preview of `content` used by the listing endpoints
+    summary: Mapped[str | None] = mapped_column(String(103), nullable=True)
     photo_id: Mapped[str | None] = mapped_column(String(36), nullable=True)
     response_elapsed_seconds: Mapped[float | None] = mapped_column(Float, nullable=True)
     parse_elapsed_seconds: Mapped[float | None] = mapped_column(Float, nullable=True)
     origin_created_at: Mapped[datetime | None] = mapped_column(
-        DateTimeString,
+        EpochDateTime,
         nullable=True,
     )
     indexed_at: Mapped[datetime] = mapped_column(
-        DateTimeString,
+        EpochDateTime,
         default=lambda: datetime.now(UTC),
     )
     inserted_at: Mapped[datetime] = mapped_column(
-        DateTimeString,
+        EpochDateTime,
         default=lambda: datetime.now(UTC),
     )
 
+    __table_args__ = (
+        # Listings and the Index Scraper sort by `origin_created_at DESC, id
+        # DESC`, read backwards from this index without sorting
+        Index("ix_news_origin_created_at_id", "origin_created_at", "id"),
+        # Search by insertion date
+        Index("ix_news_inserted_at_id", "inserted_at", "id"),
+    )
+
+    @staticmethod
+    def build_summary(content: str) -> str:
+        return content[:150].replace("\n", "")[:100] + "..."
+
+    @staticmethod
+    def build_photo_url(photo_id: str | None) -> str:
+        if photo_id is None:
+            return "/static/img/news_placeholder.jpg"
+        return CloudflareImages.get_public_url(photo_id)
+
     @property
     def photo_url(self) -> str | None:
-        if self.photo_id is None:
-            return "/static/img/news_placeholder.jpg"
-        return CloudflareImages.get_public_url(self.photo_id)
+        return self.build_photo_url(self.photo_id)
+
+
+class SeenUrl(Base):
+    """Compact index of the news URLs already stored in `news`.
+
+    Only a 64-bit hash of each URL is kept, so the Index Scraper can check
+    thousands of candidates against it with a single read.
+    """
+
+    __tablename__ = "seen_url"
+
+    url_hash: Mapped[int] = mapped_column(
+        Integer,
+        primary_key=True,
+        autoincrement=False,
+    )
+
+    @staticmethod
+    def hash_url(url: str) -> int:
+        return hash_key(url.encode())
+
+    @classmethod
+    def insert_urls(cls, connection: Connection | Session, urls: list[str]) -> None:
+        """Add URLs to the index, ignoring the ones already there.
+
+        :param connection: Database connection or session
+        :type connection: Connection | Session
+        :param urls: News URLs
+        :type urls: list[str]
+        """
+        url_hashes = sorted({cls.hash_url(url) for url in urls})
+        for i in range(0, len(url_hashes), 100):
+            connection.execute(
+                insert(cls).prefix_with("OR IGNORE"),
+                [{"url_hash": url_hash} for url_hash in url_hashes[i : i + 100]],
+            )
+
+
+class PhotoRef(Base):
+    """Cloudflare Images ID of the photos already uploaded.
+
+    Keyed by a 64-bit hash of the photo origin URL and, when the worker had
+    its content, of the content too, so photos reused by several news are
+    uploaded once.
+    """
+
+    __tablename__ = "photo_ref"
+
+    key_hash: Mapped[int] = mapped_column(
+        Integer,
+        primary_key=True,
+        autoincrement=False,
+    )
+    photo_id: Mapped[str] = mapped_column(String(36))
+
+    @staticmethod
+    def url_key(url: str) -> int:
+        return hash_key(b"url:" + url.encode())
+
+    @staticmethod
+    def content_key(content: bytes) -> int:
+        return hash_key(b"content:" + content)
+
+    @classmethod
+    def find(cls, session: Session, keys: list[int]) -> dict[int, str]:
+        """Photo IDs of the keys already known.
+
+        :param session: Database session
+        :type session: Session
+        :param keys: URL or content keys
+        :type keys: list[int]
+        :return: Photo ID by key
+        :rtype: dict[int, str]
+        """
+        keys = sorted(set(keys))
+        photo_ids: dict[int, str] = {}
+        for i in range(0, len(keys), 100):
+            rows = session.execute(
+                select(cls.key_hash, cls.photo_id).where(
+                    cls.key_hash.in_(keys[i : i + 100])
+                )
+            )
+            photo_ids.update({key: photo_id for key, photo_id in rows})
+        return photo_ids
+
+    @classmethod
+    def insert_refs(
+        cls,
+        connection: Connection | Session,
+        photo_ids: dict[int, str],
+    ) -> None:
+        """Add keys to the index, ignoring the ones already there.
+
+        :param connection: Database connection or session
+        :type connection: Connection | Session
+        :param photo_ids: Photo ID by key
+        :type photo_ids: dict[int, str]
+        """
+        rows = [
+            {"key_hash": key, "photo_id": photo_id}
+            for key, photo_id in sorted(photo_ids.items())
+        ]
+        # Two bound parameters per row, D1 allows 100 per query
+        for i in range(0, len(rows), 50):
+            connection.execute(insert(cls).prefix_with("OR IGNORE"), rows[i : i + 50])
+
+
+class TelegramDelivery(Base):
+    """Telegram messages already delivered, one row per part of a post.
+
+    Lets a retried delivery skip the parts (photo, message chunks) that were
+    sent before it failed.
+    """
+
+    __tablename__ = "telegram_delivery"
+
+    news_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    chat_id: Mapped[str] = mapped_column(String(64), primary_key=True)
+    part_index: Mapped[int] = mapped_column(Integer, primary_key=True)
+    message_id: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    delivered_at: Mapped[datetime] = mapped_column(
+        EpochDateTime,
+        default=lambda: datetime.now(UTC),
+    )
+
+
+class SchemaMigration(Base):
+    """Schema migrations already applied (see `database_migrations`)."""
+
+    __tablename__ = "schema_migrations"
+
+    version: Mapped[int] = mapped_column(
+        Integer,
+        primary_key=True,
+        autoincrement=False,
+    )
+    name: Mapped[str] = mapped_column(String(127))
+    applied_at: Mapped[datetime] = mapped_column(
+        EpochDateTime,
+        default=lambda: datetime.now(UTC),
+    )
+
+
+class CompletedJob(Base):
+    """One-shot jobs already run to completion (e.g. backfills needing the
+    feed, which can't run as a migration)."""
+
+    __tablename__ = "completed_job"
+
+    name: Mapped[str] = mapped_column(String(127), primary_key=True)
+    completed_at: Mapped[datetime] = mapped_column(
+        EpochDateTime,
+        default=lambda: datetime.now(UTC),
+    )
+
+
+class RenderedPage(Base):
+    """Responses rendered ahead of time, served as they are by the worker.
+
+    See `fastapi_app.page_store`. Rows of an older `RESPONSE_VERSION` are
+    ignored, and so are listing pages of an older `listing_version`.
+    """
+
+    __tablename__ = "rendered_page"
+
+    # Scheme and host the page was rendered for, its links are absolute
+    base_url: Mapped[str] = mapped_column(String(255), primary_key=True)
+    # Path and query string, e.g. /news/1 or /api/news/latest?cursor=...
+    path: Mapped[str] = mapped_column(String(1023), primary_key=True)
+    response_version: Mapped[str] = mapped_column(String(16))
+    # Latest news ID when a listing page was rendered, None for detail pages
+    listing_version: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    # JSON list of [name, value] pairs
+    headers: Mapped[str] = mapped_column(Text)
+    body: Mapped[str] = mapped_column(Text)
+    rendered_at: Mapped[datetime] = mapped_column(
+        EpochDateTime,
+        default=lambda: datetime.now(UTC),
+    )
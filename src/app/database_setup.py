@@ -0,0 +1,56 @@
+from sqlalchemy import Engine, text
+from sqlalchemy.exc import SQLAlchemyError
+
+from .database_fts import FTS_TABLE, NewsFTS
+from .database_migrations import DatabaseMigrations
+from .database_models import Base
+from .logger import LogWrapper
+
+
+class DatabaseSetup(LogWrapper):
+    # Schema version already checked by this isolate (it uses a single database)
+    _ready_version: int | None = None
+
+    def setup(self, engine: Engine) -> None:
+        """Create missing tables and apply pending schema migrations.
+
+        An up to date database only costs one query per isolate (see
+        `schema_version`), tables are created only when a migration is
+        pending.
+
+        :param engine: Database engine
+        :type engine: Engine
+        """
+        latest_version = DatabaseMigrations().latest_version
+        if DatabaseSetup._ready_version == latest_version:
+            return
+        if self.schema_version(engine) != latest_version:
+            Base.metadata.create_all(bind=engine)  # Create tables if not exist
+            DatabaseMigrations().apply(engine)
+            NewsFTS().setup(engine)  # Full-text index for /api/search
+        DatabaseSetup._ready_version = latest_version
+
+    def schema_version(self, engine: Engine) -> int | None:
+        """Latest migration applied, if the full-text index exists too.
+
+        :param engine: Database engine
+        :type engine: Engine
+        :return: Schema version, None if the database needs a full setup
+        :rtype: int | None
+        """
+        try:
+            with engine.connect() as connection:
+                version, has_fts = connection.execute(
+                    text(
+                        "SELECT (SELECT max(version) FROM schema_migrations), "
+                        "EXISTS (SELECT 1 FROM sqlite_master WHERE name = :fts)"
+                    ),
+                    {"fts": FTS_TABLE},
+                ).one()
+        except SQLAlchemyError:
+            self.logger.info("No schema version yet, running the full setup")
+            return None
+        if not has_fts:
+            return None
+        NewsFTS.AVAILABLE = True
+        return version
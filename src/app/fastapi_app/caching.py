@@ -0,0 +1,85 @@
+from datetime import UTC, datetime
+from email.utils import format_datetime
+
+from fastapi import Request, Response, status
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .. import database_models as models
+from .etag import etag_matches, make_etag
+
+# News rows are immutable once inserted, detail responses can live for long
+DETAIL_CACHE_CONTROL = "public, max-age=604800"
+# Listings change on every insert, clients must revalidate with the ETag
+LISTING_CACHE_CONTROL = "public, no-cache"
+
+
+def news_etag(kind: str, news_id: int, inserted_at: datetime) -> str:
+    """ETag of a single news representation.
+
+    Built from the loaded row, so a deleted news (or another one inserted
+    again with its ID) never matches a tag a client still holds.
+
+    :param kind: Representation (API JSON, HTML page, ...)
+    :type kind: str
+    :param news_id: News ID
+    :type news_id: int
+    :param inserted_at: Insertion datetime of the news
+    :type inserted_at: datetime
+    :return: Strong ETag
+    :rtype: str
+    """
+    return make_etag(kind, news_id, int(inserted_at.timestamp()))
+
+
+def listing_version(db: Session) -> tuple[int, datetime | None]:
+    """Cheap version token of every listing: the latest inserted news.
+
+    `id` is the rowid, so this is a single b-tree lookup instead of the
+    full listing query.
+
+    :param db: Database session
+    :type db: Session
+    :return: Max news ID (0 if empty) and its insertion datetime
+    :rtype: tuple[int, datetime | None]
+    """
+    row = db.execute(
+        select(models.News.id, models.News.inserted_at)
+        .order_by(models.News.id.desc())
+        .limit(1)
+    ).first()
+    if row is None:
+        return 0, None
+    return row.id, row.inserted_at
+
+
+def listing_etag(kind: str, req: Request, version: int) -> str:
+    return make_etag(kind, version, req.url.query)
+
+
+def is_not_modified(req: Request, etag: str) -> bool:
+    return etag_matches(req.headers.get("if-none-match"), etag)
+
+
+def not_modified(etag: str, cache_control: str) -> Response:
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED,
+        headers={"ETag": etag, "Cache-Control": cache_control},
+    )
+
+
+def set_cache_headers(
+    response: Response,
+    etag: str,
+    cache_control: str,
+    last_modified: datetime | None = None,
+) -> None:
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control
+    if last_modified is not None:
+        if last_modified.tzinfo is None:
+            last_modified = last_modified.replace(tzinfo=UTC)
+        response.headers["Last-Modified"] = format_datetime(
+            last_modified.astimezone(UTC),
+            usegmt=True,
+        )
@@ -1,4 +1,5 @@
 from contextvars import ContextVar
+
 from sqlalchemy.orm import Session
 
 # ContextVar to handle session context safely
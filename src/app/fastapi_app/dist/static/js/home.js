@@ -1,13 +1,17 @@
-let page = 0;
+let cursor = null;
+let hasMore = true;
 
 const apiSearchCall = async () => {
     const response = await fetch(
-        `/api/news/latest?page=${page}`
+        "/api/news/latest" + (cursor ? `?cursor=${encodeURIComponent(cursor)}` : "")
     );
     if (!response.ok) {
         alert("Error fetching latest news. Please try again.");
         return null;
     }
+    // Keyset cursor of the next page, missing on the last one
+    cursor = response.headers.get("X-Next-Cursor");
+    hasMore = cursor !== null;
     return await response.json();
 }
 
@@ -15,7 +19,6 @@ const loadMoreResults = async () => {
     document.getElementById("spinner").classList.remove("hidden");
     document.getElementById("load-more-btn").disabled = true;
     console.log("Loading more results...");
-    page++;
     const res = await apiSearchCall();
     render(res);
     document.getElementById("spinner").classList.add("hidden");
@@ -76,12 +79,19 @@ const render = (data) => {
 
         news_list.appendChild(anchor);
     });
-    if (data.length < 10) {
+    if (!hasMore) {
         document.getElementById("load-more-btn").classList.add("hidden");
         return;
     }
 }
 
 document.addEventListener('DOMContentLoaded', function() {
-    loadMoreResults(); // Load initial results
+    const newsList = document.getElementById("news-list");
+    if (newsList.dataset.rendered === undefined) {
+        loadMoreResults(); // Load initial results
+        return;
+    }
+    // First page rendered by the server, continue from its cursor
+    cursor = newsList.dataset.nextCursor || null;
+    hasMore = cursor !== null;
 });
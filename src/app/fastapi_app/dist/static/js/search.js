@@ -1,5 +1,5 @@
 let searchQueryString = "";
-let searchPage = 1;
+let searchCursor = null;
 
 const setLoadingState = (isLoading) => {
     const spinner = document.getElementById("spinner");
@@ -21,18 +21,23 @@ const setLoadingState = (isLoading) => {
 
 
 const apiSearchCall = async () => {
-    const endpoint = "/api/search?" + searchQueryString + `&page=${searchPage}`;
+    let endpoint = "/api/search?" + searchQueryString;
+    if (searchCursor) {
+        endpoint += `&cursor=${encodeURIComponent(searchCursor)}`;
+    }
     try {
         const response = await fetch(endpoint);
         if (response.status === 404) {
             // alert("No se encontraron nuevos resultados para la búsqueda.");
+            searchCursor = null;
             return [];
         }
         if (!response.ok) {
-            searchPage--; // Revert page increment if the call fails
             alert("Error fetching search results. Please try again.");
             return null
         }
+        // Keyset cursor of the next page, missing on the last one
+        searchCursor = response.headers.get("X-Next-Cursor");
         return await response.json();
     } catch (error) {
         console.error("Error fetching data:", error);
@@ -48,14 +53,18 @@ const query = (text, o_date_from, o_date_to, i_date_from, i_date_to) => {
     if (i_date_from) params.append("inserted_date_from", i_date_from);
     if (i_date_to) params.append("inserted_date_to", i_date_to);
     searchQueryString = params.toString();
-    searchPage = 1;
+    searchCursor = null;
     return params.toString();
 }
 
 const resetForm = () => {
-    document.getElementById("search-form").reset();
+    // Not reset(), it would restore the values rendered by the server
+    document.querySelectorAll("#search-form input").forEach((input) => {
+        input.value = "";
+    });
+    history.replaceState(null, "", window.location.pathname);
     searchQueryString = "";
-    searchPage = 1;
+    searchCursor = null;
     document.getElementById("search-results").classList.add("hidden");
     setLoadingState(false);
 }
@@ -93,6 +102,8 @@ const search = async (e) => {
         formData.get("inserted_date_from"),
         formData.get("inserted_date_to")
     );
+    // Same URL renders these results on the server (reload, share)
+    history.replaceState(null, "", "?" + searchQueryString);
     // console.log("Query String:", searchQueryString);
     const res = await apiSearchCall();
     // console.log(res);
@@ -103,8 +114,6 @@ const search = async (e) => {
 const loadMoreResults = async (e) => {
     setLoadingState(true);
     console.log("Loading more results...");
-    // Implement pagination logic here if needed
-    searchPage++;
     const res = await apiSearchCall();
     renderRows(res);
     setLoadingState(false);
@@ -154,6 +163,13 @@ const renderRows = (results) => {
         titleLink.classList.add("text-blue-500", "hover:underline");
 
         titleCell.appendChild(titleLink);
+        if (result.snippet) {
+            // Already HTML escaped by the API, only <mark> tags are added
+            const snippet = document.createElement("p");
+            snippet.innerHTML = result.snippet;
+            snippet.classList.add("text-sm", "text-slate-400");
+            titleCell.appendChild(snippet);
+        }
         origDateCell.textContent = formatDatetime(result.origin_created_at);
         insDateCell.textContent = formatDatetime(result.inserted_at);
         // insDateCell.textContent = result.inserted_at ? new Date(result.inserted_at).toString() : "N/A";
@@ -163,9 +179,18 @@ const renderRows = (results) => {
         insDateCell.classList.add("p-2", "border-b", "border-slate-600");
     });
 
-    if (!results || results.length < 50) {
+    if (!results || !searchCursor) {
         document.getElementById("search-load-more-btn").classList.add("hidden");
     } else {
         document.getElementById("search-load-more-btn").classList.remove("hidden");
     }
 }
+
+document.addEventListener('DOMContentLoaded', function() {
+    // Results of the query string rendered by the server, continue from them
+    const results = document.getElementById("search-results");
+    if (results.dataset.query) {
+        searchQueryString = results.dataset.query;
+        searchCursor = results.dataset.nextCursor || null;
+    }
+});
@@ -0,0 +1,20 @@
+from hashlib import sha1
+
+# Bump when the output of the cached endpoints changes (templates, schemas),
+# so clients holding an old ETag get the new representation.
+RESPONSE_VERSION = "3"
+
+
+def make_etag(*parts: object) -> str:
+    digest = sha1(":".join([RESPONSE_VERSION, *map(str, parts)]).encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return etag in tags
@@ -1,29 +1,264 @@
-import os
-from typing import Annotated
-from fastapi import FastAPI, Request, HTTPException, status, Depends
-from fastapi.templating import Jinja2Templates
+from collections.abc import AsyncIterator, Iterator
+from datetime import UTC, datetime, timedelta
+from typing import Annotated, Literal
+from urllib.parse import urlencode
+
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, status
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
-from starlette.exceptions import HTTPException as StarletteHTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy import Connection, Engine, Row, null, select
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.orm import Session
-from sqlalchemy import select
-from datetime import datetime, timedelta, timezone
+from sqlalchemy.sql.elements import ColumnElement
+from starlette.exceptions import HTTPException as StarletteHTTPException
 
 # from database_models import Base as DbBase
 from .. import database_models as models
+from ..constants import NEWS_TIMEZONE
+from ..database_fts import NewsFTS, news_fts
 from ..logger import LogWrapper
-from .schemas import NewsResponse, NewsShortResponse, NewsSearchResponse
+from .caching import (
+    DETAIL_CACHE_CONTROL,
+    LISTING_CACHE_CONTROL,
+    is_not_modified,
+    listing_etag,
+    listing_version,
+    news_etag,
+    not_modified,
+    set_cache_headers,
+)
 from .database import get_db
-
+from .pagination import NEXT_CURSOR_HEADER, Cursor, date_order, inserted_order
+from .schemas import NewsResponse, NewsSearchResponse, NewsShortResponse
+from .serializers import CsvLines, RowSerializer, json_response, ndjson_lines
+from .templating import build_templates
 
 app = FastAPI()
 
-templates = Jinja2Templates(
-    directory=os.path.join(os.path.dirname(__file__), "templates")
-)
+templates = build_templates()
 
 logger = LogWrapper().logger
 
+# Only the columns each listing response needs, `content` is never loaded.
+# Selected as plain rows, without building ORM objects.
+LATEST_COLUMNS = (
+    models.News.id,
+    models.News.url,
+    models.News.title,
+    models.News.summary,
+    models.News.photo_id,
+    models.News.origin_created_at,
+)
+SEARCH_COLUMNS = (
+    models.News.id,
+    models.News.title,
+    models.News.origin_created_at,
+    models.News.inserted_at,
+)
+NEWS_ITEM_COLUMNS = (
+    models.News.id,
+    models.News.url,
+    models.News.title,
+    models.News.content,
+    models.News.photo_id,
+    models.News.response_elapsed_seconds,
+    models.News.parse_elapsed_seconds,
+    models.News.origin_created_at,
+    models.News.indexed_at,
+    models.News.inserted_at,
+)
+
+# JSON of the API rows, the schemas are the contract (`response_model`)
+LATEST_SERIALIZER = RowSerializer(
+    NewsShortResponse,
+    [column.key for column in LATEST_COLUMNS],
+    photo_url=(models.News.build_photo_url, "photo_id"),
+    content=(lambda summary: summary or "...", "summary"),
+)
+SEARCH_SERIALIZER = RowSerializer(
+    NewsSearchResponse,
+    # Followed by the columns labeled in `search_news`
+    [*(column.key for column in SEARCH_COLUMNS), "snippet", "rank"],
+    photo_url=None,  # Search results have no photo
+    snippet=(NewsFTS.snippet_to_html, "snippet"),
+)
+NEWS_ITEM_SERIALIZER = RowSerializer(
+    NewsResponse,
+    [column.key for column in NEWS_ITEM_COLUMNS],
+    photo_url=(models.News.build_photo_url, "photo_id"),
+)
+
+
+# Rows per page of each listing
+LATEST_PAGE_SIZE = 10
+SEARCH_PAGE_SIZE = 50
+
+
+def latest_news(
+    db: Session,
+    page: int = 1,
+    cursor: str | None = None,
+) -> tuple[list[Row], Cursor | None]:
+    """A page of the latest news, newest first.
+
+    :param db: Database session
+    :type db: Session
+    :param page: Page number, only used without `cursor`, defaults to 1
+    :type page: int, optional
+    :param cursor: Cursor of the previous page, defaults to None
+    :type cursor: str | None, optional
+    :return: News of the page (`LATEST_COLUMNS`) and cursor of the next
+        one (None if last)
+    :rtype: tuple[list[Row], Cursor | None]
+    """
+    logger.info("Fetching news items from the database")
+    query = select(*LATEST_COLUMNS).order_by(*date_order())
+    if cursor:
+        query = query.where(Cursor.decode(cursor, Cursor.DATE).date_filter())
+    elif page > 1:
+        # Kept for old clients, `cursor` doesn't need to skip rows
+        query = query.offset((page - 1) * LATEST_PAGE_SIZE)
+    news_items = db.execute(query.limit(LATEST_PAGE_SIZE)).all()
+    next_cursor = None
+    if len(news_items) == LATEST_PAGE_SIZE:
+        next_cursor = Cursor.after_news(news_items[-1])
+    return list(news_items), next_cursor
+
+
+def filter_datetime(value: str) -> datetime:
+    """Datetime of a search filter, dates without offset are local ones.
+
+    :param value: ISO 8601 date or datetime
+    :type value: str
+    :raises HTTPException: 400 if it isn't a valid date
+    :return: Aware datetime
+    :rtype: datetime
+    """
+    try:
+        d = datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid date: {value}",
+        )
+    if d.tzinfo is None:
+        d = d.replace(tzinfo=NEWS_TIMEZONE)
+    return d
+
+
+def date_filters(
+    origin_date_from: str | None = None,
+    origin_date_to: str | None = None,
+    inserted_date_from: str | None = None,
+    inserted_date_to: str | None = None,
+) -> list[ColumnElement[bool]]:
+    """Conditions of the search date filters (`to` dates are inclusive)."""
+    filters = []
+    if origin_date_from:
+        d = filter_datetime(origin_date_from)
+        filters.append(models.News.origin_created_at >= d)
+    if origin_date_to:
+        d = filter_datetime(origin_date_to)
+        filters.append(models.News.origin_created_at < d + timedelta(days=1))
+    if inserted_date_from:
+        d = filter_datetime(inserted_date_from)
+        filters.append(models.News.inserted_at >= d)
+    if inserted_date_to:
+        d = filter_datetime(inserted_date_to)
+        filters.append(models.News.inserted_at < d + timedelta(days=1))
+    return filters
+
+
+def search_news(
+    db: Session,
+    text: str | None = None,
+    origin_date_from: str | None = None,
+    origin_date_to: str | None = None,
+    inserted_date_from: str | None = None,
+    inserted_date_to: str | None = None,
+    page: int = 1,
+    cursor: str | None = None,
+) -> tuple[list[Row], Cursor | None]:
+    """A page of search results.
+
+    Text is searched in the full-text index, ranked by relevance, falling
+    back to `LIKE` (newest first) if it's not available.
+
+    :param db: Database session
+    :type db: Session
+    :param text: Text to search, defaults to None
+    :type text: str | None, optional
+    :param origin_date_from: First origin date (ISO), defaults to None
+    :type origin_date_from: str | None, optional
+    :param origin_date_to: Last origin date (ISO, inclusive), defaults to None
+    :type origin_date_to: str | None, optional
+    :param inserted_date_from: First insertion date (ISO), defaults to None
+    :type inserted_date_from: str | None, optional
+    :param inserted_date_to: Last insertion date (ISO, inclusive), defaults to None
+    :type inserted_date_to: str | None, optional
+    :param page: Page number, only used without `cursor`, defaults to 1
+    :type page: int, optional
+    :param cursor: Cursor of the previous page, defaults to None
+    :type cursor: str | None, optional
+    :return: News (`SEARCH_COLUMNS` and the raw `snippet`, only set by the
+        full-text search) and cursor of the next page (None if last)
+    :rtype: tuple[list[Row], Cursor | None]
+    """
+    filters = date_filters(
+        origin_date_from,
+        origin_date_to,
+        inserted_date_from,
+        inserted_date_to,
+    )
+    # Kept for old clients, `cursor` doesn't need to skip rows
+    offset = (page - 1) * SEARCH_PAGE_SIZE if page > 1 and not cursor else 0
+
+    news_items = None
+    next_cursor = None
+    match_query = NewsFTS.match_query(text) if text else None
+    if match_query and NewsFTS.AVAILABLE:
+        rank = NewsFTS.rank()
+        query = (
+            select(
+                *SEARCH_COLUMNS,
+                NewsFTS.snippet().label("snippet"),
+                rank.label("rank"),
+            )
+            .join(news_fts, news_fts.c.rowid == models.News.id)
+            .where(NewsFTS.matches(match_query), *filters)
+        )
+        if cursor:
+            query = query.where(Cursor.decode(cursor, Cursor.RANK).rank_filter(rank))
+        query = (
+            query.order_by(rank, models.News.id).offset(offset).limit(SEARCH_PAGE_SIZE)
+        )
+        try:
+            news_items = db.execute(query).all()
+            if len(news_items) == SEARCH_PAGE_SIZE:
+                last_item = news_items[-1]
+                next_cursor = Cursor.after_rank(last_item.rank, last_item.id)
+        except DBAPIError as e:
+            logger.warning(f"Full-text search failed, falling back to LIKE: {e}")
+            db.rollback()
+    if news_items is None:
+        query = select(
+            *SEARCH_COLUMNS,
+            null().label("snippet"),
+            null().label("rank"),
+        ).where(*filters)
+        if text:
+            query = query.where(
+                models.News.title.ilike(f"%{text}%")
+                | models.News.content.ilike(f"%{text}%")
+            )
+        if cursor:
+            query = query.where(Cursor.decode(cursor, Cursor.DATE).date_filter())
+        query = query.order_by(*date_order())
+        news_items = db.execute(query.offset(offset).limit(SEARCH_PAGE_SIZE)).all()
+        if len(news_items) == SEARCH_PAGE_SIZE:
+            next_cursor = Cursor.after_news(news_items[-1])
+    return news_items, next_cursor
+
 
 @app.get("/about", include_in_schema=False)
 async def about(
@@ -37,8 +272,26 @@ async def about(
 
 @app.get("/", include_in_schema=False, name="index")
 @app.get("/news", include_in_schema=False, name="news_index")
-async def index(req: Request):
-    return templates.TemplateResponse(req, "home.html")
+async def index(
+    req: Request,
+    db: Annotated[Session, Depends(get_db)],
+):
+    version, last_modified = listing_version(db)
+    etag = listing_etag("home", req, version)
+    if is_not_modified(req, etag):
+        return not_modified(etag, LISTING_CACHE_CONTROL)
+    # First page rendered here, `home.js` only fetches the next ones
+    news_items, next_cursor = latest_news(db)
+    response = templates.TemplateResponse(
+        req,
+        "home.html",
+        {
+            "news_items": news_items,
+            "next_cursor": next_cursor.encode() if next_cursor else None,
+        },
+    )
+    set_cache_headers(response, etag, LISTING_CACHE_CONTROL, last_modified)
+    return response
 
 
 @app.get("/news/{news_id}", include_in_schema=False)
@@ -57,15 +310,18 @@ async def get_news_item(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"News item with ID {news_id} not found",
         )
+    etag = news_etag("page", news_id, news.inserted_at)
+    if is_not_modified(req, etag):
+        return not_modified(etag, DETAIL_CACHE_CONTROL)
 
     def convert_dt(dt):
         if dt is None:
             return None
         if dt.tzinfo is None:
-            dt = dt.replace(tzinfo=timezone.utc)
-        return dt.astimezone(timezone(timedelta(hours=-3)))
+            dt = dt.replace(tzinfo=UTC)
+        return dt.astimezone(NEWS_TIMEZONE)
 
-    return templates.TemplateResponse(
+    response = templates.TemplateResponse(
         req,
         "news_detail.html",
         {
@@ -78,15 +334,45 @@ async def get_news_item(
             }
         },
     )
+    set_cache_headers(response, etag, DETAIL_CACHE_CONTROL, news.inserted_at)
+    return response
 
 
 @app.get("/search", include_in_schema=False)
 async def search(
     req: Request,
     db: Annotated[Session, Depends(get_db)],
+    text: str | None = None,
+    origin_date_from: str | None = None,
+    origin_date_to: str | None = None,
+    inserted_date_from: str | None = None,
+    inserted_date_to: str | None = None,
 ):
     logger.info(f"query: {req.url.query}")
-    return templates.TemplateResponse(req, "search.html")
+    version, last_modified = listing_version(db)
+    etag = listing_etag("search_page", req, version)
+    if is_not_modified(req, etag):
+        return not_modified(etag, LISTING_CACHE_CONTROL)
+    filters = {
+        "text": text,
+        "origin_date_from": origin_date_from,
+        "origin_date_to": origin_date_to,
+        "inserted_date_from": inserted_date_from,
+        "inserted_date_to": inserted_date_to,
+    }
+    filters = {name: value for name, value in filters.items() if value}
+    context = {"query": text, **filters, "results": None}
+    if filters:
+        # First page rendered here, `search.js` only fetches the next ones
+        results, next_cursor = search_news(db, **filters)
+        context |= {
+            "results": results,
+            "search_query": urlencode(filters),
+            "next_cursor": next_cursor.encode() if next_cursor else None,
+        }
+    response = templates.TemplateResponse(req, "search.html", context)
+    set_cache_headers(response, etag, LISTING_CACHE_CONTROL, last_modified)
+    return response
 
 
 @app.get("/api/news/latest", response_model=list[NewsShortResponse])
@@ -94,26 +380,143 @@ async def get_news(
     req: Request,
     db: Annotated[Session, Depends(get_db)],
     page: int = 1,
+    cursor: str | None = None,
 ):
-    logger.info("Fetching news items from the database")
-    query = select(models.News).order_by(models.News.origin_created_at.desc())
-    if page > 1:
-        query = query.offset((page - 1) * 10)
-    result = db.execute(query.limit(10))
-    news_items = result.scalars().all()
+    version, last_modified = listing_version(db)
+    etag = listing_etag("latest", req, version)
+    if is_not_modified(req, etag):
+        return not_modified(etag, LISTING_CACHE_CONTROL)
+    news_items, next_cursor = latest_news(db, page, cursor)
     if not news_items:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="No news items found",
         )
-    return [
-        {
-            **item.__dict__,
-            "photo_url": item.photo_url,
-            "content": item.content[:150].replace("\n", "")[:100] + "...",
+    response = json_response(LATEST_SERIALIZER.to_dicts(news_items))
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor.encode()
+    set_cache_headers(response, etag, LISTING_CACHE_CONTROL, last_modified)
+    return response
+
+
+# Rows read per query by the export, bounds the memory used by the stream
+EXPORT_CHUNK_SIZE = 200
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+def export_chunks(
+    db: Session,
+    filters: list[ColumnElement[bool]],
+    chunk_size: int = EXPORT_CHUNK_SIZE,
+) -> Iterator[list[Row]]:
+    """News matching `filters` in chunks, oldest inserted first.
+
+    Each chunk is a query starting right after the last row of the previous
+    one (`ix_news_inserted_at_id`), so no OFFSET rows are walked and only
+    one chunk is held at a time.
+
+    :param db: Database session
+    :type db: Session
+    :param filters: Conditions on `news`
+    :type filters: list[ColumnElement[bool]]
+    :param chunk_size: Rows per query, defaults to `EXPORT_CHUNK_SIZE`
+    :type chunk_size: int, optional
+    :return: Chunks of rows (`NEWS_ITEM_COLUMNS`)
+    :rtype: Iterator[list[Row]]
+    """
+    query = (
+        select(*NEWS_ITEM_COLUMNS)
+        .where(*filters)
+        .order_by(*inserted_order())
+        .limit(chunk_size)
+    )
+    cursor = None
+    while True:
+        chunk_query = query.where(cursor.inserted_filter()) if cursor else query
+        rows = db.execute(chunk_query).all()
+        if rows:
+            yield rows
+        if len(rows) < chunk_size:
+            return
+        cursor = Cursor.after_inserted(rows[-1])
+
+
+async def export_stream(
+    bind: Engine | Connection,
+    filters: list[ColumnElement[bool]],
+    export_format: str,
+) -> AsyncIterator[bytes]:
+    """Lines of the export, read through a session of its own.
+
+    The body is streamed after the request returns, when its session is
+    already closed, so the stream opens one and closes it when it ends.
+
+    :param bind: Engine (or connection) of the request session
+    :type bind: Engine | Connection
+    :param filters: Conditions on `news`
+    :type filters: list[ColumnElement[bool]]
+    :param export_format: `EXPORT_MEDIA_TYPES` key
+    :type export_format: str
+    :return: Encoded lines, a chunk of rows at a time
+    :rtype: AsyncIterator[bytes]
+    """
+    # Async, otherwise Starlette iterates it in a thread (Pyodide has none)
+    csv_lines = None
+    if export_format == "csv":
+        csv_lines = CsvLines(NEWS_ITEM_SERIALIZER.schema.model_fields)
+        yield csv_lines.header()
+    session = Session(bind)
+    try:
+        for rows in export_chunks(session, filters):
+            items = NEWS_ITEM_SERIALIZER.to_dicts(rows)
+            yield csv_lines.lines(items) if csv_lines else ndjson_lines(items)
+    finally:
+        session.close()
+
+
+@app.get(
+    "/api/news/export",
+    response_class=StreamingResponse,
+    responses={
+        200: {
+            "description": "News in the `NewsResponse` shape, one per line",
+            "content": {media_type: {} for media_type in EXPORT_MEDIA_TYPES.values()},
         }
-        for item in news_items
-    ]
+    },
+)
+async def export_news(
+    db: Annotated[Session, Depends(get_db)],
+    export_format: Annotated[
+        Literal["ndjson", "csv"], Query(alias="format")
+    ] = "ndjson",
+    since: str | None = None,
+    origin_date_from: str | None = None,
+    origin_date_to: str | None = None,
+    inserted_date_from: str | None = None,
+    inserted_date_to: str | None = None,
+):
+    """Stream all news, or the filtered ones, oldest inserted first.
+
+    For incremental syncs, pass the `inserted_at` of the last news received
+    as `since` (inclusive, news inserted in that same second come again).
+    """
+    filters = date_filters(
+        origin_date_from,
+        origin_date_to,
+        inserted_date_from,
+        inserted_date_to,
+    )
+    if since:
+        filters.append(models.News.inserted_at >= filter_datetime(since))
+    logger.info(f"Exporting news as {export_format}")
+    return StreamingResponse(
+        export_stream(db.get_bind(), filters, export_format),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="news.{export_format}"'},
+    )
 
 
 @app.get("/api/news/{news_id}", response_model=NewsResponse)
@@ -124,14 +527,20 @@ async def get_news_item_api(
 ):
     # logger.info(f"Fetching news item with ID {news_id} from the database")
     try:
-        result = db.execute(select(models.News).where(models.News.id == news_id))
-        news_item = result.scalars().first()
+        news_item = db.execute(
+            select(*NEWS_ITEM_COLUMNS).where(models.News.id == news_id)
+        ).first()
         if not news_item:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"News item with ID {news_id} not found",
             )
-        return news_item
+        etag = news_etag("api", news_id, news_item.inserted_at)
+        if is_not_modified(req, etag):
+            return not_modified(etag, DETAIL_CACHE_CONTROL)
+        response = json_response(NEWS_ITEM_SERIALIZER.to_dict(news_item))
+        set_cache_headers(response, etag, DETAIL_CACHE_CONTROL, news_item.inserted_at)
+        return response
     except HTTPException:
         raise
     except Exception as e:
@@ -151,42 +560,33 @@ async def api_search(
     inserted_date_from: str | None = None,
     inserted_date_to: str | None = None,
     page: int = 1,
+    cursor: str | None = None,
 ):
     logger.info(f"API Search called with query: {req.url.query}")
-    query = select(models.News)
-    if text:
-        query = query.where(
-            models.News.title.ilike(f"%{text}%")
-            | models.News.content.ilike(f"%{text}%")
-        )
-    if origin_date_from:
-        d = datetime.fromisoformat(origin_date_from)
-        query = query.where(models.News.origin_created_at >= d)
-    if origin_date_to:
-        d = datetime.fromisoformat(origin_date_to)
-        query = query.where(models.News.origin_created_at < d + timedelta(days=1))
-    if inserted_date_from:
-        d = datetime.fromisoformat(inserted_date_from)
-        query = query.where(models.News.inserted_at >= d)
-    if inserted_date_to:
-        d = datetime.fromisoformat(inserted_date_to)
-        query = query.where(models.News.inserted_at < d + timedelta(days=1))
-    if page > 1:
-        query = query.offset((page - 1) * 50)
-    result = db.execute(query.order_by(models.News.origin_created_at.desc()).limit(50))
-    news_items = result.scalars().all()
+    version, last_modified = listing_version(db)
+    etag = listing_etag("search", req, version)
+    if is_not_modified(req, etag):
+        return not_modified(etag, LISTING_CACHE_CONTROL)
+    news_items, next_cursor = search_news(
+        db,
+        text,
+        origin_date_from,
+        origin_date_to,
+        inserted_date_from,
+        inserted_date_to,
+        page,
+        cursor,
+    )
     if not news_items:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="No news items found matching the search criteria",
         )
-    return [
-        {
-            **item.__dict__,
-            "content": item.content[:150].replace("\n", "")[:100] + "...",
-        }
-        for item in news_items
-    ]
+    response = json_response(SEARCH_SERIALIZER.to_dicts(news_items))
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor.encode()
+    set_cache_headers(response, etag, LISTING_CACHE_CONTROL, last_modified)
+    return response
 
 
 @app.exception_handler(StarletteHTTPException)
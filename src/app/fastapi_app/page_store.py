@@ -0,0 +1,301 @@
+import json
+import re
+from math import inf
+from urllib.parse import urlsplit
+
+from sqlalchemy import ScalarSelect, delete, func, insert, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.elements import ColumnElement
+
+from ..database_models import News, RenderedPage
+from ..fetcher import Deadline, DeadlineExceeded, fetch
+from ..logger import LogWrapper
+from .database import db_session
+from .etag import RESPONSE_VERSION, etag_matches
+
+LATEST_PATH = "/api/news/latest"
+# Home page, with the first latest news page embedded
+HOME_PATHS = ("/", "/news")
+DETAIL_PATH = re.compile(r"/news/\d+")
+# Response headers stored with each page
+STORED_HEADERS = (
+    "content-type",
+    "etag",
+    "cache-control",
+    "last-modified",
+    "x-next-cursor",
+)
+
+
+class PageStore(LogWrapper):
+    """Responses rendered ahead of time, kept in `rendered_page`.
+
+    News detail pages, the home page and the first pages of the latest
+    news are rendered through the FastAPI app on their first request (so
+    they are the exact route responses), and then served by
+    `Default.fetch` without loading FastAPI or Jinja. Pages are stored per
+    base URL, as their links are absolute. Detail pages never change;
+    listing pages (home included) are stored with the latest news ID they
+    were rendered against (`listing_version`), are only served while it's
+    still the latest one, and are dropped whenever news are inserted.
+    """
+
+    # Public URL of the webpage, requested by `warm`. Without it pages are
+    # only rendered on their first visit.
+    SITE_URL: str = ""
+    # Latest news pages kept rendered: the first one and the next by cursor
+    LATEST_PAGES: int = 3
+    # Seconds `warm` may take, within the invocation deadline
+    WARM_BUDGET: float = 30
+
+    @classmethod
+    def setup_config(cls, site_url: str = "", latest_pages: int | None = None) -> None:
+        if site_url:
+            cls.SITE_URL = site_url.rstrip("/")
+        if latest_pages is not None:
+            cls.LATEST_PAGES = latest_pages
+
+    def __init__(self, session: Session) -> None:
+        super().__init__()
+        self.session = session
+
+    @staticmethod
+    def key(path: str, query: str) -> str | None:
+        """Store key of a GET request, None if its response is never stored.
+
+        :param path: Request path
+        :type path: str
+        :param query: Request query string
+        :type query: str
+        :return: Path and query string
+        :rtype: str | None
+        """
+        if (DETAIL_PATH.fullmatch(path) or path in HOME_PATHS) and not query:
+            return path
+        if path == LATEST_PATH:
+            if not query:
+                return path
+            if query.startswith("cursor=") and "&" not in query:
+                return f"{path}?{query}"
+        return None
+
+    @staticmethod
+    def renders_on_miss(key: str) -> bool:
+        # Cursor pages are only stored along with the first latest page
+        # (`render_latest`), so the store stays bounded
+        return "?" not in key
+
+    @staticmethod
+    def headers(page: RenderedPage) -> dict[str, str]:
+        return dict(json.loads(page.headers))
+
+    @staticmethod
+    def is_listing(key: str) -> bool:
+        return key.startswith(LATEST_PATH) or key in HOME_PATHS
+
+    @staticmethod
+    def listing_version() -> ScalarSelect[int]:
+        """Version of the listing pages: the latest news ID (0 if none)."""
+        return select(func.coalesce(func.max(News.id), 0)).scalar_subquery()
+
+    @staticmethod
+    def listings() -> ColumnElement[bool]:
+        """Condition matching the stored pages listing the latest news."""
+        return RenderedPage.path.startswith(LATEST_PATH) | RenderedPage.path.in_(
+            HOME_PATHS
+        )
+
+    @classmethod
+    def is_not_modified(cls, page: RenderedPage, if_none_match: str | None) -> bool:
+        return etag_matches(if_none_match, cls.headers(page)["etag"])
+
+    def get(self, key: str, base_url: str) -> RenderedPage | None:
+        """Stored page, None if it's missing or outdated.
+
+        :param key: Store key (`key`)
+        :type key: str
+        :param base_url: Scheme and host of the request
+        :type base_url: str
+        :return: Page
+        :rtype: RenderedPage | None
+        """
+        conditions = [
+            RenderedPage.base_url == base_url,
+            RenderedPage.path == key,
+            RenderedPage.response_version == RESPONSE_VERSION,
+        ]
+        if self.is_listing(key):
+            conditions.append(RenderedPage.listing_version == self.listing_version())
+        return self.session.execute(
+            select(RenderedPage).where(*conditions)
+        ).scalar_one_or_none()
+
+    async def get_or_render(self, key: str, base_url: str) -> RenderedPage | None:
+        """Stored page, rendering it first if it's missing and allowed.
+
+        :param key: Store key (`key`)
+        :type key: str
+        :param base_url: Scheme and host of the request
+        :type base_url: str
+        :return: Page, None if it has to be served by the app
+        :rtype: RenderedPage | None
+        """
+        page = self.get(key, base_url)
+        if page is None and key == LATEST_PATH:
+            page = await self.render_latest(base_url)
+        elif page is None and self.renders_on_miss(key):
+            page = await self.render(key, base_url)
+        return page
+
+    async def render_latest(self, base_url: str) -> RenderedPage | None:
+        """Render the first `LATEST_PAGES` pages of the latest news,
+        following their cursors.
+
+        :param base_url: Scheme and host the pages are rendered for
+        :type base_url: str
+        :return: First page, None if its response isn't a 200
+        :rtype: RenderedPage | None
+        """
+        first = page = await self.render(LATEST_PATH, base_url)
+        for _ in range(self.LATEST_PAGES - 1):
+            cursor = page and self.headers(page).get("x-next-cursor")
+            if not cursor:
+                break
+            page = await self.render(f"{LATEST_PATH}?cursor={cursor}", base_url)
+        return first
+
+    async def render(self, key: str, base_url: str) -> RenderedPage | None:
+        """Render a page through the FastAPI app and store it.
+
+        :param key: Store key (`key`)
+        :type key: str
+        :param base_url: Scheme and host the page is rendered for
+        :type base_url: str
+        :return: Page, None if the response isn't a 200
+        :rtype: RenderedPage | None
+        """
+        from .main import app  # Only loaded when rendering
+
+        # Read before rendering: news inserted meanwhile make the page outdated
+        listing_version = (
+            self.session.scalar(select(self.listing_version()))
+            if self.is_listing(key)
+            else None
+        )
+        status, headers, body = await asgi_get(app, key, base_url, self.session)
+        if status != 200:
+            return None
+        page = RenderedPage(
+            base_url=base_url,
+            path=key,
+            response_version=RESPONSE_VERSION,
+            listing_version=listing_version,
+            headers=json.dumps([h for h in headers if h[0] in STORED_HEADERS]),
+            body=body.decode(),
+        )
+        try:
+            self.session.execute(
+                insert(RenderedPage).prefix_with("OR REPLACE"),
+                [
+                    {
+                        "base_url": page.base_url,
+                        "path": page.path,
+                        "response_version": page.response_version,
+                        "listing_version": page.listing_version,
+                        "headers": page.headers,
+                        "body": page.body,
+                    }
+                ],
+            )
+            self.session.commit()
+        except SQLAlchemyError as e:
+            # Still served, it will be rendered again next time
+            self.session.rollback()
+            self.logger.warning(f"Couldn't store rendered page {key}: {e}")
+        return page
+
+    def drop_listings(self) -> None:
+        """Drop the listing pages, after inserting news.
+
+        They are outdated already (`listing_version`), this only frees their
+        rows. Errors are only logged, the news are already saved.
+        """
+        try:
+            self.session.execute(delete(RenderedPage).where(self.listings()))
+            self.session.commit()
+        except SQLAlchemyError as e:
+            self.session.rollback()
+            self.logger.warning(f"Couldn't drop rendered listing pages: {e}")
+
+    async def warm(self, news_ids: list[int]) -> None:
+        """Request the listing pages and the new detail pages from
+        `SITE_URL`, so the webpage renders them before their first visit.
+
+        Takes up to `WARM_BUDGET` seconds, cut short by the current
+        `Deadline`. Errors are only logged, missing pages are rendered on
+        their first visit anyway.
+
+        :param news_ids: IDs of the inserted news
+        :type news_ids: list[int]
+        """
+        if not self.SITE_URL:
+            return
+        current = Deadline.current()
+        budget = min(self.WARM_BUDGET, current.remaining() if current else inf)
+        keys = [HOME_PATHS[0], LATEST_PATH, *(f"/news/{i}" for i in news_ids)]
+        with Deadline.start(budget):
+            for key in keys:
+                try:
+                    async with fetch(f"{self.SITE_URL}{key}") as response:
+                        await response.bytes()
+                except DeadlineExceeded as e:
+                    self.logger.warning(f"Stopped warming rendered pages: {e}")
+                    return
+                except Exception as e:  # noqa: BLE001
+                    self.logger.warning(f"Couldn't warm rendered page {key}: {e}")
+
+
+async def asgi_get(
+    app, key: str, base_url: str, session: Session
+) -> tuple[int, list[tuple[str, str]], bytes]:
+    """GET `key` from an ASGI app in-process, with `session` as its database.
+
+    :return: Status, headers (lowercase names) and body
+    :rtype: tuple[int, list[tuple[str, str]], bytes]
+    """
+    url = urlsplit(base_url)
+    path, _, query = key.partition("?")
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": url.scheme,
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": query.encode(),
+        "headers": [(b"host", url.netloc.encode())],
+        "client": None,
+        "server": (url.hostname, url.port or (443 if url.scheme == "https" else 80)),
+    }
+    messages: list[dict] = []
+
+    async def receive() -> dict:
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: dict) -> None:
+        messages.append(message)
+
+    token = db_session.set(session)
+    try:
+        await app(scope, receive, send)
+    finally:
+        db_session.reset(token)
+    headers = [
+        (name.decode().lower(), value.decode())
+        for name, value in messages[0].get("headers", [])
+    ]
+    body = b"".join(message.get("body", b"") for message in messages[1:])
+    return messages[0]["status"], headers, body
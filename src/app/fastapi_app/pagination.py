@@ -0,0 +1,127 @@
+import json
+import math
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from typing import Any
+
+from fastapi import HTTPException, status
+from sqlalchemy import and_, or_
+from sqlalchemy.sql.elements import ColumnElement
+
+from .. import database_models as models
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class Cursor:
+    """Opaque keyset pagination cursor.
+
+    It holds the sort key of the last row of a page, so the next page can
+    start right after it instead of walking and discarding OFFSET rows.
+    Three kinds exist:
+
+    - `date`: `(origin_created_at, id)` for listings sorted by date, the
+      date as epoch seconds (ISO strings of older cursors still work)
+    - `rank`: `(bm25 rank, id)` for full-text search results
+    - `inserted`: `(inserted_at, id)` as epoch seconds, for the export
+      (oldest inserted first)
+    """
+
+    DATE = "date"
+    RANK = "rank"
+    INSERTED = "inserted"
+
+    def __init__(self, kind: str, key: Any, id: int) -> None:
+        self.kind = kind
+        self.key = key
+        self.id = id
+
+    @classmethod
+    def after_news(cls, news: Any) -> "Cursor":
+        origin_created_at = news.origin_created_at
+        return cls(
+            cls.DATE,
+            int(origin_created_at.timestamp()) if origin_created_at else None,
+            news.id,
+        )
+
+    @classmethod
+    def after_inserted(cls, news: Any) -> "Cursor":
+        return cls(cls.INSERTED, int(news.inserted_at.timestamp()), news.id)
+
+    @classmethod
+    def after_rank(cls, rank: float, news_id: int) -> "Cursor":
+        return cls(cls.RANK, rank, news_id)
+
+    def encode(self) -> str:
+        raw = json.dumps([self.kind, self.key, self.id], separators=(",", ":"))
+        return urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+    @classmethod
+    def decode(cls, cursor: str, kind: str) -> "Cursor":
+        """Decode a cursor received from a client.
+
+        :param cursor: Encoded cursor
+        :type cursor: str
+        :param kind: Expected cursor kind
+        :type kind: str
+        :raises HTTPException: 400 if the cursor is malformed or of another kind
+        :return: Decoded cursor
+        :rtype: Cursor
+        """
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            decoded_kind, key, news_id = json.loads(urlsafe_b64decode(padded))
+            if decoded_kind != kind or not isinstance(news_id, int):
+                raise ValueError(f"Unexpected cursor kind {decoded_kind}")
+            if kind == cls.DATE:
+                key = models.EpochDateTime().process_bind_param(key, None)
+            elif kind == cls.RANK and (
+                isinstance(key, bool)
+                or not isinstance(key, int | float)
+                or not math.isfinite(key)
+            ):
+                raise ValueError(f"Invalid rank {key!r}")
+        except (ValueError, TypeError):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor",
+            )
+        return cls(decoded_kind, key, news_id)
+
+    def date_filter(self) -> ColumnElement[bool]:
+        """Rows after this cursor for `origin_created_at DESC, id DESC`.
+
+        SQLite sorts NULLs last on DESC, so undated news come after every
+        dated one.
+        """
+        origin_created_at = models.News.origin_created_at
+        if self.key is None:
+            return and_(origin_created_at.is_(None), models.News.id < self.id)
+        return or_(
+            origin_created_at < self.key,
+            and_(origin_created_at == self.key, models.News.id < self.id),
+            origin_created_at.is_(None),
+        )
+
+    def inserted_filter(self) -> ColumnElement[bool]:
+        """Rows after this cursor for `inserted_at ASC, id ASC`."""
+        inserted_at = models.News.inserted_at
+        return or_(
+            inserted_at > self.key,
+            and_(inserted_at == self.key, models.News.id > self.id),
+        )
+
+    def rank_filter(self, rank: ColumnElement[float]) -> ColumnElement[bool]:
+        """Rows after this cursor for `rank ASC, id ASC`."""
+        return or_(
+            rank > self.key,
+            and_(rank == self.key, models.News.id > self.id),
+        )
+
+
+def date_order() -> list[ColumnElement[Any]]:
+    return [models.News.origin_created_at.desc(), models.News.id.desc()]
+
+
+def inserted_order() -> list[ColumnElement[Any]]:
+    return [models.News.inserted_at, models.News.id]
@@ -1,4 +1,5 @@
 from datetime import datetime
+
 from pydantic import BaseModel, ConfigDict, Field
 
 
@@ -42,3 +43,5 @@ class NewsSearchResponse(NewsBase):
     id: int
     origin_created_at: datetime | None = None
     inserted_at: datetime
+    # Highlighted HTML excerpt, only present on full-text search results
+    snippet: str | None = None
@@ -0,0 +1,76 @@
+import os
+import shutil
+from datetime import UTC, datetime
+
+import jinja2
+from fastapi.templating import Jinja2Templates
+
+from ..constants import NEWS_TIMEZONE
+
+TEMPLATES_DIR = os.path.join(os.path.dirname(__file__), "templates")
+# Generated by `compile_templates` (`npm run deploy` does it), not versioned
+COMPILED_DIR = os.path.join(os.path.dirname(__file__), "templates_compiled")
+
+
+def local_datetime(value: datetime | None) -> str:
+    """News datetime as shown in listings (same format as the page JS)."""
+    if value is None:
+        return "N/A"
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=UTC)
+    return value.astimezone(NEWS_TIMEZONE).strftime("%Y-%m-%d %H:%M:%S")
+
+
+# Listings render query rows (see `main.LATEST_COLUMNS`), not ORM objects.
+# Models are imported when rendering: they need the Workers runtime, and
+# `compile_templates` runs at build time.
+def photo_url(photo_id: str | None) -> str:
+    from ..database_models import News
+
+    return News.build_photo_url(photo_id)
+
+
+def snippet_html(snippet: str | None) -> str | None:
+    from ..database_fts import NewsFTS
+
+    return NewsFTS.snippet_to_html(snippet)
+
+
+def build_environment(loader: jinja2.BaseLoader | None = None) -> jinja2.Environment:
+    """Jinja environment of the webpage templates.
+
+    Precompiled templates are loaded when available, so the first render of
+    each one doesn't have to parse and compile it. Templates never change
+    while the worker runs, so they aren't checked for updates either.
+
+    :param loader: Template loader, defaults to the precompiled templates
+        (if any) and then the sources
+    :type loader: jinja2.BaseLoader | None, optional
+    :return: Environment
+    :rtype: jinja2.Environment
+    """
+    if loader is None:
+        loaders: list[jinja2.BaseLoader] = [jinja2.FileSystemLoader(TEMPLATES_DIR)]
+        if os.path.isdir(COMPILED_DIR):
+            loaders.insert(0, jinja2.ModuleLoader(COMPILED_DIR))
+        loader = jinja2.ChoiceLoader(loaders)
+    environment = jinja2.Environment(
+        loader=loader,
+        autoescape=jinja2.select_autoescape(),
+        auto_reload=False,
+    )
+    environment.filters["local_datetime"] = local_datetime
+    environment.filters["photo_url"] = photo_url
+    environment.filters["snippet_html"] = snippet_html
+    return environment
+
+
+def build_templates() -> Jinja2Templates:
+    return Jinja2Templates(env=build_environment())
+
+
+def compile_templates() -> None:
+    """Compile every template into `COMPILED_DIR`, replacing its content."""
+    shutil.rmtree(COMPILED_DIR, ignore_errors=True)
+    environment = build_environment(jinja2.FileSystemLoader(TEMPLATES_DIR))
+    environment.compile_templates(COMPILED_DIR, zip=None, ignore_errors=False)
@@ -0,0 +1,137 @@
+import asyncio
+from collections.abc import AsyncIterator, Iterator
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from time import monotonic
+from typing import ClassVar
+from urllib.parse import urlparse
+
+from pyodide.http import FetchResponse, pyfetch
+
+
+class FetchConfig:
+    # Seconds a single request (including reading its body) may take
+    TIMEOUT: float = 60
+    # Max concurrent requests per host, shared by every task of the isolate
+    HOST_LIMITS: ClassVar[dict[str, int]] = {
+        "frsn.utn.edu.ar": 4,
+        "api.cloudflare.com": 4,
+    }
+    DEFAULT_HOST_LIMIT: int = 8
+
+    _semaphores: ClassVar[dict[str, asyncio.Semaphore]] = {}
+
+    @classmethod
+    def setup(
+        cls,
+        timeout: float | None = None,
+        host_limits: dict[str, int] | None = None,
+        default_host_limit: int | None = None,
+    ) -> None:
+        """Request timeout and per-host concurrency limits setup
+
+        :param timeout: Seconds per request, defaults to None
+        :type timeout: float | None, optional
+        :param host_limits: Limit by host (without `www.`), defaults to None
+        :type host_limits: dict[str, int] | None, optional
+        :param default_host_limit: Limit of any other host, defaults to None
+        :type default_host_limit: int | None, optional
+        """
+        if timeout:
+            cls.TIMEOUT = timeout
+        if host_limits:
+            cls.HOST_LIMITS = {**cls.HOST_LIMITS, **host_limits}
+        if default_host_limit:
+            cls.DEFAULT_HOST_LIMIT = default_host_limit
+        cls._semaphores = {}
+
+    @classmethod
+    def host_semaphore(cls, url: str) -> asyncio.Semaphore:
+        host = (urlparse(url).hostname or "").removeprefix("www.")
+        if host not in cls._semaphores:
+            cls._semaphores[host] = asyncio.Semaphore(
+                cls.HOST_LIMITS.get(host, cls.DEFAULT_HOST_LIMIT)
+            )
+        return cls._semaphores[host]
+
+
+class DeadlineExceeded(TimeoutError):
+    """The invocation ran out of time budget before the work could finish."""
+
+
+class Deadline:
+    """Time budget of a whole invocation (cron run or queue batch).
+
+    It is stored in a context variable, so tasks spawned while it is active
+    (`asyncio.gather`, `create_task`) share it.
+    """
+
+    _current: ContextVar["Deadline | None"] = ContextVar("deadline", default=None)
+
+    def __init__(self, seconds: float) -> None:
+        self.expires_at = monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(self.expires_at - monotonic(), 0.0)
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    @classmethod
+    def current(cls) -> "Deadline | None":
+        return cls._current.get()
+
+    @classmethod
+    @contextmanager
+    def start(cls, seconds: float) -> Iterator["Deadline"]:
+        deadline = cls(seconds)
+        token = cls._current.set(deadline)
+        try:
+            yield deadline
+        finally:
+            cls._current.reset(token)
+
+
+@asynccontextmanager
+async def fetch(
+    url: str,
+    timeout: float | None = None,
+    **kwargs,
+) -> AsyncIterator[FetchResponse]:
+    """`pyfetch` with a timeout, holding a slot of the host limit until the
+    body is read.
+
+    Usage::
+
+        async with fetch(url) as response:
+            content = await response.bytes()
+
+    The timeout covers the request and the block, and is cut short by the
+    current `Deadline`. When it's reached the underlying JS fetch is aborted.
+
+    :param url: URL to fetch
+    :type url: str
+    :param timeout: Seconds, defaults to `FetchConfig.TIMEOUT`
+    :type timeout: float | None, optional
+    :raises DeadlineExceeded: If the invocation deadline is (or gets) reached
+    :raises TimeoutError: If the request timeout is reached
+    :return: Response, its body must be consumed inside the block
+    :rtype: AsyncIterator[FetchResponse]
+    """
+    from js import AbortController
+
+    deadline = Deadline.current()
+    if deadline and deadline.expired:
+        raise DeadlineExceeded(f"No time left to fetch {url}")
+    controller = AbortController.new()
+    try:
+        async with asyncio.timeout(deadline.remaining() if deadline else None):
+            async with FetchConfig.host_semaphore(url):
+                async with asyncio.timeout(timeout or FetchConfig.TIMEOUT):
+                    yield await pyfetch(url, signal=controller.signal, **kwargs)
+    except (TimeoutError, asyncio.CancelledError) as e:
+        controller.abort()
+        if isinstance(e, TimeoutError) and deadline and deadline.expired:
+            raise DeadlineExceeded(f"Deadline reached fetching {url}") from e
+        raise
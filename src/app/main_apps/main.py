@@ -1,102 +1,387 @@
+import asyncio
 from datetime import datetime
 
-from sqlalchemy.orm import Session
 from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
 
-from ..database_models import News
 from ..cloudflare_images import CloudflareImages
-from .messenger.telegram import Telegram
-from .scraper.feed import HistoricFeed
-from .scraper.news import NewsReader
+from ..database_models import CompletedJob, News, PhotoRef, SeenUrl
+from ..fastapi_app.page_store import PageStore
+from ..fetcher import Deadline, DeadlineExceeded
+from .messenger.delivery import PHOTO, NewsPost, plan_delivery
+from .messenger.delivery_log import DeliveryLog
 from .messenger.message_formatter import (
     build_message,
     build_message_header,
 )
+from .messenger.telegram import Telegram
+from .scraper.feed import HistoricFeed
+from .scraper.news import NewsReader
+from .scraper.photos import PhotoUploader
+
+# News inserted per commit by the batch scraper
+INSERT_CHUNK_SIZE = 25
+# Candidate URLs above which index_scraper reads the whole seen URLs index
+SEEN_URLS_FULL_READ_THRESHOLD = 300
+# `completed_job` name of `photo_ref_backfill`
+PHOTO_REF_BACKFILL_JOB = "photo_ref_backfill"
 
 
 async def index_scraper(session: Session):
-    # Get latest URL from DB
-    latest_url = session.execute(
-        select(News.url).order_by(News.origin_created_at.desc()).limit(1)
-    ).scalar_one_or_none()
+    latest_url = latest_news_url(session)
 
     # Get news URLs from historic feed
     historic_feed = HistoricFeed()
     news_urls = await historic_feed.get_urls(latest_url=latest_url)
 
-    # Check existing URLs in DB
-    existing_urls: list[str] = []
-    for batch in range(0, len(news_urls), 100):
-        batch_urls = news_urls[batch : batch + 100]
-        existing_urls.extend(
-            session.execute(
-                select(News.url).where(News.url.in_([u[0] for u in batch_urls]))
+    # Check existing URLs against the seen URLs index
+    url_hashes = [SeenUrl.hash_url(u[0]) for u in news_urls]
+    seen_hashes: set[int] = set()
+    if len(url_hashes) > SEEN_URLS_FULL_READ_THRESHOLD:
+        # Cheaper to read the whole index once than many IN (...) queries
+        seen_hashes.update(session.execute(select(SeenUrl.url_hash)).scalars())
+    else:
+        for batch in range(0, len(url_hashes), 100):
+            seen_hashes.update(
+                session.execute(
+                    select(SeenUrl.url_hash).where(
+                        SeenUrl.url_hash.in_(url_hashes[batch : batch + 100])
+                    )
+                ).scalars()
             )
-            .scalars()
-            .all()
-        )
 
     # Filter out existing URLs
-    return [u for u in news_urls if u[0] not in existing_urls]
+    return [
+        u for u, url_hash in zip(news_urls, url_hashes) if url_hash not in seen_hashes
+    ]
 
 
-async def main_scraper(
+def latest_news_url(session: Session) -> str | None:
+    """URL of the most recent news in DB, by origin date."""
+    return session.execute(
+        select(News.url).order_by(News.origin_created_at.desc()).limit(1)
+    ).scalar_one_or_none()
+
+
+def backfill_photo_refs(
     session: Session,
+    news_urls: list[tuple[str, str | None]],
+) -> None:
+    """Map the origin photo URLs of stored news to their photo IDs.
+
+    `news` doesn't keep origin photo URLs, so they come from the feed.
+
+    :param session: Database session
+    :type session: Session
+    :param news_urls: News URL and origin photo URL of stored news
+    :type news_urls: list[tuple[str, str | None]]
+    """
+    photo_urls = {news_url: photo_url for news_url, photo_url in news_urls if photo_url}
+    news_with_photo = sorted(photo_urls)
+    photo_ids: dict[int, str] = {}
+    for i in range(0, len(news_with_photo), 100):
+        rows = session.execute(
+            select(News.url, News.photo_id).where(
+                News.url.in_(news_with_photo[i : i + 100]),
+                News.photo_id.is_not(None),
+            )
+        )
+        for news_url, photo_id in rows:
+            photo_ids.setdefault(PhotoRef.url_key(photo_urls[news_url]), photo_id)
+    if not photo_ids:
+        return
+    PhotoRef.insert_refs(session, photo_ids)
+    session.commit()
+
+
+async def photo_ref_backfill(session: Session) -> None:
+    """One-shot job mapping the photos of the news stored before `photo_ref`.
+
+    Crawls the whole feed until it completes once. Only `completed_job`
+    decides whether it runs: references of new news are added by the
+    scraper meanwhile, so `photo_ref` having rows says nothing about the
+    older ones. Completion is recorded after the references are saved, even
+    if no photo was matched. If the crawl fails or runs out of time, the job
+    runs again next time.
+
+    :param session: Database session
+    :type session: Session
+    """
+    if session.get(CompletedJob, PHOTO_REF_BACKFILL_JOB) is not None:
+        return
+    news_urls = await HistoricFeed().get_urls()
+    backfill_photo_refs(session, news_urls)
+    session.add(CompletedJob(name=PHOTO_REF_BACKFILL_JOB))
+    session.commit()
+
+
+async def scrape_news(
     news_url: str,
     photo_url: str,
     indexed_at: datetime,
-):
+    photo_uploader: PhotoUploader | None = None,
+) -> News:
+    """Scrape a news item and upload its photo, without saving it.
+
+    :param news_url: News URL
+    :type news_url: str
+    :param photo_url: Origin photo URL
+    :type photo_url: str
+    :param indexed_at: Moment when the Index Scraper found this news
+    :type indexed_at: datetime
+    :param photo_uploader: Uploader reusing known photos, defaults to None
+    :type photo_uploader: PhotoUploader | None, optional
+    :return: News entry ready to be inserted
+    :rtype: News
+    """
     news_reader = NewsReader()
     news_data = await news_reader.read_news(news_url)
 
-    image_id = None
-    image_data = await news_reader.fetch_image(photo_url)
-    if image_data:
-        news_origin_id = news_url.rsplit("=", 1)[-1]
-        image_origin_filename = photo_url.rsplit("/", 1)[-1]
-        image_filename = f"utn-frsn-news-photo-{news_origin_id}-{image_origin_filename}"
-        cloudflare_images = CloudflareImages()
-        image_id = await cloudflare_images.upload(
-            image_filename,
-            image_data,
-        )
+    photo_uploader = photo_uploader or PhotoUploader()
+    image_id = await photo_uploader.upload(news_reader, news_url, photo_url)
 
-    # Insert news into DB
-    news_entry = News(
+    return News(
         url=news_data["url"],
         title=news_data["title"],
         content=news_data["content"],
+        summary=News.build_summary(news_data["content"]),
         photo_id=image_id,
         response_elapsed_seconds=news_data["response_elapsed_seconds"],
         parse_elapsed_seconds=news_data["parse_elapsed_seconds"],
         origin_created_at=news_data["origin_created_at"],
         indexed_at=indexed_at,
     )
+
+
+async def main_scraper(
+    session: Session,
+    news_url: str,
+    photo_url: str,
+    indexed_at: datetime,
+):
+    photo_uploader = PhotoUploader(session)
+    news_entry = await scrape_news(news_url, photo_url, indexed_at, photo_uploader)
+    photo_uploader.save()
+
+    # Insert news into DB
     session.add(news_entry)
+    SeenUrl.insert_urls(session, [news_entry.url])
     session.commit()
     session.refresh(news_entry)
+    PageStore(session).drop_listings()
 
     return news_entry.id
 
 
+def insert_news_batch(
+    session: Session,
+    news_entries: list[News],
+) -> list[int | Exception]:
+    """Insert news entries with one commit per chunk.
+
+    If a chunk fails (e.g. a duplicated URL), its entries are retried one
+    by one so a single bad row doesn't drop the rest.
+
+    :param session: Database session
+    :type session: Session
+    :param news_entries: News entries to insert
+    :type news_entries: list[News]
+    :return: News ID or insertion error of each entry, in the same order
+    :rtype: list[int | Exception]
+    """
+    results: list[int | Exception] = []
+    for i in range(0, len(news_entries), INSERT_CHUNK_SIZE):
+        chunk = news_entries[i : i + INSERT_CHUNK_SIZE]
+        try:
+            session.add_all(chunk)
+            session.flush()
+            SeenUrl.insert_urls(session, [news_entry.url for news_entry in chunk])
+            # Read IDs before commit expires them (avoids a SELECT per row)
+            ids = [news_entry.id for news_entry in chunk]
+            session.commit()
+            results.extend(ids)
+            continue
+        except SQLAlchemyError:
+            session.rollback()
+        for news_entry in chunk:
+            try:
+                session.add(news_entry)
+                session.flush()
+                SeenUrl.insert_urls(session, [news_entry.url])
+                news_id = news_entry.id
+                session.commit()
+                results.append(news_id)
+            except SQLAlchemyError as e:
+                session.rollback()
+                results.append(e)
+    return results
+
+
+async def main_scraper_batch(
+    session: Session,
+    tasks: list[tuple[str, str, datetime]],
+    max_in_flight: int = 1,
+) -> list[int | BaseException]:
+    """Scrape several news and insert them in chunked commits.
+
+    Up to `max_in_flight` news are scraped at the same time, so the network
+    waits of one (page, image download, image upload) overlap with the
+    others. Requests are also bounded per host by `FetchConfig`. Results
+    and inserted IDs keep the order of `tasks`.
+
+    Scrapes still running when the current `Deadline` is reached are
+    cancelled and reported as `DeadlineExceeded`. Pre-rendered listing
+    pages are dropped once for all the inserted news
+    (`PageStore.drop_listings`).
+
+    :param session: Database session
+    :type session: Session
+    :param tasks: News URL, photo URL and indexed datetime of each news
+    :type tasks: list[tuple[str, str, datetime]]
+    :param max_in_flight: News scraped concurrently, defaults to 1
+    :type max_in_flight: int, optional
+    :return: News ID or error of each task, in the same order
+    :rtype: list[int | BaseException]
+    """
+    semaphore = asyncio.Semaphore(max(max_in_flight, 1))
+    photo_uploader = PhotoUploader(session)
+    photo_uploader.preload([task[1] for task in tasks])
+
+    async def scrape(task: tuple[str, str, datetime]) -> News:
+        async with semaphore:
+            return await scrape_news(*task, photo_uploader=photo_uploader)
+
+    scrape_tasks = [asyncio.create_task(scrape(task)) for task in tasks]
+    scraped: list[News | BaseException] = []
+    if scrape_tasks:
+        deadline = Deadline.current()
+        _, pending = await asyncio.wait(
+            scrape_tasks,
+            timeout=deadline.remaining() if deadline else None,
+        )
+        # Out of budget: cancel what is still running
+        for scrape_task in pending:
+            scrape_task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        for scrape_task in scrape_tasks:
+            if scrape_task.cancelled():
+                scraped.append(DeadlineExceeded("Cancelled at the deadline"))
+            else:
+                scraped.append(scrape_task.exception() or scrape_task.result())
+    photo_uploader.save()
+
+    news_entries = [r for r in scraped if isinstance(r, News)]
+    insert_results = insert_news_batch(session, news_entries)
+    news_ids = [r for r in insert_results if isinstance(r, int)]
+    if news_ids:
+        PageStore(session).drop_listings()
+    inserted = iter(insert_results)
+    # Map each scraped entry back to its insertion result
+    return [next(inserted) if isinstance(r, News) else r for r in scraped]
+
+
+def prepare_posts(session: Session, news_ids: list[int]) -> dict[int, NewsPost]:
+    """Load several news with one query per 100 IDs and plan their posts.
+
+    :param session: Database session
+    :type session: Session
+    :param news_ids: News IDs
+    :type news_ids: list[int]
+    :return: Post of each news found
+    :rtype: dict[int, NewsPost]
+    """
+    unique_ids = sorted(set(news_ids))
+    posts: dict[int, NewsPost] = {}
+    for i in range(0, len(unique_ids), 100):
+        news_entries = session.execute(
+            select(News).where(News.id.in_(unique_ids[i : i + 100]))
+        ).scalars()
+        for news_entry in news_entries:
+            photo_url = None
+            if news_entry.photo_id:
+                photo_url = CloudflareImages.get_public_url(news_entry.photo_id)
+            posts[news_entry.id] = NewsPost(
+                news_entry.id,
+                photo_url,
+                plan_delivery(
+                    build_message(news_entry),
+                    build_message_header(news_entry),
+                    photo_url,
+                ),
+            )
+    return posts
+
+
+async def deliver_post(
+    telegram: Telegram,
+    post: NewsPost,
+    delivery_log: DeliveryLog,
+) -> None:
+    # Parts delivered by a previous (failed) attempt are skipped
+    for part_index, part in enumerate(post.parts):
+        if part.method == PHOTO:
+            r = await telegram.send_photo(
+                post.news_id,
+                post.photo_url,
+                part.text,
+                delivery_log=delivery_log,
+                part_index=part_index,
+            )
+            if r is False:
+                raise ValueError("Failed to send photo via Telegram")
+        else:
+            r = await telegram.send_message(
+                post.news_id,
+                part.text,
+                delivery_log=delivery_log,
+                part_index=part_index,
+            )
+            if r is False:
+                raise ValueError("Failed to send message via Telegram")
+
+
+async def messenger_batch(
+    session: Session,
+    news_ids: list[int],
+) -> list[Exception | None]:
+    """Send several news to Telegram, in order.
+
+    Every post is loaded and planned up front, together with its delivery
+    log, so sending doesn't wait on the database. News not sent before the
+    current `Deadline` is reached get a `DeadlineExceeded`.
+
+    :param session: Database session
+    :type session: Session
+    :param news_ids: News IDs, in sending order
+    :type news_ids: list[int]
+    :return: None if sent, or the error of each news, in the same order
+    :rtype: list[Exception | None]
+    """
+    posts = prepare_posts(session, news_ids)
+    delivery_logs = DeliveryLog.load(session, list(posts))
+    telegram = Telegram()
+    deadline = Deadline.current()
+    results: list[Exception | None] = []
+    for news_id in news_ids:
+        if news_id not in posts:
+            results.append(ValueError(f"News with ID {news_id} not found"))
+            continue
+        if deadline and deadline.expired:
+            results.append(DeadlineExceeded("No time left"))
+            continue
+        try:
+            await deliver_post(telegram, posts[news_id], delivery_logs[news_id])
+            results.append(None)
+        except Exception as e:  # noqa: BLE001
+            results.append(e)
+    return results
+
+
 async def messenger(
     session: Session,
     news_id: int,
 ):
-    news_entry = session.get(News, news_id)
-    if not news_entry:
-        raise ValueError(f"News with ID {news_id} not found")
-    photo_url = None
-    if news_entry.photo_id:
-        photo_url = CloudflareImages.get_public_url(news_entry.photo_id)
-
-    message = build_message(news_entry)
-    message_header = build_message_header(news_entry)
-    telegram = Telegram()
-    if photo_url:
-        r = await telegram.send_photo(news_id, photo_url, message_header)
-        if r is False:
-            raise ValueError("Failed to send photo via Telegram")
-    r = await telegram.send_message(news_id, message)
-    if r is False:
-        raise ValueError("Failed to send message via Telegram")
+    (result,) = await messenger_batch(session, [news_id])
+    if result is not None:
+        raise result
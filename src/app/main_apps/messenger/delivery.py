@@ -0,0 +1,230 @@
+import re
+from bisect import bisect_left, bisect_right
+from functools import cached_property
+from typing import NamedTuple
+
+# Telegram limits, in UTF-16 code units after parsing the HTML. Measuring the
+# raw HTML is an upper bound of that.
+CAPTION_LIMIT = 1024
+MESSAGE_LIMIT = 4096
+
+# Preferred places to split a long message, best first
+SEPARATORS = ("\n\n", "\n", " ")
+
+# HTML tags and entities (`build_message` escapes without the `;`)
+HTML_TOKEN = re.compile(r"<(/?)[a-zA-Z][^>]*>|&#?\w+;?")
+# Characters outside the BMP, two UTF-16 code units each
+ASTRAL = re.compile("[\U00010000-\U0010ffff]")
+
+
+class DeliveryPart(NamedTuple):
+    # PHOTO (sendPhoto, `text` is the caption) or MESSAGE (sendMessage)
+    method: str
+    text: str
+
+
+PHOTO = "photo"
+MESSAGE = "message"
+
+
+class NewsPost(NamedTuple):
+    # A news post ready to send, built before any Telegram call
+    news_id: int
+    photo_url: str | None
+    parts: list[DeliveryPart]
+
+
+class MessageLayout:
+    """Lengths and safe cut points of a message, computed once to split it
+    for several limits.
+
+    A cut is unsafe inside a tag or entity, and between an opening tag and
+    its closing one (Telegram needs every part to be valid HTML). Unsafe
+    positions are kept as merged ranges and UTF-16 lengths come from the
+    positions of astral characters, so nothing is computed per character.
+    Both are only computed if the message has to be split.
+    """
+
+    def __init__(self, text: str) -> None:
+        self.text = text
+        self.length = len(text.encode("utf-16-le")) // 2
+
+    @cached_property
+    def astral(self) -> list[int]:
+        """Positions of the characters taking two UTF-16 code units."""
+        if self.length == len(self.text):
+            return []
+        return [match.start() for match in ASTRAL.finditer(self.text)]
+
+    @cached_property
+    def unsafe_ranges(self) -> tuple[list[int], list[int]]:
+        """Starts and ends of the merged `[start, end)` unsafe ranges."""
+        ranges: list[tuple[int, int]] = []
+        open_tags: list[int] = []
+        for match in HTML_TOKEN.finditer(self.text):
+            start, end = match.span()
+            ranges.append((start + 1, end))
+            if not match.group(0).startswith("<"):
+                continue
+            if match.group(1):
+                if open_tags:
+                    ranges.append((open_tags.pop() + 1, end))
+            else:
+                open_tags.append(start)
+        starts: list[int] = []
+        ends: list[int] = []
+        for start, end in sorted(ranges):
+            if start >= end:
+                continue
+            if ends and start <= ends[-1]:
+                ends[-1] = max(ends[-1], end)
+            else:
+                starts.append(start)
+                ends.append(end)
+        return starts, ends
+
+    def offset(self, position: int) -> int:
+        """UTF-16 length of `text[:position]`."""
+        return position + bisect_left(self.astral, position)
+
+    def furthest_end(self, start: int, limit: int) -> int:
+        """Furthest end keeping `text[start:end]` within `limit`."""
+        if not self.astral:
+            return min(start + limit, len(self.text))
+        target = self.offset(start) + limit
+        return bisect_right(range(len(self.text) + 1), target, key=self.offset) - 1
+
+    def unsafe_start(self, position: int) -> int | None:
+        """Start of the unsafe range holding `position`, None if it's safe."""
+        starts, ends = self.unsafe_ranges
+        index = bisect_right(starts, position) - 1
+        if index >= 0 and position < ends[index]:
+            return starts[index]
+        return None
+
+    def split(
+        self,
+        limit: int = MESSAGE_LIMIT,
+        first_limit: int | None = None,
+    ) -> list[str]:
+        """Split the message in as few parts as possible.
+
+        Among the splits with the minimum number of parts, the one cutting
+        on paragraphs is preferred, then on lines, then on spaces. Tags and
+        entities are never cut.
+
+        :param limit: Max length of each part, defaults to MESSAGE_LIMIT
+        :type limit: int, optional
+        :param first_limit: Max length of the first part (e.g. a caption),
+            defaults to `limit`
+        :type first_limit: int | None, optional
+        :return: Parts, none of them empty
+        :rtype: list[str]
+        """
+        first_limit = first_limit or limit
+        if self.length <= first_limit:
+            return [self.text] if self.text.strip() else []
+        # Cutting anywhere gives the fewest parts
+        fewest = self._split_greedy(limit, first_limit, ())
+        for level in range(len(SEPARATORS)):
+            split = self._split_greedy(limit, first_limit, SEPARATORS[level:])
+            if len(split) == len(fewest):
+                return split
+        return fewest
+
+    def _split_greedy(
+        self,
+        limit: int,
+        first_limit: int,
+        separators: tuple[str, ...],
+    ) -> list[str]:
+        text = self.text
+        parts: list[str] = []
+        start = 0
+        part_limit = first_limit
+        while start < len(text):
+            end = self.furthest_end(start, part_limit)
+            if end >= len(text):
+                cut, next_start = len(text), len(text)
+            else:
+                cut = next_start = None
+                for separator in separators:
+                    position = text.rfind(separator, start + 1, end)
+                    while position != -1:
+                        unsafe_start = self.unsafe_start(position)
+                        if unsafe_start is None:
+                            break
+                        # Last separator ending before the unsafe range
+                        position = text.rfind(
+                            separator, start + 1, unsafe_start - 1 + len(separator)
+                        )
+                    if position != -1:
+                        cut, next_start = position, position + len(separator)
+                        break
+                if cut is None:
+                    unsafe_start = self.unsafe_start(end)
+                    cut = end if unsafe_start is None else unsafe_start - 1
+                    if cut <= start:
+                        cut = end  # A single tag longer than the limit
+                    next_start = cut
+            part = text[start:cut].strip()
+            if part:
+                parts.append(part)
+                part_limit = limit
+            start = next_start
+        return parts
+
+
+def split_html(
+    text: str,
+    limit: int = MESSAGE_LIMIT,
+    first_limit: int | None = None,
+) -> list[str]:
+    """Split a Telegram HTML message in as few parts as possible
+    (`MessageLayout.split`).
+
+    :param text: HTML message
+    :type text: str
+    :param limit: Max length of each part, defaults to MESSAGE_LIMIT
+    :type limit: int, optional
+    :param first_limit: Max length of the first part (e.g. a caption),
+        defaults to `limit`
+    :type first_limit: int | None, optional
+    :return: Parts, none of them empty
+    :rtype: list[str]
+    """
+    return MessageLayout(text).split(limit, first_limit)
+
+
+def plan_delivery(
+    message: str,
+    header: str,
+    photo_url: str | None,
+) -> list[DeliveryPart]:
+    """Telegram calls that deliver a news post, as few as possible.
+
+    With a photo the whole post goes in its caption when it fits. Otherwise
+    either the caption holds the start of the post and the rest follows in
+    messages, or the caption holds the header and the post follows in
+    messages (preferred when both take the same number of calls).
+
+    :param message: Full post (`build_message`)
+    :type message: str
+    :param header: Post header (`build_message_header`)
+    :type header: str
+    :param photo_url: Public photo URL, if the news has one
+    :type photo_url: str | None
+    :return: Parts to send, in order
+    :rtype: list[DeliveryPart]
+    """
+    layout = MessageLayout(message)
+    if not photo_url:
+        return [DeliveryPart(MESSAGE, part) for part in layout.split()]
+    if layout.length <= CAPTION_LIMIT:
+        return [DeliveryPart(PHOTO, message)]
+    captioned = layout.split(first_limit=CAPTION_LIMIT)
+    separate = [header, *layout.split()]
+    parts = captioned if len(captioned) < len(separate) else separate
+    return [DeliveryPart(PHOTO, parts[0])] + [
+        DeliveryPart(MESSAGE, part) for part in parts[1:]
+    ]
@@ -0,0 +1,92 @@
+from sqlalchemy import insert, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from ...database_models import TelegramDelivery
+from ...logger import LogWrapper
+
+
+class DeliveryLog(LogWrapper):
+    """Parts of a news post already delivered to each chat.
+
+    Every delivered part is committed right away, so a retry after a
+    failure only sends the missing ones.
+    """
+
+    def __init__(
+        self,
+        session: Session,
+        news_id: int,
+        delivered: dict[tuple[str, int], int | None] | None = None,
+    ) -> None:
+        super().__init__()
+        self.session = session
+        self.news_id = news_id
+        if delivered is None:
+            delivered = self.load(session, [news_id])[news_id].delivered
+        self.delivered = delivered
+
+    @classmethod
+    def load(cls, session: Session, news_ids: list[int]) -> dict[int, "DeliveryLog"]:
+        """Delivery logs of several news, read with one query per 100 news.
+
+        :param session: Database session
+        :type session: Session
+        :param news_ids: News IDs
+        :type news_ids: list[int]
+        :return: Delivery log of each news ID
+        :rtype: dict[int, DeliveryLog]
+        """
+        delivered: dict[int, dict[tuple[str, int], int | None]] = {
+            news_id: {} for news_id in news_ids
+        }
+        unique_ids = sorted(delivered)
+        for i in range(0, len(unique_ids), 100):
+            rows = session.execute(
+                select(
+                    TelegramDelivery.news_id,
+                    TelegramDelivery.chat_id,
+                    TelegramDelivery.part_index,
+                    TelegramDelivery.message_id,
+                ).where(TelegramDelivery.news_id.in_(unique_ids[i : i + 100]))
+            )
+            for news_id, chat_id, part_index, message_id in rows:
+                delivered[news_id][(chat_id, part_index)] = message_id
+        return {
+            news_id: cls(session, news_id, parts)
+            for news_id, parts in delivered.items()
+        }
+
+    def is_delivered(self, chat_id: str, part_index: int) -> bool:
+        return (chat_id, part_index) in self.delivered
+
+    def record(self, chat_id: str, part_index: int, message_id: int | None) -> None:
+        """Store a delivered part.
+
+        :param chat_id: Chat ID
+        :type chat_id: str
+        :param part_index: Index of the part in the delivery plan
+        :type part_index: int
+        :param message_id: Telegram message ID
+        :type message_id: int | None
+        """
+        self.delivered[(chat_id, part_index)] = message_id
+        try:
+            self.session.execute(
+                insert(TelegramDelivery).prefix_with("OR IGNORE"),
+                [
+                    {
+                        "news_id": self.news_id,
+                        "chat_id": chat_id,
+                        "part_index": part_index,
+                        "message_id": message_id,
+                    }
+                ],
+            )
+            self.session.commit()
+        except SQLAlchemyError as e:
+            # The part is sent, failing here would only make the retry resend it
+            self.session.rollback()
+            self.logger.warning(
+                f"[{self.news_id}] Couldn't record delivered part {part_index}: {e}"
+            )
@@ -1,11 +1,9 @@
-from datetime import timedelta
-
+from ...constants import NEWS_TIMEZONE
 from ...database_models import News
 
 
 def get_date_msg(news: News) -> str:
-    date = news.origin_created_at or news.inserted_at
-    date -= timedelta(hours=3)  # UTC-03
+    date = (news.origin_created_at or news.inserted_at).astimezone(NEWS_TIMEZONE)
     date_msg = f"<code>{date.replace(microsecond=0)}</code>"
     if not news.origin_created_at:
         date_msg = date_msg.replace("<code>", "<code>(scrap) ", 1)
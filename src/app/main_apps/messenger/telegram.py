@@ -1,15 +1,19 @@
 import asyncio
-from pyodide.http import pyfetch
-from typing import Generator
 import json
+from collections.abc import Generator
+from time import monotonic
+from typing import Any, ClassVar
 
-from ...logger import LogWrapper
 from ...constants import TELEGRAM_CHANNEL_DEBUG
+from ...fetcher import Deadline, DeadlineExceeded, fetch
+from ...logger import LogWrapper
+from ...rate_limit import TokenBucket
+from .delivery import MESSAGE_LIMIT, split_html
+from .delivery_log import DeliveryLog
 
 
-def chunk_message(sequence: str) -> Generator[str, None, None]:
-    for i in range(0, len(sequence), 4096):
-        yield sequence[i : i + 4096]
+def chunk_message(sequence: str) -> Generator[str]:
+    yield from split_html(sequence, MESSAGE_LIMIT)
 
 
 class Telegram(LogWrapper):
@@ -20,6 +24,24 @@ class Telegram(LogWrapper):
     DEFAULT_RETRY_SLEEP: int = 5  # seconds
     MAXIMUM_RETRIES: int = 5
     SILENT_MODE: bool = False
+    # Requests per second and bursts, within Telegram limits: 20 messages
+    # per minute in the same group/channel and 30 per second overall. Any
+    # minute allows a burst plus a minute of refill, so both add up to 20;
+    # the burst covers the parts of a post
+    CHAT_RATE: float = 15 / 60
+    CHAT_BURST: float = 5
+    GLOBAL_RATE: float = 29
+    GLOBAL_BURST: float = 29
+
+    # Shared by every instance of the isolate
+    _chat_limiters: ClassVar[dict[str, TokenBucket]] = {}
+    _global_limiter: TokenBucket | None = None
+    _stats: ClassVar[dict[str, Any]] = {
+        "requests": 0,
+        "throttled": 0,
+        "waited": 0.0,
+        "started_at": None,
+    }
 
     @classmethod
     def setup_config(
@@ -43,19 +65,96 @@ class Telegram(LogWrapper):
         if silent_mode:
             cls.SILENT_MODE = silent_mode
 
+    @classmethod
+    def chat_limiter(cls, chat_id: str) -> TokenBucket:
+        if chat_id not in cls._chat_limiters:
+            cls._chat_limiters[chat_id] = TokenBucket(cls.CHAT_RATE, cls.CHAT_BURST)
+        return cls._chat_limiters[chat_id]
+
+    @classmethod
+    def global_limiter(cls) -> TokenBucket:
+        if cls._global_limiter is None:
+            cls._global_limiter = TokenBucket(cls.GLOBAL_RATE, cls.GLOBAL_BURST)
+        return cls._global_limiter
+
+    async def wait_turn(self, chat_id: str) -> None:
+        """Wait until a request to `chat_id` stays within the rate limits.
+
+        :param chat_id: Chat ID
+        :type chat_id: str
+        :raises DeadlineExceeded: If the wait would outlive the deadline
+        """
+        start = monotonic()
+        deadline = Deadline.current()
+        try:
+            async with asyncio.timeout(deadline.remaining() if deadline else None):
+                await self.chat_limiter(chat_id).acquire()
+                await self.global_limiter().acquire()
+        except TimeoutError as e:
+            raise DeadlineExceeded("No time left to send to Telegram") from e
+        self._stats["waited"] += monotonic() - start
+        if self._stats["started_at"] is None:
+            self._stats["started_at"] = start
+        self._stats["requests"] += 1
+
+    def throttled(self, chat_id: str, seconds: float) -> None:
+        """Hold every sender after a 429, for `seconds`.
+
+        The chat and the global limiter are both paused, Telegram doesn't
+        say which limit was hit.
+        """
+        self._stats["throttled"] += 1
+        self.chat_limiter(chat_id).pause(seconds)
+        self.global_limiter().pause(seconds)
+
+    @classmethod
+    def log_throughput(cls) -> None:
+        """Log the requests sent since the last report, and reset the counts."""
+        stats = cls._stats
+        if stats["started_at"] is not None:
+            elapsed = max(monotonic() - stats["started_at"], 1e-3)
+            cls().logger.info(
+                f"Telegram: {stats['requests']} requests in {elapsed:.1f}s "
+                f"({stats['requests'] / elapsed * 60:.1f}/min), "
+                f"{stats['waited']:.1f}s waiting for rate limits, "
+                f"{stats['throttled']} throttled (429)"
+            )
+        cls._stats = {"requests": 0, "throttled": 0, "waited": 0.0, "started_at": None}
+
     async def send_message(
         self,
         news_id: int,
         message: str,
         chat_id: str | None = None,
+        delivery_log: DeliveryLog | None = None,
+        part_index: int = 0,
     ) -> bool:
+        """Send a message, in several parts if it's too long.
+
+        :param news_id: News ID (for logging)
+        :type news_id: int
+        :param message: HTML message
+        :type message: str
+        :param chat_id: Chat ID, defaults to `CHAT_ID`
+        :type chat_id: str | None, optional
+        :param delivery_log: Log to skip and record delivered parts,
+            defaults to None
+        :type delivery_log: DeliveryLog | None, optional
+        :param part_index: Index of the (first) part, defaults to 0
+        :type part_index: int, optional
+        :return: Whether every part was delivered
+        :rtype: bool
+        """
         if self.TELEGRAM_API_KEY == "":
             self.logger.error("Telegram API Key is not set up")
             return False
         if chat_id is None:
             chat_id = self.CHAT_ID
         self.logger.info(f"[{news_id}] Sending message")
-        for _message in chunk_message(message):
+        for index, _message in enumerate(chunk_message(message), part_index):
+            if delivery_log and delivery_log.is_delivered(chat_id, index):
+                self.logger.info(f"[{news_id}] Part {index} already delivered")
+                continue
             try_counter = 1
             while True:
                 body = {
@@ -65,16 +164,18 @@ class Telegram(LogWrapper):
                     # NOTE: Useful when sending a lot of messages
                     "disable_notification": self.SILENT_MODE,
                 }
-                response = await pyfetch(
+                await self.wait_turn(chat_id)
+                async with fetch(
                     self.URL_SEND_MESSAGES,
                     method="POST",
                     headers={
                         "Content-Type": "application/json",
                     },
                     body=json.dumps(body),
-                )
-                if response.status != 200 and try_counter > self.MAXIMUM_RETRIES:
+                ) as response:
+                    status = response.status
                     response = await response.json()
+                if status != 200 and try_counter > self.MAXIMUM_RETRIES:
                     self.logger.error(
                         f"Couldn't send message after "
                         f"{try_counter} tries | "
@@ -82,17 +183,16 @@ class Telegram(LogWrapper):
                         f"{response['description']}"
                     )
                     return False
-                if response.status == 429:
+                if status == 429:
                     try_counter += 1
-                    seconds = (await response.json())["parameters"]["retry_after"]
+                    seconds = response["parameters"]["retry_after"]
                     self.logger.warning(
                         f"Too many requests. Retry in {seconds} seconds"
                     )
-                    await asyncio.sleep(seconds)
+                    self.throttled(chat_id, seconds)
                     continue
-                if response.status != 200:
+                if status != 200:
                     try_counter += 1
-                    response = await response.json()
                     self.logger.error(
                         f"Couldn't send message (try in "
                         f"{self.DEFAULT_RETRY_SLEEP}s) | "
@@ -101,6 +201,10 @@ class Telegram(LogWrapper):
                     )
                     await asyncio.sleep(self.DEFAULT_RETRY_SLEEP)
                     continue
+                if delivery_log:
+                    delivery_log.record(
+                        chat_id, index, response["result"]["message_id"]
+                    )
                 break
         self.logger.info(f"[{news_id}] Message sent")
         return True
@@ -111,12 +215,35 @@ class Telegram(LogWrapper):
         photo_url: str,
         caption: str,
         chat_id: str | None = None,
+        delivery_log: DeliveryLog | None = None,
+        part_index: int = 0,
     ) -> bool:
+        """Send a photo with a caption.
+
+        :param news_id: News ID (for logging)
+        :type news_id: int
+        :param photo_url: Public photo URL
+        :type photo_url: str
+        :param caption: HTML caption, cut to 1024 characters
+        :type caption: str
+        :param chat_id: Chat ID, defaults to `CHAT_ID`
+        :type chat_id: str | None, optional
+        :param delivery_log: Log to skip and record the delivered part,
+            defaults to None
+        :type delivery_log: DeliveryLog | None, optional
+        :param part_index: Index of the part, defaults to 0
+        :type part_index: int, optional
+        :return: Whether the photo (or a message instead) was delivered
+        :rtype: bool
+        """
         if self.TELEGRAM_API_KEY == "":
             self.logger.error("Telegram API Key is not set up")
             return False
         if chat_id is None:
             chat_id = self.CHAT_ID
+        if delivery_log and delivery_log.is_delivered(chat_id, part_index):
+            self.logger.info(f"[{news_id}] Photo already delivered")
+            return True
         self.logger.info(f"[{news_id}] Sending photo")
         try_counter = 1
         while True:
@@ -133,16 +260,18 @@ class Telegram(LogWrapper):
                 # NOTE: Useful when sending a lot of messages
                 "disable_notification": self.SILENT_MODE,
             }
-            response = await pyfetch(
+            await self.wait_turn(chat_id)
+            async with fetch(
                 self.URL_SEND_PHOTO,
                 method="POST",
                 headers={
                     "Content-Type": "application/json",
                 },
                 body=json.dumps(body),
-            )
-            if response.status != 200 and try_counter > self.MAXIMUM_RETRIES:
+            ) as response:
+                status = response.status
                 response = await response.json()
+            if status != 200 and try_counter > self.MAXIMUM_RETRIES:
                 self.logger.error(
                     f"Couldn't send message after "
                     f"{try_counter} tries | "
@@ -150,15 +279,14 @@ class Telegram(LogWrapper):
                     f"{response['description']}"
                 )
                 return False
-            if response.status == 429:
+            if status == 429:
                 try_counter += 1
-                seconds = (await response.json())["parameters"]["retry_after"]
+                seconds = response["parameters"]["retry_after"]
                 self.logger.warning(f"Too many requests. Retry in {seconds} seconds")
-                await asyncio.sleep(seconds)
+                self.throttled(chat_id, seconds)
                 continue
-            if response.status != 200:
+            if status != 200:
                 try_counter += 1
-                response = await response.json()
                 if (
                     response["description"]
                     == "Bad Request: wrong file identifier/HTTP URL specified"
@@ -170,7 +298,13 @@ class Telegram(LogWrapper):
                     )
                     message = f'<a href="{photo_url}">FOTO</a> (no se pudo '
                     message += "cargar la foto)\n\n" + caption
-                    return await self.send_message(news_id, message)
+                    return await self.send_message(
+                        news_id,
+                        message,
+                        chat_id,
+                        delivery_log,
+                        part_index,
+                    )
                 self.logger.error(
                     f"Couldn't send message with photo (try in "
                     f"{self.DEFAULT_RETRY_SLEEP}s) | "
@@ -179,6 +313,10 @@ class Telegram(LogWrapper):
                 )
                 await asyncio.sleep(self.DEFAULT_RETRY_SLEEP)
                 continue
+            if delivery_log:
+                delivery_log.record(
+                    chat_id, part_index, response["result"]["message_id"]
+                )
             break
         self.logger.info(f"[{news_id}] Photo sent")
         return True
@@ -1,59 +1,128 @@
 import asyncio
-import os
-import bs4
-from pyodide.http import pyfetch
+from time import monotonic
 
+from ...fetcher import Deadline, DeadlineExceeded, fetch
 from ...logger import LogWrapper
+from ...rate_limit import AdaptiveTokenBucket
+from .news_parser import FeedPageParser
 
 
 class WORDPRESS_SITE:
-    TIMEOUT = int(os.getenv("TIMEOUT") or "60")
     HISTORIC_FEED_URL = "https://www.frsn.utn.edu.ar/?paged=1&page_id=80"
     REGEX_HISTORIC_FEED = r"/\?p=\d+"
     PAGINATION_URL = "https://www.frsn.utn.edu.ar/?paged={}&page_id=80"
 
 
+class CrawlerConfig:
+    # Pages requested at the same time
+    WINDOW: int = 5
+    # Token bucket, in requests per second
+    INITIAL_RATE: float = 2.0
+    MIN_RATE: float = 0.25
+    MAX_RATE: float = 8.0
+    # Responses faster than this (seconds) speed the crawl up
+    TARGET_LATENCY: float = 1.0
+    # Attempts per page on throttling or server errors
+    MAXIMUM_TRIES: int = 4
+    # News after `latest_url` that must be seen before stopping. We assume
+    # the site may post news older than our most recent scraped one.
+    OLDER_NEWS_TO_CHECK: int = 5
+
+
+class PageFetchError(Exception):
+    pass
+
+
 class HistoricFeed(LogWrapper):
-    async def get_data(self, soup: bs4.BeautifulSoup) -> list[tuple[str, str | None]]:
+    def __init__(self, window: int | None = None) -> None:
+        super().__init__()
+        self.window = window or CrawlerConfig.WINDOW
+        self.rate_limiter = AdaptiveTokenBucket(
+            rate=CrawlerConfig.INITIAL_RATE,
+            capacity=1,
+            min_rate=CrawlerConfig.MIN_RATE,
+            max_rate=CrawlerConfig.MAX_RATE,
+            target_latency=CrawlerConfig.TARGET_LATENCY,
+        )
+
+    async def get_data(
+        self,
+        html: str,
+        parser: FeedPageParser | None = None,
+    ) -> list[tuple[str, str | None]]:
         """Parse news list page
 
-        :param soup: News list page
-        :type soup: bs4.BeautifulSoup
+        :param html: News list page
+        :type html: str
+        :param parser: Parser to use, to read the pagination after it,
+            defaults to None
+        :type parser: FeedPageParser | None, optional
         :return: List of tuples with news URL and photo URL
         :rtype: list[tuple[str, str | None]]
         """
         urls: list[tuple[str, str | None]] = []
-        for index, new in enumerate(soup.select("article.post")):
-            new_url = new.find("a")
-            if not new_url:
+        parser = parser or FeedPageParser()
+        for index, (new_url, photo_url) in enumerate(parser.iter_news(html)):
+            if new_url is None:
                 self.logger.error(f"No URL found for news item {index}.")
                 continue
-            new_url = new_url.attrs["href"]
-            photo_url = new.find("img")
-            if photo_url:
-                photo_url = photo_url.attrs["src"]
-            urls.append(
-                (
-                    str(new_url),
-                    str(photo_url) if photo_url else None,
-                )
-            )
+            urls.append((new_url, photo_url))
         return urls
 
+    async def fetch_page(self, page: int) -> str:
+        """Fetch a news list page, paced by the adaptive rate limiter.
+
+        Throttled (429) and failed (5xx) requests slow the crawl down and are
+        tried again.
+
+        :param page: Page number
+        :type page: int
+        :raises PageFetchError: If the page couldn't be fetched
+        :raises DeadlineExceeded: If the invocation deadline is reached
+        :return: News list page
+        :rtype: str
+        """
+        status = None
+        for _ in range(CrawlerConfig.MAXIMUM_TRIES):
+            await self.wait_turn()
+            start = monotonic()
+            try:
+                async with fetch(
+                    WORDPRESS_SITE.PAGINATION_URL.format(page)
+                ) as response:
+                    status = response.status
+                    content = await response.bytes()
+            except DeadlineExceeded:
+                # Out of time, retrying can't help
+                raise
+            except TimeoutError:
+                self.logger.warning(f"Page {page} timed out, slowing down")
+                self.rate_limiter.backoff()
+                continue
+            self.rate_limiter.on_response(status, monotonic() - start)
+            if status == 429 or status >= 500:
+                self.logger.warning(f"Page {page} got HTTP {status}, slowing down")
+                continue
+            return content.decode("utf-8", errors="ignore")
+        raise PageFetchError(f"Couldn't fetch page {page} (last status {status})")
+
+    async def wait_turn(self) -> None:
+        """Wait for the rate limiter, within the invocation deadline.
+
+        :raises DeadlineExceeded: If the wait would outlive the deadline
+        """
+        deadline = Deadline.current()
+        try:
+            async with asyncio.timeout(deadline.remaining() if deadline else None):
+                await self.rate_limiter.acquire()
+        except TimeoutError as e:
+            raise DeadlineExceeded("No time left to fetch the feed") from e
+
     async def fetch_and_get_data(
         self,
         page: int,
     ):
-        response = await pyfetch(
-            WORDPRESS_SITE.PAGINATION_URL.format(page),
-        )
-        # TODO: abort fetch after WORDPRESS_SITE.TIMEOUT is reached
-        content = await response.bytes()
-        soup = bs4.BeautifulSoup(
-            content.decode("utf-8", errors="ignore"),
-            "html.parser",
-        )
-        return await self.get_data(soup)
+        return await self.get_data(await self.fetch_page(page))
 
     async def get_urls(
         self,
@@ -61,43 +130,72 @@ class HistoricFeed(LogWrapper):
     ) -> list[tuple[str, str | None]]:
         """Get all news URLs from the historic feed
 
+        Pages are crawled with a sliding window of `window` concurrent
+        requests, and merged in page order. When `latest_url` is found no
+        further pages are requested, and the crawl stops once
+        `CrawlerConfig.OLDER_NEWS_TO_CHECK` news after it were seen.
+
         :param latest_url: Latest URL to stop at, defaults to None
         :type latest_url: str | None, optional
-        :return: List of tuples with news URL and photo URL
+        :return: List of tuples with news URL and photo URL, oldest first
         :rtype: list[tuple[str, str | None]]
         """
         self.logger.info("Starting to fetch historic feed URLs.")
         urls: list[tuple[str, str | None]] = []
+        seen_urls: set[str] = set()
+        latest_index: int | None = None
 
-        # TODO: abort fetch after WORDPRESS_SITE.TIMEOUT is reached
-        response = await pyfetch(WORDPRESS_SITE.HISTORIC_FEED_URL)
-        content = await response.bytes()
-        soup = bs4.BeautifulSoup(
-            content.decode("utf-8", errors="ignore"),
-            "html.parser",
-        )
-        last_page = int(soup.select("nav > div > a.page-numbers")[-2].text)
-        urls.extend(await self.get_data(soup))
-        if latest_url and latest_url in [u[0] for u in urls[:-5]]:
+        def merge(page_urls: list[tuple[str, str | None]]) -> bool:
+            """Append a page, return whether the crawl can stop."""
+            nonlocal latest_index
+            for url in page_urls:
+                if url[0] in seen_urls:
+                    # Already seen, posts shifted pages while crawling
+                    continue
+                seen_urls.add(url[0])
+                if url[0] == latest_url:
+                    latest_index = len(urls)
+                urls.append(url)
+            return (
+                latest_index is not None
+                and len(urls) - latest_index > CrawlerConfig.OLDER_NEWS_TO_CHECK
+            )
+
+        parser = FeedPageParser()
+        first_page = await self.get_data(await self.fetch_page(1), parser)
+        last_page = parser.last_page
+        if merge(first_page):
             # If we found the latest_url in the first page, return early
-            return reversed(urls)
-        page = 2
-        tasks = []
-        while page <= last_page:
-            tasks.append(asyncio.create_task(self.fetch_and_get_data(page)))
-            await asyncio.sleep(0.5)  # Throttle
-            page += 1
-            if page % 5 == 0:
-                # Process tasks in batches of 5 pages
-                for task in tasks:
-                    # Await each task to get the URLs for that page
-                    urls.extend(await task)
-                tasks = []
-                if latest_url and latest_url in [u[0] for u in urls[:-5]]:
-                    # If we found the latest_url, stop processing further pages
-                    return reversed(urls)
-        # Process any remaining tasks
-        for task in tasks:
-            urls.extend(await task)
-
-        return reversed(urls)
+            return urls[::-1]
+
+        next_page = 2
+        # Last page to request, lowered once latest_url shows up
+        stop_page = last_page
+        next_merge = 2
+        fetched: dict[int, list[tuple[str, str | None]]] = {}
+        in_flight: dict[asyncio.Task, int] = {}
+        try:
+            while next_merge <= stop_page:
+                while next_page <= stop_page and len(in_flight) < self.window:
+                    task = asyncio.create_task(self.fetch_and_get_data(next_page))
+                    in_flight[task] = next_page
+                    next_page += 1
+                done, _ = await asyncio.wait(
+                    in_flight,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                for task in done:
+                    page = in_flight.pop(task)
+                    fetched[page] = task.result()
+                    if latest_url and any(u[0] == latest_url for u in fetched[page]):
+                        # One more page covers the older news to check
+                        stop_page = min(stop_page, page + 1)
+                while next_merge in fetched:
+                    if merge(fetched.pop(next_merge)):
+                        return urls[::-1]
+                    next_merge += 1
+        finally:
+            for task in in_flight:
+                task.cancel()
+
+        return urls[::-1]
@@ -1,40 +1,73 @@
-import os
-import bs4
-from pyodide.http import pyfetch
 from datetime import datetime
 from time import time
 
+from ...fetcher import fetch
 from ...logger import LogWrapper
+from .news_parser import NewsPageParser
 
 
-TIMEOUT = int(os.getenv("TIMEOUT") or "60")
+class NewsReader(LogWrapper):
+    # News page extractor: "bs4" (full BeautifulSoup tree) or "stream"
+    # (NewsPageParser, same output without building the tree)
+    PARSER: str = "bs4"
+    PARSERS = ("bs4", "stream")
 
+    @classmethod
+    def setup_config(cls, parser: str = "") -> None:
+        if parser in cls.PARSERS:
+            cls.PARSER = parser
+
+    @staticmethod
+    def extract_bs4(html: str) -> tuple[str | None, str | None, dict | None]:
+        import bs4  # Only loaded by the workers using this parser
+
+        soup = bs4.BeautifulSoup(html, "html.parser")
+        title = soup.find("h1")
+        body = soup.select_one("div.entry-content")
+        entry_date = soup.select_one("time.entry-date")
+        return (
+            title.text if title else None,
+            body.text if body else None,
+            entry_date.attrs if entry_date else None,
+        )
+
+    @staticmethod
+    def extract_stream(html: str) -> tuple[str | None, str | None, dict | None]:
+        return NewsPageParser().extract(html)
+
+    def parse_news(self, html: str) -> tuple[str, str, datetime | None]:
+        """Extract title, content and origin creation date of a news page.
+
+        :param html: News page
+        :type html: str
+        :return: Title, content and origin creation datetime
+        :rtype: tuple[str, str, datetime | None]
+        """
+        if self.PARSER == "stream":
+            title, body, entry_date = self.extract_stream(html)
+        else:
+            title, body, entry_date = self.extract_bs4(html)
+        return (
+            title.strip() if title is not None else "",
+            body.replace("\n", "\n\n").strip() if body is not None else "",
+            datetime.fromisoformat(str(entry_date["datetime"]))
+            if entry_date is not None
+            else None,
+        )
 
-class NewsReader(LogWrapper):
     async def read_news(self, url: str):
         # self.logger.debug(f"Getting: {url}")
         fetch_time = time()
-        # TODO: abort fetch after TIMEOUT is reached
-        response = await pyfetch(url)
-        content = await response.bytes()
+        async with fetch(url) as response:
+            content = await response.bytes()
         fetch_time = time() - fetch_time
         # self.logger.debug(f"Parsing: {url}")
         parse_time = time()
-        soup = bs4.BeautifulSoup(
+        title, body, origin_created_at = self.parse_news(
             content.decode("utf-8", errors="ignore"),
-            "html.parser",
         )
-        title = soup.find("h1")
-        body = soup.select_one("div.entry-content")
-        entry_date = soup.select_one("time.entry-date")
-        title = title.text.strip() if title else ""
-        body = body.text.replace("\n", "\n\n").strip() if body else ""
         new = {
-            "origin_created_at": datetime.fromisoformat(
-                str(entry_date.attrs["datetime"])
-            )
-            if entry_date
-            else None,
+            "origin_created_at": origin_created_at,
             "url": url,
             "title": title,
             "content": body,
@@ -48,7 +81,7 @@ class NewsReader(LogWrapper):
         if not url:
             return None
         # self.logger.debug(f"Fetching image: {url}")
-        response = await pyfetch(url)
-        content = await response.bytes()
+        async with fetch(url) as response:
+            content = await response.bytes()
         # self.logger.debug(f"Done fetch of image: {url}")
         return content
@@ -0,0 +1,402 @@
+import re
+from collections import Counter
+from collections.abc import Iterator
+from html.entities import html5
+from html.parser import HTMLParser
+from typing import ClassVar
+
+
+class Capture:
+    """Text of an element being read, open until the element is closed."""
+
+    def __init__(self, depth: int) -> None:
+        self.depth = depth
+        self.text: list[str] = []
+        self.closed = False
+
+    def __str__(self) -> str:
+        return "".join(self.text)
+
+
+class SoupLikeParser(HTMLParser):
+    """`html.parser` base that reads pages the way BeautifulSoup does.
+
+    Instead of building a document tree it keeps a stack of open tag names,
+    and subclasses pick the elements they need in `element_started`,
+    capturing their text with `capture`. Results are the same as
+    `bs4.BeautifulSoup(html, "html.parser")` and `.text`/`.attrs` on those
+    elements, so it mimics what BeautifulSoup does on top of `html.parser`:
+    tag stack popping, void elements, whitespace only strings collapsing,
+    entity handling, multi-valued attributes and the strings `.text` skips
+    (comments, declarations, `script`/`style`/`template`/`rt`/`rp`).
+    """
+
+    # bs4.builder.HTMLTreeBuilder defaults
+    EMPTY_ELEMENT_TAGS: ClassVar[set[str]] = {
+        "area",
+        "base",
+        "basefont",
+        "bgsound",
+        "br",
+        "col",
+        "command",
+        "embed",
+        "frame",
+        "hr",
+        "image",
+        "img",
+        "input",
+        "isindex",
+        "keygen",
+        "link",
+        "menuitem",
+        "meta",
+        "nextid",
+        "param",
+        "source",
+        "spacer",
+        "track",
+        "wbr",
+    }
+    STRING_CONTAINERS: ClassVar[set[str]] = {"rt", "rp", "style", "script", "template"}
+    PRESERVE_WHITESPACE_TAGS: ClassVar[set[str]] = {"pre", "textarea"}
+    ASCII_SPACES = "\x20\x0a\x09\x0c\x0d"
+    # Attributes bs4 splits into a list of values (on any element)
+    MULTI_VALUED_ATTRIBUTES: ClassVar[set[str]] = {"class", "accesskey", "dropzone"}
+    NON_WHITESPACE = re.compile(r"\S+")
+    # `&#` not followed by what `html.parser` takes as a character reference
+    MALFORMED_CHARREF = re.compile(r"&#(?!(?:[0-9]+|[xX][0-9a-fA-F]+)[^0-9a-fA-F])")
+
+    CHUNK_SIZE = 16384
+
+    # Kinds of string, only TEXT (outside string containers) and CDATA are
+    # part of `.text`
+    TEXT = 0
+    CDATA = 1
+    OTHER = 2
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=False)
+        self.stack: list[str] = []
+        self.open_tags: Counter[str] = Counter()
+        self.string_containers = 0
+        self.preserve_whitespace = 0
+        self.already_closed_empty_element: list[str] = []
+        self.current_data: list[str] = []
+        self.captures: list[Capture] = []
+
+    @property
+    def done(self) -> bool:
+        """Whether the rest of the page can be skipped."""
+        return False
+
+    def feed_chunks(self, html: str) -> Iterator[None]:
+        """Feed a page in chunks, stopping early once `done`.
+
+        Yields after each chunk so callers can consume partial results.
+        `html.parser` stops reading its input at a malformed `&#` reference,
+        and recovers differently depending on where that input ends, so
+        pages with one are fed at once, like BeautifulSoup does.
+        """
+        chunk_size = self.CHUNK_SIZE
+        if self.MALFORMED_CHARREF.search(html):
+            chunk_size = max(len(html), 1)
+        for i in range(0, len(html), chunk_size):
+            self.feed(html[i : i + chunk_size])
+            yield
+            if self.done:
+                return
+        self.close()
+        self._end_data()
+        # End of the page closes every open element
+        self._pop_to_depth(0)
+        yield
+
+    def element_started(self, tag: str, attrs: dict[str, str | list[str]]) -> None:
+        """Called after `tag` is pushed on the stack."""
+
+    def element_closed(self, tag: str) -> None:
+        """Called after `tag` is popped from the stack."""
+
+    def capture(self) -> Capture:
+        """Capture the text of the element just started."""
+        capture = Capture(len(self.stack))
+        self.captures.append(capture)
+        return capture
+
+    def _end_data(self, kind: int = TEXT) -> None:
+        if not self.current_data:
+            return
+        data = "".join(self.current_data)
+        self.current_data = []
+        if not self.preserve_whitespace and not data.strip(self.ASCII_SPACES):
+            data = "\n" if "\n" in data else " "
+        if kind == self.OTHER or (kind == self.TEXT and self.string_containers):
+            return
+        for capture in self.captures:
+            capture.text.append(data)
+
+    def _push_tag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        self.stack.append(tag)
+        self.open_tags[tag] += 1
+        if tag in self.STRING_CONTAINERS:
+            self.string_containers += 1
+        if tag in self.PRESERVE_WHITESPACE_TAGS:
+            self.preserve_whitespace += 1
+        self.element_started(
+            tag,
+            {
+                key: self.NON_WHITESPACE.findall(value or "")
+                if key in self.MULTI_VALUED_ATTRIBUTES
+                else value or ""
+                for key, value in attrs
+            },
+        )
+
+    def _pop(self) -> None:
+        popped = self.stack.pop()
+        self.open_tags[popped] -= 1
+        if popped in self.STRING_CONTAINERS:
+            self.string_containers -= 1
+        if popped in self.PRESERVE_WHITESPACE_TAGS:
+            self.preserve_whitespace -= 1
+        while self.captures and self.captures[-1].depth > len(self.stack):
+            self.captures.pop().closed = True
+        self.element_closed(popped)
+
+    def _pop_to_tag(self, tag: str) -> None:
+        if not self.open_tags[tag]:
+            return
+        while self.stack:
+            popped = self.stack[-1]
+            self._pop()
+            if popped == tag:
+                break
+
+    def _pop_to_depth(self, depth: int) -> None:
+        while len(self.stack) > depth:
+            self._pop()
+
+    def handle_starttag(self, tag, attrs):
+        self._end_data()
+        self._push_tag(tag, attrs)
+        if tag in self.EMPTY_ELEMENT_TAGS:
+            self._end_data()
+            self._pop_to_tag(tag)
+            # A later explicit closing tag for it is ignored
+            self.already_closed_empty_element.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self._end_data()
+        self._push_tag(tag, attrs)
+        self._end_data()
+        self._pop_to_tag(tag)
+
+    def handle_endtag(self, tag):
+        if tag in self.already_closed_empty_element:
+            self.already_closed_empty_element.remove(tag)
+            return
+        self._end_data()
+        self._pop_to_tag(tag)
+
+    def handle_data(self, data):
+        self.current_data.append(data)
+
+    def handle_charref(self, name):
+        self.current_data.extend(dereference_numeric_character(name))
+
+    def handle_entityref(self, name):
+        character = html5.get(f"{name};")
+        self.current_data.append(character if character is not None else f"&{name}")
+
+    def _handle_special_string(self, data: str, kind: int = OTHER) -> None:
+        self._end_data()
+        self.current_data.append(data)
+        self._end_data(kind)
+
+    def handle_comment(self, data):
+        self._handle_special_string(data)
+
+    def handle_decl(self, data):
+        self._handle_special_string(data)
+
+    def handle_pi(self, data):
+        self._handle_special_string(data)
+
+    def unknown_decl(self, data):
+        if data.upper().startswith("CDATA["):
+            self._handle_special_string(data[len("CDATA[") :], self.CDATA)
+        else:
+            self._handle_special_string(data)
+
+
+class NewsPageParser(SoupLikeParser):
+    """Streaming extractor of the parts of a news page we store.
+
+    It only collects the text of the first `h1`, the text of the first
+    `div.entry-content` and the attributes of the first `time.entry-date`,
+    and stops reading once all three are complete.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.title: Capture | None = None
+        self.content: Capture | None = None
+        self.entry_date: dict[str, str | list[str]] | None = None
+
+    @property
+    def done(self) -> bool:
+        return (
+            self.title is not None
+            and self.title.closed
+            and self.content is not None
+            and self.content.closed
+            and self.entry_date is not None
+        )
+
+    def extract(self, html: str) -> tuple[str | None, str | None, dict | None]:
+        """Parse a news page.
+
+        :param html: News page
+        :type html: str
+        :return: Text of the title and content elements and attributes of the
+            entry date element (None if not found)
+        :rtype: tuple[str | None, str | None, dict | None]
+        """
+        for _ in self.feed_chunks(html):
+            pass
+        return (
+            str(self.title) if self.title is not None else None,
+            str(self.content) if self.content is not None else None,
+            self.entry_date,
+        )
+
+    def element_started(self, tag, attrs):
+        if tag == "h1" and self.title is None:
+            self.title = self.capture()
+        elif (
+            tag == "div"
+            and self.content is None
+            and "entry-content" in attrs.get("class", [])
+        ):
+            self.content = self.capture()
+        elif (
+            tag == "time"
+            and self.entry_date is None
+            and "entry-date" in attrs.get("class", [])
+        ):
+            self.entry_date = attrs
+
+
+class FeedItem:
+    """An `article.post` of a news list page, complete once it's closed."""
+
+    def __init__(self, depth: int) -> None:
+        self.depth = depth
+        # Attributes of its first `a` and `img`
+        self.link: dict[str, str | list[str]] | None = None
+        self.image: dict[str, str | list[str]] | None = None
+        self.closed = False
+
+    @property
+    def url(self) -> str | None:
+        return self.link.get("href") if self.link is not None else None
+
+    @property
+    def photo_url(self) -> str | None:
+        return (self.image.get("src") if self.image is not None else None) or None
+
+
+class FeedPageParser(SoupLikeParser):
+    """Streaming extractor of a news list (historic feed) page.
+
+    Same results as `soup.select("article.post")`, taking the `href` of the
+    first `a` and the `src` of the first `img` of each, and as the
+    pagination links `soup.select("nav > div > a.page-numbers")`.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.items: list[FeedItem] = []
+        self.open_items: list[FeedItem] = []
+        self.page_numbers: list[Capture] = []
+
+    @property
+    def last_page(self) -> int:
+        """Last page number, the link before "next" in the pagination."""
+        return int(str(self.page_numbers[-2]))
+
+    def iter_news(self, html: str) -> Iterator[tuple[str | None, str | None]]:
+        """Parse a news list page, yielding each news once its element closes.
+
+        :param html: News list page
+        :type html: str
+        :return: News URL (None if the item has no link) and photo URL
+        :rtype: Iterator[tuple[str | None, str | None]]
+        """
+        yielded = 0
+        for _ in self.feed_chunks(html):
+            while yielded < len(self.items) and self.items[yielded].closed:
+                item = self.items[yielded]
+                yield item.url, item.photo_url
+                yielded += 1
+
+    def element_started(self, tag, attrs):
+        if tag == "article" and "post" in attrs.get("class", []):
+            item = FeedItem(len(self.stack))
+            self.items.append(item)
+            self.open_items.append(item)
+        elif tag == "a":
+            for item in self.open_items:
+                if item.link is None:
+                    item.link = attrs
+            if "page-numbers" in attrs.get("class", []) and self.stack[-3:-1] == [
+                "nav",
+                "div",
+            ]:
+                self.page_numbers.append(self.capture())
+        elif tag == "img":
+            for item in self.open_items:
+                if item.image is None:
+                    item.image = attrs
+
+    def element_closed(self, tag):
+        while self.open_items and self.open_items[-1].depth > len(self.stack):
+            self.open_items.pop().closed = True
+
+
+def dereference_numeric_character(name: str) -> tuple[str, str]:
+    """Numeric character reference (`&#...;`) to text, as BeautifulSoup does.
+
+    :param name: Reference as given by html.parser (`"233"`, `"xE9"`, ...)
+    :type name: str
+    :return: Character and any trailing data that wasn't part of the number
+    :rtype: tuple[str, str]
+    """
+    base = 10
+    digits = "0123456789"
+    if name[:1] in ("x", "X"):
+        name = name[1:]
+        base = 16
+        digits += "abcdef"
+    number = name
+    extra_data = ""
+    try:
+        numeric = int(number, base)
+    except ValueError:
+        length = 0
+        while length < len(name) and name[length] in digits:
+            length += 1
+        if not length:
+            return "", name
+        number, extra_data = name[:length], name[length:]
+        numeric = int(number, base)
+    if numeric == 0 or numeric > 0x10FFFF or 0xD800 <= numeric <= 0xDFFF:
+        return "\ufffd", extra_data
+    if 0x80 <= numeric <= 0x9F:
+        # References to Windows-1252 bytes instead of code points
+        try:
+            return bytes([numeric]).decode("cp1252"), extra_data
+        except UnicodeDecodeError:
+            pass
+    return chr(numeric), extra_data
@@ -0,0 +1,142 @@
+import asyncio
+
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from ...cloudflare_images import CloudflareConfig, CloudflareImages
+from ...database_models import PhotoRef
+from ...logger import LogWrapper
+from .news import NewsReader
+
+
+class PhotoUploader(LogWrapper):
+    """Uploads news photos to Cloudflare Images, reusing the ones already there.
+
+    Photos are looked up in `photo_ref` by origin URL before uploading, and
+    by content when the worker downloads them. With URL ingest (the default)
+    the worker never has the content, so the same photo under another URL
+    is uploaded again. News of the same batch sharing a photo wait for a
+    single upload.
+    """
+
+    def __init__(self, session: Session | None = None) -> None:
+        super().__init__()
+        self.session = session
+        self.known: dict[int, str] = {}
+        # Keys already looked up and not found
+        self.unknown: set[int] = set()
+        # Keys uploaded by this instance, to be saved with `save`
+        self.new_refs: dict[int, str] = {}
+        self._uploads: dict[str, asyncio.Future[str | None]] = {}
+
+    def find(self, keys: list[int]) -> dict[int, str]:
+        missing = [
+            key for key in keys if key not in self.known and key not in self.unknown
+        ]
+        if missing and self.session is not None:
+            self.known.update(PhotoRef.find(self.session, missing))
+            self.unknown.update(key for key in missing if key not in self.known)
+        return {key: self.known[key] for key in keys if key in self.known}
+
+    def preload(self, photo_urls: list[str | None]) -> None:
+        """Look up the photos of a whole batch with one query.
+
+        :param photo_urls: Origin photo URLs
+        :type photo_urls: list[str | None]
+        """
+        self.find([PhotoRef.url_key(url) for url in photo_urls if url])
+
+    def remember(self, keys: list[int], photo_id: str) -> None:
+        for key in keys:
+            self.known[key] = photo_id
+            self.new_refs[key] = photo_id
+
+    def save(self) -> None:
+        """Store the keys of the photos uploaded so far."""
+        if not self.new_refs or self.session is None:
+            return
+        try:
+            PhotoRef.insert_refs(self.session, self.new_refs)
+            self.session.commit()
+            self.new_refs = {}
+        except SQLAlchemyError as e:
+            # Only costs a new upload next time the photo shows up
+            self.session.rollback()
+            self.logger.warning(f"Couldn't save photo references: {e}")
+
+    async def upload(
+        self,
+        news_reader: NewsReader,
+        news_url: str,
+        photo_url: str | None,
+    ) -> str | None:
+        """Photo ID of a news photo, uploading it if it's a new one.
+
+        :param news_reader: Reader used to download the photo
+        :type news_reader: NewsReader
+        :param news_url: News URL
+        :type news_url: str
+        :param photo_url: Origin photo URL
+        :type photo_url: str | None
+        :return: Image ID, None if there's no photo or it couldn't be uploaded
+        :rtype: str | None
+        """
+        if not photo_url:
+            return None
+        photo_id = self.find([PhotoRef.url_key(photo_url)])
+        if photo_id:
+            return next(iter(photo_id.values()))
+        if photo_url not in self._uploads:
+            self._uploads[photo_url] = asyncio.ensure_future(
+                self.upload_new(news_reader, news_url, photo_url)
+            )
+        # Shielded, so a cancelled news doesn't cancel the upload of others
+        return await asyncio.shield(self._uploads[photo_url])
+
+    async def upload_new(
+        self,
+        news_reader: NewsReader,
+        news_url: str,
+        photo_url: str,
+    ) -> str | None:
+        """Upload a photo not found by URL.
+
+        By default Cloudflare fetches it from its origin URL, so it's only
+        known by that URL. If that fails, or URL ingest is disabled, the photo
+        is downloaded, looked up by content and uploaded by the worker if it's
+        still unknown.
+
+        :param news_reader: Reader used to download the photo
+        :type news_reader: NewsReader
+        :param news_url: News URL
+        :type news_url: str
+        :param photo_url: Origin photo URL
+        :type photo_url: str
+        :return: Image ID, None if it couldn't be uploaded
+        :rtype: str | None
+        """
+        url_key = PhotoRef.url_key(photo_url)
+        news_origin_id = news_url.rsplit("=", 1)[-1]
+        image_origin_filename = photo_url.rsplit("/", 1)[-1]
+        image_filename = f"utn-frsn-news-photo-{news_origin_id}-{image_origin_filename}"
+        cloudflare_images = CloudflareImages()
+        if CloudflareConfig.IMAGES_URL_INGEST:
+            image_id = await cloudflare_images.upload_from_url(
+                photo_url, image_filename
+            )
+            if image_id:
+                self.remember([url_key], image_id)
+                return image_id
+            self.logger.warning(
+                f"URL ingest failed for {photo_url}, uploading its content"
+            )
+        image_data = await news_reader.fetch_image(photo_url)
+        if not image_data:
+            return None
+        content_key = PhotoRef.content_key(image_data)
+        image_id = self.find([content_key]).get(content_key)
+        if image_id is None:
+            image_id = await cloudflare_images.upload(image_filename, image_data)
+        if image_id:
+            self.remember([url_key, content_key], image_id)
+        return image_id
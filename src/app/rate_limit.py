@@ -0,0 +1,74 @@
+import asyncio
+from time import monotonic
+
+
+class TokenBucket:
+    """Async token bucket: `rate` tokens per second, bursts up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = monotonic()
+        self.tokens = min(
+            self.tokens + (now - self.updated_at) * self.rate,
+            self.capacity,
+        )
+        self.updated_at = now
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        """Wait until `tokens` are available and take them.
+
+        Waiters are served in arrival order.
+        """
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+
+    def pause(self, seconds: float) -> None:
+        """Hand out no tokens for `seconds`, e.g. after a "retry after"."""
+        self._refill()
+        self.tokens = min(self.tokens, 1.0 - seconds * self.rate)
+
+
+class AdaptiveTokenBucket(TokenBucket):
+    """Token bucket that tunes its rate from the responses it gets back.
+
+    The rate is halved on throttling (429) and server errors (5xx) or
+    timeouts, and grows slowly while responses stay under `target_latency`.
+    """
+
+    SPEED_UP_FACTOR = 1.25
+    SLOW_DOWN_FACTOR = 0.5
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: float,
+        min_rate: float,
+        max_rate: float,
+        target_latency: float,
+    ) -> None:
+        super().__init__(rate, capacity)
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.target_latency = target_latency
+
+    def on_response(self, status: int, latency: float) -> None:
+        if status == 429 or status >= 500:
+            self.backoff()
+        elif latency < self.target_latency:
+            self.rate = min(self.rate * self.SPEED_UP_FACTOR, self.max_rate)
+
+    def backoff(self) -> None:
+        self.rate = max(self.rate * self.SLOW_DOWN_FACTOR, self.min_rate)
+        # Drop the burst allowance, the next request waits a full interval
+        self.tokens = min(self.tokens, 0.0)
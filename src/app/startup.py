@@ -0,0 +1,54 @@
+from collections.abc import Generator
+from contextlib import contextmanager
+from time import perf_counter
+
+from .logger import LogWrapper
+
+
+class StartupTimer(LogWrapper):
+    """Cold start timings of the isolate, split into imports and init.
+
+    Steps are named `import.<what>` or `init.<what>`. Each entrypoint logs
+    the steps it depends on once, the first time it runs in the isolate.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.timings: dict[str, float] = {}
+        self.reported: set[str] = set()
+
+    def add(self, step: str, seconds: float) -> None:
+        self.timings[step] = seconds * 1000
+
+    @contextmanager
+    def measure(self, step: str) -> Generator[None]:
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.add(step, perf_counter() - start)
+
+    def report(self, entrypoint: str, steps: list[str]) -> None:
+        """Log the timings of `steps`, only on the first call per entrypoint.
+
+        :param entrypoint: Entrypoint name (fetch, scheduled, queue)
+        :type entrypoint: str
+        :param steps: Steps run for this entrypoint
+        :type steps: list[str]
+        """
+        if entrypoint in self.reported:
+            return
+        self.reported.add(entrypoint)
+        groups = []
+        for kind in ("import", "init"):
+            timings = {
+                step.split(".", 1)[1]: self.timings[step]
+                for step in steps
+                if step.startswith(f"{kind}.") and step in self.timings
+            }
+            details = ", ".join(f"{name} {ms:.1f}" for name, ms in timings.items())
+            groups.append(f"{kind} {sum(timings.values()):.1f} ms ({details})")
+        self.logger.info(f"Cold start ({entrypoint}): {'; '.join(groups)}")
+
+
+STARTUP_TIMER = StartupTimer()
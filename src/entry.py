@@ -1,21 +1,29 @@
-from datetime import datetime, UTC
-from workers import WorkerEntrypoint, Request
+from time import perf_counter
+
+_import_started = perf_counter()
+
+from datetime import UTC, datetime
+from urllib.parse import urlparse
+
 from pyodide.ffi import to_js
-from sqlalchemy_cloudflare_d1 import create_engine_from_binding  # type: ignore
 from sqlalchemy.orm import sessionmaker
-from urllib.parse import urlparse
+from sqlalchemy_cloudflare_d1 import create_engine_from_binding  # type: ignore
+from workers import Request, Response, WorkerEntrypoint
 
 import app.constants as cts
-from app.logger import LogWrapper, LoggerConfig
-from app.database_models import Base as DatabaseBaseModel
 from app.cloudflare_images import CloudflareConfig
-from app.cloudflare_queues import QueueScraper, QueueMessenger
-
+from app.cloudflare_queues import QueueMessenger, QueueScraper
+from app.database_setup import DatabaseSetup
+from app.fastapi_app.page_store import PageStore
+from app.fetcher import Deadline, DeadlineExceeded, FetchConfig
+from app.logger import LoggerConfig, LogWrapper
 from app.main_apps.messenger.telegram import Telegram
-from app.main_apps.main import index_scraper, main_scraper, messenger
+from app.main_apps.scraper.news import NewsReader
+from app.startup import STARTUP_TIMER
 
-from app.fastapi_app.main import app as fastapi_app
-from app.fastapi_app.database import db_session
+# The scraper/messenger stack and the webpage (FastAPI, Jinja) are imported
+# by the entrypoints using them, so other invocations don't load them
+STARTUP_TIMER.add("import.entry", perf_counter() - _import_started)
 
 
 class EntryLogger(LogWrapper):
@@ -27,13 +35,30 @@ class Default(WorkerEntrypoint):
         super().__init__(ctx, env)
         LoggerConfig.set_level(self.env.LOGGER_LEVEL)
         self.logger = EntryLogger().logger
-        engine = create_engine_from_binding(self.env.DB)
-        self.SessionLocal = sessionmaker(bind=engine)
-        DatabaseBaseModel.metadata.create_all(bind=engine)  # Create tables if not exist
+        with STARTUP_TIMER.measure("init.database"):
+            engine = create_engine_from_binding(self.env.DB)
+            self.SessionLocal = sessionmaker(bind=engine)
+            DatabaseSetup().setup(engine)  # Schema version check, cached
+        with STARTUP_TIMER.measure("init.config"):
+            self.setup_config()
+
+    def setup_config(self) -> None:
+        FetchConfig.setup(timeout=float(getattr(self.env, "TIMEOUT", "60")))
+        # Seconds an invocation (cron run or queue batch) may spend working
+        self.invocation_budget = float(getattr(self.env, "INVOCATION_BUDGET", "600"))
+        # News of a scraper batch processed concurrently
+        self.scraper_concurrency = int(getattr(self.env, "SCRAPER_CONCURRENCY", "1"))
+        NewsReader.setup_config(parser=getattr(self.env, "NEWS_PARSER", ""))
+        PageStore.setup_config(
+            site_url=getattr(self.env, "SITE_URL", ""),
+            latest_pages=int(getattr(self.env, "MATERIALIZED_PAGES", "3")),
+        )
         CloudflareConfig.setup(
             account_id=self.env.CLOUDFLARE_ACCOUNT_ID,
             images_account_hash=self.env.CLOUDFLARE_IMAGES_ACCOUNT_HASH,
             images_api_token=self.env.CLOUDFLARE_IMAGES_API_TOKEN,
+            images_url_ingest=getattr(self.env, "IMAGES_URL_INGEST", "true").lower()
+            == "true",
         )
         Telegram.setup_config(
             chat_id=cts.TELEGRAM_CHANNEL_PROD
@@ -43,11 +68,18 @@ class Default(WorkerEntrypoint):
             silent_mode=getattr(self.env, "TELEGRAM_SILENT_MODE", "").lower() == "true",
         )
 
+    @staticmethod
+    def startup_steps(*imports: str) -> list[str]:
+        return ["import.entry", *imports, "init.database", "init.config"]
+
     # Scheduled Worker
     # Index Scraper
     async def scheduled(self, controller, env, ctx):
+        with STARTUP_TIMER.measure("import.main_apps"):
+            from app.main_apps.main import index_scraper, photo_ref_backfill
+        STARTUP_TIMER.report("scheduled", self.startup_steps("import.main_apps"))
         self.logger.info("Starting scheduled task")
-        with self.SessionLocal() as session:
+        with Deadline.start(self.invocation_budget), self.SessionLocal() as session:
             news_urls = await index_scraper(session)
             if news_urls:
                 tasks = QueueScraper.bulk_new(news_urls)
@@ -55,6 +87,13 @@ class Default(WorkerEntrypoint):
                     # Max 100 messages per batch
                     batch = tasks[i : i + 100]
                     await self.env.SCRAPER_QUEUE.sendBatch(to_js(batch))
+            try:
+                # Only runs until it completes once, after the new news
+                # are already queued
+                await photo_ref_backfill(session)
+            except Exception as e:  # noqa: BLE001
+                session.rollback()
+                self.logger.warning(f"Photo references backfill failed: {e}")
         self.logger.info("Scheduled task completed successfully")
 
     # Queue Worker
@@ -65,53 +104,71 @@ class Default(WorkerEntrypoint):
         unknown1: None = None,
         unknown2: None = None,
     ):
+        with STARTUP_TIMER.measure("import.main_apps"):
+            from app.main_apps.main import main_scraper_batch, messenger_batch
+        STARTUP_TIMER.report("queue", self.startup_steps("import.main_apps"))
         self.logger.info(f"Start batch queue {batch.queue}")
-        with self.SessionLocal() as session:
+        with Deadline.start(self.invocation_budget), self.SessionLocal() as session:
             ## ------> SCRAPER_QUEUE <------ ##
             if batch.queue == "utn-frsn-news-scraper":
                 self.logger.info("Processing SCRAPER_QUEUE batch")
-                for message in batch.messages:
-                    task = QueueScraper.read(message)
-                    try:
-                        news_id = await main_scraper(
-                            session,
-                            task.news_url,
-                            task.photo_url,
-                            datetime.now(UTC),
-                        )
-                        await self.env.MESSENGER_QUEUE.send(
-                            to_js(QueueMessenger.new(news_id))
-                        )
-                    except Exception as e:
-                        self.logger.error(f"[{task.news_url}] Error scraping news: {e}")
-                        telegram = Telegram()
-                        await telegram.send_message(
-                            0,
-                            f"[SCRAPER ERROR] [{task.news_url}] Error scraping news: {e}",
-                            chat_id=cts.TELEGRAM_CHANNEL_DEBUG,
-                        )
+                tasks = [QueueScraper.read(message) for message in batch.messages]
+                results = await main_scraper_batch(
+                    session,
+                    [
+                        (task.news_url, task.photo_url, datetime.now(UTC))
+                        for task in tasks
+                    ],
+                    max_in_flight=self.scraper_concurrency,
+                )
+                news_ids: list[int] = []
+                handled = []
+                for message, task, result in zip(batch.messages, tasks, results):
+                    if isinstance(result, DeadlineExceeded):
+                        # Ran out of time, let the queue deliver it again
+                        self.logger.warning(f"[{task.news_url}] Retrying: {result}")
+                        message.retry()
+                        continue
+                    if isinstance(result, BaseException):
+                        await self.report_scraper_error(task, result)
+                    else:
+                        news_ids.append(result)
+                    handled.append(message)
+                messenger_tasks = QueueMessenger.bulk_new(news_ids)
+                for i in range(0, len(messenger_tasks), 100):
+                    # Max 100 messages per batch
+                    batch_tasks = messenger_tasks[i : i + 100]
+                    await self.env.MESSENGER_QUEUE.sendBatch(to_js(batch_tasks))
+                for message in handled:
+                    message.ack()
+                if news_ids:
+                    # After acking, so slow renders can't get results retried
+                    await PageStore(session).warm(news_ids)
 
             ## ------> MESSENGER_QUEUE <------ ##
             elif batch.queue == "utn-frsn-news-messenger":
                 self.logger.info("Processing MESSENGER_QUEUE batch")
-                for message in batch.messages:
-                    task = QueueMessenger.read(message)
-                    try:
-                        self.logger.info(f"News ID to process: {task.news_id}")
-                        await messenger(
-                            session,
-                            task.news_id,
-                        )
-                    except Exception as e:
+                tasks = [QueueMessenger.read(message) for message in batch.messages]
+                self.logger.info(f"News IDs to process: {[t.news_id for t in tasks]}")
+                results = await messenger_batch(
+                    session,
+                    [task.news_id for task in tasks],
+                )
+                for message, task, result in zip(batch.messages, tasks, results):
+                    if isinstance(result, DeadlineExceeded):
+                        self.logger.warning(f"[{task.news_id}] Retrying: {result}")
+                        message.retry()
+                    elif result is not None:
                         self.logger.error(
-                            f"[{task.news_id}] Error sending message: {e}"
+                            f"[{task.news_id}] Error sending message: {result}"
                         )
                         telegram = Telegram()
                         await telegram.send_message(
                             task.news_id,
-                            f"[{task.news_id}] Error sending message: {e}",
+                            f"[{task.news_id}] Error sending message: {result}",
                             chat_id=cts.TELEGRAM_CHANNEL_DEBUG,
                         )
+                Telegram.log_throughput()
 
             ## ------> UNKNOWN (must never happen) <------ ##
             else:
@@ -119,12 +176,36 @@ class Default(WorkerEntrypoint):
                 return
         self.logger.info(f"Finished batch queue {batch.queue} successfully")
 
+    async def report_scraper_error(self, task: QueueScraper, e: BaseException):
+        self.logger.error(f"[{task.news_url}] Error scraping news: {e}")
+        telegram = Telegram()
+        await telegram.send_message(
+            0,
+            f"[SCRAPER ERROR] [{task.news_url}] Error scraping news: {e}",
+            chat_id=cts.TELEGRAM_CHANNEL_DEBUG,
+        )
+
     async def fetch(self, request: Request):
         url = urlparse(request.url)
         if url.path.startswith("/static"):
             return await self.env.ASSETS.fetch(request)
 
-        import asgi
+        # Pre-rendered pages are served without loading the webpage
+        page_key = PageStore.key(url.path, url.query)
+        if page_key and request.method == "GET":
+            with self.SessionLocal() as session:
+                page = await PageStore(session).get_or_render(
+                    page_key, f"{url.scheme}://{url.netloc}"
+                )
+            if page:
+                return self.stored_response(page, request)
+
+        with STARTUP_TIMER.measure("import.webpage"):
+            import asgi
+
+            from app.fastapi_app.database import db_session
+            from app.fastapi_app.main import app as fastapi_app
+        STARTUP_TIMER.report("fetch", self.startup_steps("import.webpage"))
 
         with self.SessionLocal() as session:
             token = db_session.set(session)  # Store session for THIS request only
@@ -136,3 +217,16 @@ class Default(WorkerEntrypoint):
                 )
             finally:
                 db_session.reset(token)  # Clean up session after request
+
+    def stored_response(self, page, request: Request) -> Response:
+        headers = PageStore.headers(page)
+        if PageStore.is_not_modified(page, request.headers.get("if-none-match")):
+            return Response(
+                None,
+                status=304,
+                headers={
+                    "etag": headers["etag"],
+                    "cache-control": headers["cache-control"],
+                },
+            )
+        return Response(page.body, headers=headers)
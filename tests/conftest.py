@@ -0,0 +1,98 @@
+import json
+from collections.abc import Callable
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+import app.fetcher
+from app.database_setup import DatabaseSetup
+from app.main_apps.messenger.telegram import Telegram
+
+TESTS_DIR = Path(__file__).resolve().parent
+# Pages of the tests, then the recorded pages of the benchmarks
+FIXTURES_DIRS = (
+    TESTS_DIR / "fixtures",
+    TESTS_DIR.parent / "benchmarks" / "fixtures",
+)
+
+
+@pytest.fixture
+def read_fixture() -> Callable[[str], str]:
+    """Read a fixture page by file name."""
+
+    def read(name: str) -> str:
+        for directory in FIXTURES_DIRS:
+            path = directory / name
+            if path.exists():
+                return path.read_text(encoding="utf-8")
+        raise FileNotFoundError(name)
+
+    return read
+
+
+@pytest.fixture
+def session() -> Session:
+    """Session of a new in-memory database set up by `DatabaseSetup`."""
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    # A new database, its setup can't be skipped
+    DatabaseSetup._ready_version = None
+    DatabaseSetup().setup(engine)
+    session = Session(engine)
+    yield session
+    session.close()
+    DatabaseSetup._ready_version = None
+
+
+class FakeTelegramApi:
+    """Telegram Bot API answering `pyfetch`, recording every call.
+
+    `fail` gets each call (method and JSON body) and returns whether it's
+    answered with an error.
+    """
+
+    def __init__(self) -> None:
+        self.calls: list[tuple[str, dict]] = []
+        self.fail: Callable[[str, dict], bool] = lambda method, body: False
+
+    async def pyfetch(self, url: str, body: str = "{}", **kwargs):
+        method = url.rsplit("/", 1)[-1]
+        request = json.loads(body)
+        self.calls.append((method, request))
+        if self.fail(method, request):
+            status = 400
+            answer = {"ok": False, "error_code": 400, "description": "Bad Request"}
+        else:
+            status = 200
+            answer = {"ok": True, "result": {"message_id": len(self.calls)}}
+        return app.fetcher.FetchResponse(url, status, json.dumps(answer).encode())
+
+    def texts(self) -> list[str]:
+        return [body.get("text", body.get("caption")) for _, body in self.calls]
+
+
+@pytest.fixture
+def telegram_api(monkeypatch) -> FakeTelegramApi:
+    """Fake Telegram API, with rate limits and retry waits out of the way."""
+    api = FakeTelegramApi()
+    monkeypatch.setattr(app.fetcher, "pyfetch", api.pyfetch)
+    for name, value in {
+        "CHAT_ID": "-100123",
+        "TELEGRAM_API_KEY": "key",
+        "URL_SEND_MESSAGES": "https://api.telegram.org/botkey/sendMessage",
+        "URL_SEND_PHOTO": "https://api.telegram.org/botkey/sendPhoto",
+        "DEFAULT_RETRY_SLEEP": 0,
+        "MAXIMUM_RETRIES": 1,
+        "CHAT_RATE": 1000,
+        "CHAT_BURST": 1000,
+        "_chat_limiters": {},
+        "_global_limiter": None,
+    }.items():
+        monkeypatch.setattr(Telegram, name, value)
+    return api
@@ -0,0 +1,86 @@
+from datetime import UTC, datetime
+
+from sqlalchemy import create_engine, func, select, text
+from sqlalchemy.orm import Session
+
+from app.database_migrations import DatabaseMigrations
+from app.database_models import SchemaMigration, TelegramDelivery
+from app.database_setup import DatabaseSetup
+
+
+def column_type(session: Session, table: str, column: str) -> str:
+    types = {
+        name: column_type
+        for name, column_type in session.execute(
+            text(f"SELECT name, type FROM pragma_table_info('{table}')")
+        )
+    }
+    return types[column]
+
+
+def test_new_database_stores_log_datetimes_as_epoch(session):
+    assert column_type(session, "telegram_delivery", "delivered_at") == "INTEGER"
+    assert column_type(session, "schema_migrations", "applied_at") == "INTEGER"
+    latest = DatabaseMigrations().latest_version
+    assert session.scalar(select(func.max(SchemaMigration.version))) == latest
+
+
+def test_log_datetimes_are_converted_from_iso_strings():
+    engine = create_engine("sqlite://")
+    with engine.begin() as connection:
+        # Tables as created before the conversion, up to migration 6
+        connection.execute(
+            text(
+                "CREATE TABLE telegram_delivery (news_id INTEGER NOT NULL, "
+                "chat_id VARCHAR(64) NOT NULL, part_index INTEGER NOT NULL, "
+                "message_id INTEGER, delivered_at VARCHAR NOT NULL, "
+                "PRIMARY KEY (news_id, chat_id, part_index))"
+            )
+        )
+        connection.execute(
+            text(
+                "CREATE TABLE schema_migrations (version INTEGER NOT NULL, "
+                "name VARCHAR(127) NOT NULL, applied_at VARCHAR NOT NULL, "
+                "PRIMARY KEY (version))"
+            )
+        )
+        connection.execute(
+            text(
+                "INSERT INTO telegram_delivery VALUES "
+                "(1, '-100', 0, 10, '2024-05-01T12:00:00+00:00'), "
+                "(1, '-100', 1, 11, '2024-05-01T09:00:30-03:00')"
+            )
+        )
+        for version, name, _ in DatabaseMigrations().migrations()[:6]:
+            connection.execute(
+                text(
+                    "INSERT INTO schema_migrations VALUES "
+                    "(:version, :name, '2024-04-30T00:00:00')"
+                ),
+                {"version": version, "name": name},
+            )
+
+    DatabaseSetup._ready_version = None
+    try:
+        DatabaseSetup().setup(engine)
+    finally:
+        DatabaseSetup._ready_version = None
+
+    with Session(engine) as session:
+        assert column_type(session, "telegram_delivery", "delivered_at") == "INTEGER"
+        assert column_type(session, "schema_migrations", "applied_at") == "INTEGER"
+        deliveries = session.execute(
+            select(TelegramDelivery.part_index, TelegramDelivery.delivered_at)
+        ).all()
+        assert sorted(deliveries) == [
+            (0, datetime(2024, 5, 1, 12, tzinfo=UTC)),
+            (1, datetime(2024, 5, 1, 12, 0, 30, tzinfo=UTC)),
+        ]
+        migrations = session.scalars(
+            select(SchemaMigration).order_by(SchemaMigration.version)
+        ).all()
+        assert [m.version for m in migrations] == [
+            version for version, _, _ in DatabaseMigrations().migrations()
+        ]
+        assert migrations[0].applied_at == datetime(2024, 4, 30, tzinfo=UTC)
+        assert migrations[-1].applied_at.tzinfo == UTC
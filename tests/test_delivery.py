@@ -0,0 +1,116 @@
+import re
+
+import pytest
+
+from app.main_apps.messenger.delivery import (
+    CAPTION_LIMIT,
+    HTML_TOKEN,
+    MESSAGE,
+    MESSAGE_LIMIT,
+    PHOTO,
+    plan_delivery,
+    split_html,
+)
+
+HEADER = '01/02/2024\n<a href="https://www.frsn.utn.edu.ar/?p=1"><b>Título</b></a>'
+PHOTO_URL = "https://imagedelivery.net/hash/photo/public"
+
+
+def utf16_length(text: str) -> int:
+    return len(text.encode("utf-16-le")) // 2
+
+
+def post(paragraphs: int, paragraph: str) -> str:
+    return HEADER + "\n\n" + "\n\n".join([paragraph] * paragraphs)
+
+
+def open_tags_balanced(part: str) -> bool:
+    stack = []
+    for match in re.finditer(r"<(/?)([a-zA-Z]+)[^>]*>", part):
+        if not match.group(1):
+            stack.append(match.group(2))
+        elif not stack or stack.pop() != match.group(2):
+            return False
+    return not stack
+
+
+PARAGRAPHS = [
+    "Inscripciones abiertas para las carreras de grado &amp ingreso 2024. " * 4,
+    # Astral characters count twice in UTF-16
+    "Becas 😀 para estudiantes 🎓 &lt&gt " * 30,
+    '<a href="https://www.frsn.utn.edu.ar/?p=2&amp;x=1"><b>enlace largo</b></a> ' * 40,
+    "palabra" * 700,
+]
+
+
+@pytest.mark.parametrize("paragraph", PARAGRAPHS)
+@pytest.mark.parametrize("paragraphs", [1, 3, 12])
+@pytest.mark.parametrize("photo_url", [None, PHOTO_URL])
+def test_parts_fit_and_keep_html_whole(paragraph, paragraphs, photo_url):
+    message = post(paragraphs, paragraph)
+    parts = plan_delivery(message, HEADER, photo_url)
+
+    for i, (method, text) in enumerate(parts):
+        assert method == (PHOTO if photo_url and i == 0 else MESSAGE)
+        limit = CAPTION_LIMIT if method == PHOTO else MESSAGE_LIMIT
+        assert 0 < utf16_length(text) <= limit
+        assert open_tags_balanced(text)
+    sent = [text for _, text in parts]
+    if sent[0] == HEADER and photo_url and message != HEADER:
+        sent = sent[1:]
+    # Nothing lost, and tags and entities are the same as in the message
+    assert re.sub(r"\s", "", "".join(sent)) == re.sub(r"\s", "", message)
+    assert [token for part in sent for token in HTML_TOKEN.findall(part)] == (
+        HTML_TOKEN.findall(message)
+    )
+
+
+def test_split_html_limits_count_utf16_units():
+    text = "😀" * 3000
+    parts = split_html(text)
+    assert [utf16_length(part) for part in parts] == [4096, 1904]
+    parts = split_html(text, first_limit=CAPTION_LIMIT)
+    assert [utf16_length(part) for part in parts] == [1024, 4096, 880]
+
+
+def test_split_html_prefers_paragraphs_with_the_same_parts():
+    paragraph = "a " * 1000
+    text = "\n\n".join([paragraph] * 3)
+    parts = split_html(text)
+    assert len(parts) == 2
+    assert parts[0] == "\n\n".join([paragraph] * 2).strip()
+
+
+def test_split_html_cuts_anywhere_for_fewer_parts():
+    # Cutting on spaces only would need a third part
+    text = "x" * 4000 + " " + "y" * 4000 + " " + "z" * 100
+    assert len(split_html(text)) == 2
+
+
+def test_short_post_goes_in_the_caption():
+    message = post(1, "Texto corto.")
+    assert plan_delivery(message, HEADER, PHOTO_URL) == [(PHOTO, message)]
+    assert plan_delivery(message, HEADER, None) == [(MESSAGE, message)]
+
+
+def test_caption_starts_the_post_when_it_saves_a_call():
+    # Caption + 1 message, instead of header + 2 messages
+    message = post(45, "p" * 98)
+    assert utf16_length(message) > MESSAGE_LIMIT
+    parts = plan_delivery(message, HEADER, PHOTO_URL)
+    assert [method for method, _ in parts] == [PHOTO, MESSAGE]
+    assert parts[0].text.startswith(HEADER)
+
+
+def test_header_caption_on_a_tie():
+    # Caption + 1 message either way: the header goes alone in the caption
+    message = post(20, "p" * 98)
+    assert CAPTION_LIMIT < utf16_length(message) <= MESSAGE_LIMIT
+    parts = plan_delivery(message, HEADER, PHOTO_URL)
+    assert parts == [(PHOTO, HEADER), (MESSAGE, message)]
+
+
+def test_single_tag_longer_than_the_limit_is_still_sent():
+    text = '<a href="' + "x" * 5000 + '">a</a>'
+    parts = split_html(text)
+    assert "".join(parts) == text
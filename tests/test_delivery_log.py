@@ -0,0 +1,65 @@
+import asyncio
+
+from sqlalchemy import select
+
+from app.database_models import News, TelegramDelivery
+from app.main_apps.main import messenger_batch
+
+PARAGRAPH = "Inscripciones abiertas para las carreras de grado. " * 20
+
+
+def add_news(session) -> int:
+    news = News(
+        url="https://www.frsn.utn.edu.ar/?p=1",
+        title="Inscripciones",
+        # A caption and two messages
+        content="\n\n".join([PARAGRAPH] * 8),
+        photo_id="photo",
+    )
+    session.add(news)
+    session.commit()
+    return news.id
+
+
+def delivered_parts(session, news_id: int) -> list[int]:
+    return list(
+        session.execute(
+            select(TelegramDelivery.part_index)
+            .where(TelegramDelivery.news_id == news_id)
+            .order_by(TelegramDelivery.part_index)
+        ).scalars()
+    )
+
+
+def test_retry_only_sends_missing_parts(session, telegram_api):
+    news_id = add_news(session)
+    # The last message fails, after the photo and the first message went out
+    first_attempt_calls = []
+
+    def fail(method, body):
+        first_attempt_calls.append(method)
+        return len(first_attempt_calls) > 2
+
+    telegram_api.fail = fail
+    [error] = asyncio.run(messenger_batch(session, [news_id]))
+    assert isinstance(error, ValueError)
+    assert [method for method, _ in telegram_api.calls] == [
+        "sendPhoto",
+        "sendMessage",
+        # Failed, then retried once
+        "sendMessage",
+        "sendMessage",
+    ]
+    assert delivered_parts(session, news_id) == [0, 1]
+    sent = telegram_api.texts()
+
+    telegram_api.calls.clear()
+    telegram_api.fail = lambda method, body: False
+    assert asyncio.run(messenger_batch(session, [news_id])) == [None]
+    # Only the part that failed is sent again
+    assert telegram_api.texts() == [sent[-1]]
+    assert delivered_parts(session, news_id) == [0, 1, 2]
+
+    telegram_api.calls.clear()
+    assert asyncio.run(messenger_batch(session, [news_id])) == [None]
+    assert telegram_api.calls == []
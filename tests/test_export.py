@@ -0,0 +1,105 @@
+import asyncio
+import csv
+import io
+import json
+from datetime import UTC, datetime, timedelta
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app.database_models import News
+from app.fastapi_app import main
+from app.fastapi_app.main import EXPORT_CHUNK_SIZE, export_news
+
+# Several export chunks (keyset pages)
+NEWS_ROWS = EXPORT_CHUNK_SIZE * 2 + 50
+FIRST_INSERTED_AT = datetime(2024, 5, 1, tzinfo=UTC)
+
+
+@pytest.fixture
+def news_ids(session) -> list[int]:
+    # Pairs share an `inserted_at`, so the keyset pages also order by ID
+    news = [
+        News(
+            url=f"https://www.frsn.utn.edu.ar/?p={i}",
+            title=f"Noticia {i}",
+            content=f'Contenido, con "comillas" y\nsaltos {i}.',
+            inserted_at=FIRST_INSERTED_AT + timedelta(minutes=i // 2),
+        )
+        for i in range(NEWS_ROWS)
+    ]
+    session.add_all(news)
+    session.commit()
+    return [entry.id for entry in news]
+
+
+@pytest.fixture
+def stream_sessions(monkeypatch) -> list[Session]:
+    """Sessions opened by the export streams."""
+    sessions = []
+
+    class RecordedSession(Session):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            sessions.append(self)
+            self.closed = False
+
+        def close(self):
+            self.closed = True
+            super().close()
+
+    monkeypatch.setattr(main, "Session", RecordedSession)
+    return sessions
+
+
+def export(session, monkeypatch, export_format: str, since: str | None) -> str:
+    """Body of `/api/news/export`, read after the request session closed."""
+
+    async def read() -> str:
+        response = await export_news(
+            session,
+            export_format=export_format,
+            since=since,
+            origin_date_from=None,
+            origin_date_to=None,
+            inserted_date_from=None,
+            inserted_date_to=None,
+        )
+        # What the Workers adapter does: the body is read after the request
+        session.close()
+
+        def closed(*args, **kwargs):
+            raise AssertionError("Request session used by the stream")
+
+        monkeypatch.setattr(session, "execute", closed)
+        chunks = [chunk async for chunk in response.body_iterator]
+        return b"".join(chunks).decode()
+
+    return asyncio.run(read())
+
+
+@pytest.mark.parametrize(
+    ("since", "first"),
+    [
+        (None, 0),
+        # Inclusive: both news of that second are exported
+        ((FIRST_INSERTED_AT + timedelta(minutes=120)).isoformat(), 240),
+    ],
+)
+@pytest.mark.parametrize("export_format", ["ndjson", "csv"])
+def test_export_streams_every_chunk(
+    session, news_ids, stream_sessions, monkeypatch, export_format, since, first
+):
+    body = export(session, monkeypatch, export_format, since)
+
+    if export_format == "ndjson":
+        items = [json.loads(line) for line in body.splitlines()]
+    else:
+        items = list(csv.DictReader(io.StringIO(body)))
+    assert [int(item["id"]) for item in items] == news_ids[first:]
+    assert items[0]["title"] == f"Noticia {first}"
+    assert items[-1]["content"] == (
+        f'Contenido, con "comillas" y\nsaltos {NEWS_ROWS - 1}.'
+    )
+    assert len(stream_sessions) == 1
+    assert stream_sessions[0].closed
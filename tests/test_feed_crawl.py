@@ -0,0 +1,175 @@
+"""Historic feed crawl: sliding window, stop at the latest known news and
+adaptive pacing, against a stubbed `pyfetch`."""
+
+import asyncio
+
+import pytest
+
+import app.fetcher
+from app.main_apps.scraper.feed import WORDPRESS_SITE, CrawlerConfig, HistoricFeed
+from app.rate_limit import AdaptiveTokenBucket
+
+NEWS_URL = "https://www.frsn.utn.edu.ar/?p={}"
+NEWS_PER_PAGE = 3
+
+
+def feed_page(news_ids: list[int], last_page: int) -> bytes:
+    articles = "".join(
+        f'<article class="post"><a href="{NEWS_URL.format(i)}">{i}</a></article>'
+        for i in news_ids
+    )
+    links = "".join(
+        f'<a class="page-numbers" href="{WORDPRESS_SITE.PAGINATION_URL.format(n)}">'
+        f"{n}</a>"
+        for n in (1, last_page)
+    )
+    return (
+        f"<html><body>{articles}<nav><div>{links}"
+        '<a class="next page-numbers" href="#">Siguiente</a>'
+        "</div></nav></body></html>"
+    ).encode()
+
+
+class FakeSite:
+    """Feed of `pages` pages, newest news first, served by `pyfetch`.
+
+    Pages in `hanging` never answer, pages in `delays` answer after some
+    seconds. `statuses` are answered, in order, before a page is served.
+    """
+
+    def __init__(self, pages: int, hanging: set[int] = frozenset()) -> None:
+        self.pages = pages
+        self.hanging = hanging
+        self.delays: dict[int, float] = {}
+        self.statuses: list[int] = []
+        self.requested: list[int] = []
+        self.cancelled: set[int] = set()
+        self.signals: dict[int, object] = {}
+
+    def news_ids(self, page: int) -> list[int]:
+        newest = self.pages * NEWS_PER_PAGE - (page - 1) * NEWS_PER_PAGE
+        return list(range(newest, newest - NEWS_PER_PAGE, -1))
+
+    async def pyfetch(self, url: str, signal=None, **kwargs):
+        page = next(
+            n
+            for n in range(1, self.pages + 1)
+            if url == WORDPRESS_SITE.PAGINATION_URL.format(n)
+        )
+        self.requested.append(page)
+        self.signals[page] = signal
+        if page in self.hanging:
+            try:
+                await asyncio.Event().wait()
+            except asyncio.CancelledError:
+                self.cancelled.add(page)
+                raise
+        await asyncio.sleep(self.delays.get(page, 0))
+        status = self.statuses.pop(0) if self.statuses else 200
+        return app.fetcher.FetchResponse(
+            url, status, feed_page(self.news_ids(page), self.pages)
+        )
+
+
+@pytest.fixture(autouse=True)
+def fast_crawl(monkeypatch):
+    monkeypatch.setattr(CrawlerConfig, "INITIAL_RATE", 1000.0)
+    monkeypatch.setattr(CrawlerConfig, "MIN_RATE", 100.0)
+    monkeypatch.setattr(CrawlerConfig, "MAX_RATE", 2000.0)
+
+
+@pytest.fixture
+def site(monkeypatch):
+    def serve(pages: int, hanging: set[int] = frozenset()) -> FakeSite:
+        fake = FakeSite(pages, hanging)
+        monkeypatch.setattr(app.fetcher, "pyfetch", fake.pyfetch)
+        return fake
+
+    return serve
+
+
+def test_bucket_slows_down_on_throttling_and_errors():
+    bucket = AdaptiveTokenBucket(8, 1, min_rate=1, max_rate=16, target_latency=1)
+    bucket.on_response(429, 0.1)
+    assert bucket.rate == 4
+    assert bucket.tokens <= 0
+    bucket.on_response(503, 0.1)
+    assert bucket.rate == 2
+    for _ in range(5):
+        bucket.on_response(500, 0.1)
+    assert bucket.rate == 1
+
+
+def test_bucket_speeds_up_after_fast_successes():
+    bucket = AdaptiveTokenBucket(1, 1, min_rate=1, max_rate=2, target_latency=1)
+    bucket.on_response(200, 2.0)
+    assert bucket.rate == 1
+    bucket.on_response(200, 0.1)
+    assert bucket.rate == 1.25
+    for _ in range(10):
+        bucket.on_response(200, 0.1)
+    assert bucket.rate == 2
+
+
+def test_fetch_page_slows_down_and_recovers(site):
+    fake = site(1)
+    fake.statuses = [429, 503]
+    feed = HistoricFeed()
+
+    async def crawl():
+        html = await feed.fetch_page(1)
+        assert NEWS_URL.format(3) in html
+        assert fake.requested == [1, 1, 1]
+        # Halved twice, then sped up once by the fast success
+        assert feed.rate_limiter.rate == 1000 * 0.5 * 0.5 * 1.25
+        for _ in range(10):
+            await feed.fetch_page(1)
+
+    asyncio.run(crawl())
+    assert feed.rate_limiter.rate == CrawlerConfig.MAX_RATE
+
+
+def test_get_urls_reads_every_page_without_latest_url(site):
+    fake = site(7)
+    urls = asyncio.run(HistoricFeed(window=3).get_urls())
+    assert [url for url, _ in urls] == [NEWS_URL.format(i) for i in range(1, 22)]
+    assert sorted(fake.requested) == list(range(1, 8))
+
+
+def test_get_urls_stops_after_latest_url(site):
+    fake = site(20)
+    # First news of page 3; the 5 older news to check end on page 4
+    latest_url = NEWS_URL.format(fake.news_ids(3)[0])
+    urls = asyncio.run(HistoricFeed(window=2).get_urls(latest_url))
+
+    assert max(fake.requested) <= 4 + 2
+    assert 20 not in fake.requested
+    news = [url for url, _ in urls][::-1]
+    assert news[: 3 * NEWS_PER_PAGE] == [
+        NEWS_URL.format(i) for page in (1, 2, 3) for i in fake.news_ids(page)
+    ]
+    assert len(news) - news.index(latest_url) > CrawlerConfig.OLDER_NEWS_TO_CHECK
+
+
+def test_get_urls_cancels_pages_in_flight(site):
+    # Page 4 never answers, but the crawl can stop after page 3
+    fake = site(20, hanging={4})
+    # Slow enough for page 4 to be requested before the crawl stops
+    fake.delays = {2: 0.05, 3: 0.05}
+    latest_url = NEWS_URL.format(fake.news_ids(2)[0])
+
+    async def crawl():
+        urls = await asyncio.wait_for(
+            HistoricFeed(window=3).get_urls(latest_url), timeout=5
+        )
+        # Let the cancelled fetch run its cleanup
+        await asyncio.sleep(0.01)
+        return urls
+
+    urls = asyncio.run(crawl())
+    assert sorted(fake.requested) == [1, 2, 3, 4]
+    assert fake.cancelled == {4}
+    # The JS request is aborted too
+    assert fake.signals[4].aborted
+    assert not fake.signals[3].aborted
+    assert len(urls) == 3 * NEWS_PER_PAGE
@@ -0,0 +1,71 @@
+import asyncio
+
+import bs4
+import pytest
+
+from app.main_apps.scraper.feed import HistoricFeed
+from app.main_apps.scraper.news_parser import FeedPageParser, SoupLikeParser
+
+FEED_PAGES = [
+    "feed_page.html",
+    "feed_last_page.html",
+    "feed_page_without_links.html",
+]
+
+
+def bs4_news(html: str) -> list[tuple[str | None, str | None]]:
+    """News of a feed page read with the selectors FeedPageParser replaced."""
+    soup = bs4.BeautifulSoup(html, "html.parser")
+    news = []
+    for item in soup.select("article.post"):
+        link = item.find("a")
+        image = item.find("img")
+        news.append(
+            (
+                link.get("href") if link else None,
+                (image.get("src") if image else None) or None,
+            )
+        )
+    return news
+
+
+def bs4_last_page(html: str) -> int:
+    soup = bs4.BeautifulSoup(html, "html.parser")
+    return int(soup.select("nav > div > a.page-numbers")[-2].text)
+
+
+@pytest.mark.parametrize("chunk_size", [SoupLikeParser.CHUNK_SIZE, 7])
+@pytest.mark.parametrize("name", FEED_PAGES)
+def test_feed_parser_matches_bs4(read_fixture, monkeypatch, name, chunk_size):
+    monkeypatch.setattr(SoupLikeParser, "CHUNK_SIZE", chunk_size)
+    html = read_fixture(name)
+    parser = FeedPageParser()
+    assert list(parser.iter_news(html)) == bs4_news(html)
+    assert parser.last_page == bs4_last_page(html)
+
+
+@pytest.mark.parametrize("name", FEED_PAGES)
+def test_get_data_skips_news_without_url(read_fixture, name):
+    html = read_fixture(name)
+    news = asyncio.run(HistoricFeed().get_data(html))
+    assert news == [item for item in bs4_news(html) if item[0] is not None]
+
+
+def test_feed_parser_fixture_values(read_fixture):
+    html = read_fixture("feed_page_without_links.html")
+    parser = FeedPageParser()
+    assert list(parser.iter_news(html)) == [
+        (None, "https://www.frsn.utn.edu.ar/sin-enlace.jpg"),
+        (None, None),
+        ("", None),
+        (
+            "https://www.frsn.utn.edu.ar/?p=47",
+            "https://www.frsn.utn.edu.ar/anidada.jpg",
+        ),
+        (
+            "https://www.frsn.utn.edu.ar/?p=46",
+            "https://www.frsn.utn.edu.ar/anidada.jpg",
+        ),
+        ("https://www.frsn.utn.edu.ar/?p=43", None),
+    ]
+    assert parser.last_page == 2
@@ -0,0 +1,65 @@
+import asyncio
+import re
+
+from sqlalchemy import event
+
+from app.database_models import News
+from app.main_apps.main import messenger_batch
+
+NEWS_ROWS = 30
+
+
+def add_news(session) -> list[int]:
+    news = [
+        News(
+            url=f"https://www.frsn.utn.edu.ar/?p={1000 + i}",
+            title=f"Noticia {i}",
+            content=f"Contenido de la noticia {i}.",
+            photo_id=f"photo-{i}" if i % 2 else None,
+        )
+        for i in range(NEWS_ROWS)
+    ]
+    session.add_all(news)
+    session.commit()
+    return [entry.id for entry in news]
+
+
+def test_batch_loads_with_one_query_per_table(session, telegram_api):
+    news_ids = add_news(session)
+    selects: list[str] = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            selects.append(statement)
+
+    event.listen(session.get_bind(), "before_cursor_execute", count)
+    try:
+        results = asyncio.run(messenger_batch(session, news_ids))
+    finally:
+        event.remove(session.get_bind(), "before_cursor_execute", count)
+
+    assert results == [None] * NEWS_ROWS
+    # The news and their delivery logs, nothing per news
+    assert len(selects) == 2
+    assert "FROM news" in selects[0]
+    assert "FROM telegram_delivery" in selects[1]
+
+
+def test_results_line_up_with_news_ids(session, telegram_api):
+    news_ids = add_news(session)
+    failing_url = f"https://www.frsn.utn.edu.ar/?p={1000 + 4}"
+    telegram_api.fail = lambda method, body: (
+        failing_url in (body.get("text") or body.get("caption"))
+    )
+    batch = [news_ids[7], 999_999, news_ids[4], news_ids[0]]
+
+    results = asyncio.run(messenger_batch(session, batch))
+
+    assert results[0] is None
+    assert isinstance(results[1], ValueError)
+    assert "999999" in str(results[1])
+    assert isinstance(results[2], ValueError)
+    assert results[3] is None
+    # Sent in the order of the batch, the failing one tried twice
+    sent = [re.search(r"\?p=(\d+)", text).group(1) for text in telegram_api.texts()]
+    assert sent == ["1007", "1004", "1004", "1000"]
@@ -0,0 +1,119 @@
+from datetime import datetime
+
+import pytest
+
+from app.main_apps.scraper.news import NewsReader
+from app.main_apps.scraper.news_parser import SoupLikeParser
+
+NEWS_PAGES = [
+    "news_page.html",
+    "news_page_references.html",
+    "news_page_unclosed.html",
+    "news_page_missing_parts.html",
+]
+REFERENCES = [
+    "&#233;",
+    "&#0233;",
+    "&#xE9;",
+    "&#Xe9;",
+    "&#8364;",
+    "&#128;",
+    "&#133;",
+    "&#146;",
+    "&#129;",
+    "&#157;",
+    "&#0;",
+    "&#xD800;",
+    "&#x110000;",
+    "&#99999999999;",
+    "&#233abc;",
+    "&#x41zz;",
+    "&#;",
+    "&#x;",
+    "&#abc;",
+    "&#",
+    "&amp;",
+    "&amp",
+    "&copy 2024",
+    "&aacute;",
+    "&aacutex",
+    "&notin",
+    "&notit;",
+    "&nbsp;",
+    "&NotEqualTilde;",
+    "&fjlig;",
+    "&foo;",
+    "&foo",
+    "& alone",
+    "&;",
+]
+
+
+@pytest.mark.parametrize("name", NEWS_PAGES)
+def test_stream_extractor_matches_bs4(read_fixture, name):
+    html = read_fixture(name)
+    title, content, entry_date = NewsReader.extract_stream(html)
+    bs4_title, bs4_content, bs4_entry_date = NewsReader.extract_bs4(html)
+    assert title == bs4_title
+    assert content == bs4_content
+    assert entry_date == bs4_entry_date
+
+
+@pytest.mark.parametrize("name", NEWS_PAGES)
+def test_stream_extractor_matches_bs4_across_chunks(read_fixture, monkeypatch, name):
+    # References and tags split between two `feed` calls
+    monkeypatch.setattr(SoupLikeParser, "CHUNK_SIZE", 7)
+    html = read_fixture(name)
+    assert NewsReader.extract_stream(html) == NewsReader.extract_bs4(html)
+
+
+@pytest.mark.parametrize("reference", REFERENCES)
+def test_character_references_match_bs4(reference):
+    html = (
+        f"<h1>{reference}</h1>"
+        f'<time class="entry-date" datetime="{reference}"></time>'
+        f'<div class="entry-content"><p>a{reference}b</p></div>'
+    )
+    assert NewsReader.extract_stream(html) == NewsReader.extract_bs4(html)
+
+
+@pytest.mark.parametrize("name", NEWS_PAGES)
+def test_parse_news_is_the_same_with_both_parsers(read_fixture, monkeypatch, name):
+    html = read_fixture(name)
+    parsed = {}
+    for parser in NewsReader.PARSERS:
+        monkeypatch.setattr(NewsReader, "PARSER", parser)
+        parsed[parser] = NewsReader().parse_news(html)
+    assert parsed["stream"] == parsed["bs4"]
+
+
+def test_parse_news_fields(read_fixture, monkeypatch):
+    monkeypatch.setattr(NewsReader, "PARSER", "stream")
+    title, content, origin_created_at = NewsReader().parse_news(
+        read_fixture("news_page_references.html")
+    )
+    assert title == 'Becas ABC ñandú "2024" <UTN> &amp; “citas”'
+    assert content.startswith("Decimal: é ñ € é. Hex: é ñ € é.")
+    assert "Windows-1252: € ‚ … ‘’ “” – — ™" in content
+    assert origin_created_at == datetime.fromisoformat("2024-03-05T08:00:00-03:00")
+
+
+def test_parse_news_without_parts(read_fixture, monkeypatch):
+    monkeypatch.setattr(NewsReader, "PARSER", "stream")
+    parsed = NewsReader().parse_news(read_fixture("news_page_missing_parts.html"))
+    assert parsed == ("", "", None)
+
+
+@pytest.mark.parametrize(
+    "html",
+    [
+        '<h1>a &#; &#x; b</h1><div class="entry-content"><p>c</p></div>',
+        '<h1>&#233abc; &#</h1><div class="entry-content"><p>&#abc; c</p></div>',
+        '<h1>a</h1><div class="entry-content"><p>&#abc; c &#; d</p></div>',
+        '<h1>a &#12</h1><div class="entry-content"><p>c</p></div>&#',
+    ],
+)
+def test_malformed_references_across_chunks(monkeypatch, html):
+    # `html.parser` stops at each of them, the result depends on the chunks
+    monkeypatch.setattr(SoupLikeParser, "CHUNK_SIZE", 7)
+    assert NewsReader.extract_stream(html) == NewsReader.extract_bs4(html)
@@ -0,0 +1,79 @@
+import asyncio
+import json
+
+import pytest
+from sqlalchemy import func, select
+
+from app.database_models import News, RenderedPage
+from app.fastapi_app import page_store
+from app.fastapi_app.page_store import LATEST_PATH, PageStore
+
+SITE = "https://noticias.example.com"
+WORKERS_DEV = "https://utn-frsn-news.example.workers.dev"
+
+
+def add_news(session, count: int) -> None:
+    start = session.scalar(select(func.count(News.id)))
+    session.add_all(
+        News(
+            url=f"https://www.frsn.utn.edu.ar/?p={start + i}",
+            title=f"Noticia {start + i}",
+            content=f"Contenido de la noticia {start + i}.",
+            response_elapsed_seconds=0.5,
+            parse_elapsed_seconds=0.1,
+        )
+        for i in range(count)
+    )
+    session.commit()
+
+
+def titles(page: RenderedPage) -> list[str]:
+    return [item["title"] for item in json.loads(page.body)]
+
+
+@pytest.fixture
+def store(session) -> PageStore:
+    add_news(session, 3)
+    return PageStore(session)
+
+
+def test_pages_are_stored_per_base_url(store):
+    home = asyncio.run(store.get_or_render("/", SITE))
+    assert f'href="{SITE}/search"' in home.body
+
+    assert store.get("/", WORKERS_DEV) is None
+    other = asyncio.run(store.get_or_render("/", WORKERS_DEV))
+    assert f'href="{WORKERS_DEV}/search"' in other.body
+    assert SITE not in other.body
+    assert store.get("/", SITE).body == home.body
+
+
+def test_listing_is_outdated_by_new_news(store, session):
+    page = asyncio.run(store.get_or_render(LATEST_PATH, SITE))
+    assert titles(page)[0] == "Noticia 2"
+    detail = asyncio.run(store.get_or_render("/news/1", SITE))
+
+    # Without `drop_listings`, e.g. if it failed
+    add_news(session, 1)
+    assert store.get(LATEST_PATH, SITE) is None
+    assert store.get("/news/1", SITE).body == detail.body
+    page = asyncio.run(store.get_or_render(LATEST_PATH, SITE))
+    assert titles(page)[0] == "Noticia 3"
+    assert store.get(LATEST_PATH, SITE).body == page.body
+
+
+def test_listing_rendered_before_an_insert_is_not_served(store, session, monkeypatch):
+    asgi_get = page_store.asgi_get
+
+    async def insert_while_rendering(*args):
+        response = await asgi_get(*args)
+        # Committed and dropped after the page was read, before it's stored
+        add_news(session, 1)
+        store.drop_listings()
+        return response
+
+    monkeypatch.setattr(page_store, "asgi_get", insert_while_rendering)
+    page = asyncio.run(store.render(LATEST_PATH, SITE))
+    assert titles(page)[0] == "Noticia 2"
+    assert session.scalar(select(func.count()).select_from(RenderedPage)) == 1
+    assert store.get(LATEST_PATH, SITE) is None
@@ -0,0 +1,43 @@
+"""Cursors received from clients are validated before reaching a query."""
+
+import json
+from base64 import urlsafe_b64encode
+
+import pytest
+from fastapi import HTTPException
+
+from app.fastapi_app.pagination import Cursor
+
+
+def raw_cursor(*values: object) -> str:
+    raw = json.dumps(list(values), separators=(",", ":"))
+    return urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+@pytest.mark.parametrize("rank", [-3.25, 0, 7])
+def test_rank_cursor_round_trip(rank: float) -> None:
+    cursor = Cursor.decode(Cursor.after_rank(rank, 42).encode(), Cursor.RANK)
+
+    assert (cursor.kind, cursor.key, cursor.id) == (Cursor.RANK, rank, 42)
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        raw_cursor(Cursor.RANK, "1 OR 1=1", 42),
+        raw_cursor(Cursor.RANK, None, 42),
+        raw_cursor(Cursor.RANK, True, 42),
+        raw_cursor(Cursor.RANK, [1.5], 42),
+        raw_cursor(Cursor.RANK, {"rank": 1.5}, 42),
+        raw_cursor(Cursor.RANK, float("nan"), 42),
+        raw_cursor(Cursor.RANK, float("inf"), 42),
+        raw_cursor(Cursor.RANK, 1.5, "42"),
+        raw_cursor(Cursor.DATE, 1.5, 42),
+        "not a cursor",
+    ],
+)
+def test_invalid_rank_cursor(cursor: str) -> None:
+    with pytest.raises(HTTPException) as error:
+        Cursor.decode(cursor, Cursor.RANK)
+
+    assert error.value.status_code == 400
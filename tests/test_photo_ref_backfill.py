@@ -0,0 +1,76 @@
+import asyncio
+from typing import ClassVar
+
+import pytest
+from sqlalchemy import select
+
+from app.database_models import CompletedJob, News, PhotoRef
+from app.main_apps import main
+from app.main_apps.main import PHOTO_REF_BACKFILL_JOB, photo_ref_backfill
+
+OLD_NEWS_URL = "https://www.frsn.utn.edu.ar/?p=1"
+OLD_PHOTO_URL = "https://www.frsn.utn.edu.ar/old.jpg"
+NEW_PHOTO_URL = "https://www.frsn.utn.edu.ar/new.jpg"
+
+
+class FakeFeed:
+    """`HistoricFeed` whose crawl returns `news_urls`, or raises `error`."""
+
+    crawls = 0
+    news_urls: ClassVar[list[tuple[str, str | None]]] = []
+    error: BaseException | None = None
+
+    async def get_urls(self, latest_url=None):
+        FakeFeed.crawls += 1
+        if self.error:
+            raise self.error
+        return self.news_urls
+
+
+@pytest.fixture
+def feed(monkeypatch):
+    FakeFeed.crawls = 0
+    FakeFeed.news_urls = [(OLD_NEWS_URL, OLD_PHOTO_URL)]
+    FakeFeed.error = None
+    monkeypatch.setattr(main, "HistoricFeed", FakeFeed)
+    return FakeFeed
+
+
+@pytest.fixture
+def stored_news(session):
+    session.add(News(url=OLD_NEWS_URL, title="a", content="b", photo_id="old-id"))
+    # Reference of a news scraped after deploying, before the first cron
+    PhotoRef.insert_refs(session, {PhotoRef.url_key(NEW_PHOTO_URL): "new-id"})
+    session.commit()
+
+
+def photo_ids(session) -> dict[int, str]:
+    return dict(session.execute(select(PhotoRef.key_hash, PhotoRef.photo_id)).all())
+
+
+def test_runs_even_if_references_exist(session, stored_news, feed):
+    asyncio.run(photo_ref_backfill(session))
+
+    assert feed.crawls == 1
+    assert photo_ids(session) == {
+        PhotoRef.url_key(OLD_PHOTO_URL): "old-id",
+        PhotoRef.url_key(NEW_PHOTO_URL): "new-id",
+    }
+    assert session.get(CompletedJob, PHOTO_REF_BACKFILL_JOB) is not None
+
+    asyncio.run(photo_ref_backfill(session))
+    assert feed.crawls == 1
+
+
+def test_failed_crawl_is_tried_again(session, stored_news, feed):
+    feed.error = TimeoutError("Deadline reached")
+    with pytest.raises(TimeoutError):
+        asyncio.run(photo_ref_backfill(session))
+    session.rollback()
+    assert session.get(CompletedJob, PHOTO_REF_BACKFILL_JOB) is None
+
+    feed.error = None
+    asyncio.run(photo_ref_backfill(session))
+    assert feed.crawls == 2
+    assert PhotoRef.url_key(OLD_PHOTO_URL) in photo_ids(session)
+    assert session.get(CompletedJob, PHOTO_REF_BACKFILL_JOB) is not None
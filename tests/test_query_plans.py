@@ -0,0 +1,224 @@
+"""The hot queries must use the `news` indexes.
+
+Runs the real API endpoints and scraper/messenger helpers against a
+database set up by `DatabaseSetup`, captures the SQL they execute and
+asserts its `EXPLAIN QUERY PLAN`: the expected index is used, `news` is
+never scanned without an index and no temporary B-tree is built to sort
+the rows.
+"""
+
+import asyncio
+from collections.abc import Callable
+from datetime import UTC, datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+from app.database_models import News
+from app.database_setup import DatabaseSetup
+from app.fastapi_app.main import app, export_chunks
+from app.fastapi_app.page_store import asgi_get
+from app.fastapi_app.pagination import Cursor
+from app.main_apps.main import backfill_photo_refs, latest_news_url, prepare_posts
+
+# Enough for several listing pages and export chunks
+NEWS_ROWS = 120
+DATE_ORDER = "ORDER BY news.origin_created_at DESC, news.id DESC"
+INSERTED_ORDER = "ORDER BY news.inserted_at, news.id"
+
+
+@pytest.fixture(scope="module")
+def session() -> Session:
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    # A new database, its setup can't be skipped
+    DatabaseSetup._ready_version = None
+    DatabaseSetup().setup(engine)
+    session = Session(engine)
+    created_at = datetime(2024, 6, 1, 12, tzinfo=UTC)
+    session.add_all(
+        News(
+            url=f"https://www.frsn.utn.edu.ar/?p={1000 + i}",
+            title=f"Inscripciones abiertas {i}",
+            content=f"Se informa que están abiertas las inscripciones {i}.",
+            summary=f"Se informa que están abiertas las inscripciones {i}...",
+            photo_id=f"utn-frsn-news-photo-{i}" if i % 3 else None,
+            origin_created_at=created_at - timedelta(days=i),
+            inserted_at=created_at + timedelta(minutes=i // 4),
+        )
+        for i in range(NEWS_ROWS)
+    )
+    session.commit()
+    yield session
+    session.close()
+    DatabaseSetup._ready_version = None
+
+
+def get(path: str, query: Callable[[News], str] = lambda news: ""):
+    def run(session: Session, news: News) -> None:
+        key = f"{path}?{query(news)}" if query(news) else path
+        status, _, _ = asyncio.run(asgi_get(app, key, "http://localhost", session))
+        assert status == 200
+
+    return run
+
+
+CHECKS = [
+    pytest.param(
+        get("/api/news/latest"),
+        DATE_ORDER,
+        "ix_news_origin_created_at_id",
+        False,
+        id="api.latest",
+    ),
+    pytest.param(
+        get("/api/news/latest", lambda news: "page=3"),
+        DATE_ORDER,
+        "ix_news_origin_created_at_id",
+        False,
+        id="api.latest.offset",
+    ),
+    pytest.param(
+        get(
+            "/api/news/latest",
+            lambda news: f"cursor={Cursor.after_news(news).encode()}",
+        ),
+        DATE_ORDER,
+        "ix_news_origin_created_at_id",
+        False,
+        id="api.latest.cursor",
+    ),
+    pytest.param(
+        get(
+            "/api/search",
+            lambda news: (
+                f"origin_date_from={news.origin_created_at.date() - timedelta(days=30)}"
+                f"&origin_date_to={news.origin_created_at.date()}"
+            ),
+        ),
+        DATE_ORDER,
+        "ix_news_origin_created_at_id",
+        False,
+        id="api.search.origin_dates",
+    ),
+    # Rows are found by insertion date but listed by origin date, so the
+    # (few) matching rows are sorted
+    pytest.param(
+        get(
+            "/api/search",
+            lambda news: (
+                f"inserted_date_from={news.inserted_at.date()}"
+                f"&inserted_date_to={news.inserted_at.date()}"
+            ),
+        ),
+        DATE_ORDER,
+        "ix_news_inserted_at_id",
+        True,
+        id="api.search.inserted_dates",
+    ),
+    # Small chunks, so the queries after the first one run too
+    pytest.param(
+        lambda session, news: list(export_chunks(session, [], chunk_size=25)),
+        INSERTED_ORDER,
+        "ix_news_inserted_at_id",
+        False,
+        id="api.export",
+    ),
+    pytest.param(
+        lambda session, news: list(
+            export_chunks(
+                session,
+                [News.inserted_at >= news.inserted_at],
+                chunk_size=25,
+            )
+        ),
+        INSERTED_ORDER,
+        "ix_news_inserted_at_id",
+        False,
+        id="api.export.since",
+    ),
+    pytest.param(
+        get("/api/news/1"),
+        "WHERE news.id =",
+        "INTEGER PRIMARY KEY",
+        False,
+        id="api.news_item",
+    ),
+    pytest.param(
+        lambda session, news: latest_news_url(session),
+        "ORDER BY news.origin_created_at DESC",
+        "ix_news_origin_created_at_id",
+        False,
+        id="scraper.latest_news_url",
+    ),
+    pytest.param(
+        lambda session, news: backfill_photo_refs(
+            session, [(news.url, "https://x/1.jpg")]
+        ),
+        "WHERE news.url IN",
+        "ix_news_url",
+        False,
+        id="scraper.backfill_photo_refs",
+    ),
+    pytest.param(
+        lambda session, news: prepare_posts(session, [1, 2, 3]),
+        "WHERE news.id IN",
+        "INTEGER PRIMARY KEY",
+        False,
+        id="messenger.prepare_posts",
+    ),
+]
+
+
+def plan_errors(
+    connection,
+    statement: str,
+    parameters,
+    index: str,
+    allow_sort: bool,
+) -> list[str]:
+    plan = [
+        row[-1]
+        for row in connection.exec_driver_sql(
+            f"EXPLAIN QUERY PLAN {statement}", parameters
+        )
+    ]
+    errors = []
+    if not any(index in detail for detail in plan):
+        errors.append(f"doesn't use {index}")
+    if any(
+        detail.split(" ")[:2] == ["SCAN", "news"] and "INDEX" not in detail
+        for detail in plan
+    ):
+        errors.append("full scan of news")
+    if not allow_sort and any("TEMP B-TREE" in detail for detail in plan):
+        errors.append("sorts with a temp B-tree")
+    return [f"{error}: {' | '.join(plan)}" for error in errors]
+
+
+@pytest.mark.parametrize(("run", "marker", "index", "allow_sort"), CHECKS)
+def test_query_plan(session, run, marker, index, allow_sort):
+    news = session.get(News, 50)
+    engine = session.get_bind()
+    statements: list[tuple[str, object]] = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        run(session, news)
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+    checked = [(s, p) for s, p in statements if marker in s]
+    assert checked, "query not executed"
+    with engine.connect() as connection:
+        for statement, parameters in checked:
+            assert (
+                plan_errors(connection, statement, parameters, index, allow_sort) == []
+            )
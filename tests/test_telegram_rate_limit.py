@@ -0,0 +1,86 @@
+"""The Telegram limiters, driven on a fake clock, never exceed the chat
+limit of 20 messages in any minute."""
+
+import asyncio
+
+import pytest
+
+import app.rate_limit
+from app.main_apps.messenger.telegram import Telegram
+
+CHAT_ID = "-100123"
+CHAT_LIMIT = 20
+WINDOW = 60
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    sleep = asyncio.sleep
+
+    async def fake_sleep(seconds: float) -> None:
+        # Always moves on, the leftover of a refill can round to nothing
+        fake.now += max(seconds, 1e-6)
+        await sleep(0)
+
+    monkeypatch.setattr(app.rate_limit, "monotonic", fake.monotonic)
+    monkeypatch.setattr(asyncio, "sleep", fake_sleep)
+    monkeypatch.setattr(Telegram, "_chat_limiters", {})
+    monkeypatch.setattr(Telegram, "_global_limiter", None)
+    return fake
+
+
+def max_in_window(sends: list[float]) -> int:
+    return max(
+        sum(1 for other in sends if start <= other < start + WINDOW) for start in sends
+    )
+
+
+def test_limits_hold_in_any_minute():
+    assert Telegram.CHAT_BURST + Telegram.CHAT_RATE * WINDOW <= CHAT_LIMIT
+
+
+@pytest.mark.parametrize("idle", [0, 10, 45, 300])
+def test_chat_sends_stay_under_the_limit(clock, idle):
+    sends: list[float] = []
+
+    async def send(count: int) -> None:
+        for _ in range(count):
+            await Telegram().wait_turn(CHAT_ID)
+            sends.append(clock.now)
+
+    async def run() -> None:
+        await send(40)
+        # Refills part (or all) of the burst
+        clock.now += idle
+        await send(40)
+        # Several senders of one isolate share the chat limiter
+        await asyncio.gather(*(send(10) for _ in range(4)))
+
+    asyncio.run(run())
+    assert len(sends) == 120
+    assert max_in_window(sends) <= CHAT_LIMIT
+
+
+def test_throttled_chat_waits_retry_after(clock):
+    sends: list[float] = []
+
+    async def run() -> None:
+        for i in range(30):
+            await Telegram().wait_turn(CHAT_ID)
+            sends.append(clock.now)
+            if i == 10:
+                Telegram().throttled(CHAT_ID, 30)
+                throttled_at = clock.now
+        assert sends[11] >= throttled_at + 30
+
+    asyncio.run(run())
+    assert max_in_window(sends) <= CHAT_LIMIT